@@ -1,24 +1,45 @@
 """
 批量工作流：扫描 → 逐个处理 → 结束
 复用原来的单包图作为子流程
+
+workers > 1 时改走 process_parallel：整个队列进进程池，一步处理完。
+断点续跑见 agent/checkpoint.py 与 batch_main --resume。
 """
 from langgraph.graph import StateGraph, END
-from .nodes import node_scan_dir, node_process_one
+from .nodes import node_scan_dir, node_process_one, node_process_parallel
 from .state import AgentState
 
-batch_workflow = StateGraph(AgentState)
 
-batch_workflow.add_node("scan",      node_scan_dir)
-batch_workflow.add_node("process",   node_process_one)
+def _has_next(s: AgentState) -> bool:
+    return (s.get("pkg_next") or 0) < len(s["pkg_queue"])
+
+
+def build_batch_graph(checkpointer=None):
+    batch_workflow = StateGraph(AgentState)
+
+    batch_workflow.add_node("scan",      node_scan_dir)
+    batch_workflow.add_node("process",   node_process_one)
+    batch_workflow.add_node("process_parallel", node_process_parallel)
+
+    # 扫描完按 workers 选择串行 / 并行；队列为空直接结束
+    batch_workflow.add_conditional_edges(
+        "scan",
+        lambda s: END if not _has_next(s)
+        else "process_parallel" if (s.get("workers") or 1) > 1 else "process",
+        {"process": "process", "process_parallel": "process_parallel", END: END}
+    )
+
+    # 只要队列还有就继续处理
+    batch_workflow.add_conditional_edges(
+        "process",
+        lambda s: "process" if _has_next(s) else END,
+        {"process": "process", END: END}
+    )
+    batch_workflow.add_edge("process_parallel", END)
 
-batch_workflow.add_edge("scan", "process")
+    batch_workflow.set_entry_point("scan")
+    # 带 checkpointer 时每处理完一个包落一次检查点，可 --resume 续跑
+    return batch_workflow.compile(checkpointer=checkpointer)
 
-# 只要队列还有就继续处理
-batch_workflow.add_conditional_edges(
-    "process",
-    lambda s: "process" if s["pkg_queue"] else END,
-    {"process": "process", END: END}
-)
 
-batch_workflow.set_entry_point("scan")
-batch_graph = batch_workflow.compile()
\ No newline at end of file
+batch_graph = build_batch_graph()
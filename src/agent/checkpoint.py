@@ -0,0 +1,68 @@
+"""
+持久化检查点（SQLite），用于批量任务断点续跑
+
+- 批量图：每处理完一个包（一个 superstep）落一次检查点，thread_id = run_id
+- 单包图：每个节点完成落一次检查点，thread_id = "<run_id>:<包路径>"
+  续跑时已完成的包直接取结果，做到一半的包从最后完成的节点继续，
+  不会重新解压/重新分类。
+
+依赖：pip install langgraph-checkpoint-sqlite
+默认库文件：~/.cache/teaching_assistant/checkpoints.sqlite3（TAS_CHECKPOINT_DB 可改）
+"""
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+DEFAULT_DB = os.getenv("TAS_CHECKPOINT_DB") or str(
+    Path.home() / ".cache" / "teaching_assistant" / "checkpoints.sqlite3")
+
+# (进程号, 库路径, 图名) -> 编译好的图；每个进程各自一个连接
+_compiled: Dict[Tuple[int, str, str], object] = {}
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+
+def get_checkpointer(db_path: str = DEFAULT_DB):
+    try:
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise RuntimeError("断点续跑需要 pip install langgraph-checkpoint-sqlite") from e
+    from .state import FileRecord
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")   # 并行 worker 同时写
+    # 状态里除内置类型外只有 FileRecord，显式登记，反序列化时不告警也不会被拦
+    serde = JsonPlusSerializer(
+        allowed_msgpack_modules=[(FileRecord.__module__, FileRecord.__name__)])
+    return SqliteSaver(conn, serde=serde)
+
+
+def compiled_with_checkpointer(name: str, build: Callable, db_path: str):
+    """build(checkpointer) -> 编译好的图；同进程同库只建一次"""
+    key = (os.getpid(), db_path, name)
+    if key not in _compiled:
+        _compiled[key] = build(checkpointer=get_checkpointer(db_path))
+    return _compiled[key]
+
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def invoke_resumable(graph, state: dict, thread_id: str) -> dict:
+    """
+    有检查点就续跑（已跑完的直接返回最终状态），没有就从头跑。
+    """
+    config = thread_config(thread_id)
+    snap = graph.get_state(config)
+    if snap.values and not snap.next:
+        return snap.values
+    if snap.values:
+        return graph.invoke(None, config)
+    return graph.invoke(state, config)
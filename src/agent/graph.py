@@ -1,52 +1,75 @@
 """
 LangGraph 工作流定义文件
 
-拓扑： extract → classify → dispatch ─┬─→ post_code
-                                     └─→ post_doc
-条件边根据 group_keys 决定走向，支持后续无限扩展。
+拓扑： extract → expand → sniff → classify → dispatch ─┬─→ post(code)
+                                                      ├─→ post(doc)
+                                                      └─→ post(...)
+expand 把包里的压缩包（zip 套 rar 之类）递归展开，内层成员一起分类。
+sniff 用魔数/扩展名本地判定，只有拿不准的文件才进 classify 问 LLM。
+dispatch 之后每个分组键用 Send 各起一个 post 分支并发执行，
+处理函数在 registry.POST_PROCESSORS 里按分组键查找，支持后续无限扩展。
 """
+from typing import List, Union
+
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
+
 from .nodes import (
-    node_extract, node_classify, node_dispatch,
-    node_post_code, node_post_doc
+    node_extract, node_expand, node_sniff, node_classify, node_dispatch, node_post,
 )
 from .state import AgentState
 
-# 1. 创建状态图实例
-workflow = StateGraph(AgentState)
-
-# 2. 添加节点（名字随意，但后续映射要保持一致）
-workflow.add_node("extract",   node_extract)   # 解压
-workflow.add_node("classify",  node_classify)  # LLM 识别
-workflow.add_node("dispatch",  node_dispatch)  # 分组
-workflow.add_node("post_code", node_post_code) # 代码后处理
-workflow.add_node("post_doc",  node_post_doc)  # 文档后处理
-
-# 3. 普通边：顺序执行
-workflow.add_edge("extract", "classify")
-workflow.add_edge("classify", "dispatch")
-
-# 4. 条件边：根据分组键并行触发
-#    函数返回 str，必须在映射字典里存在
-workflow.add_conditional_edges(
-    "dispatch",
-    lambda s: s["group_keys"][0] if s.get("group_keys") else "end",
-    {
-        "code": "post_code",
-        "doc":  "post_doc",
-        "end":  END,      # 兜底，无文件时直接结束
-    }
-)
 
-# 5. 各后处理节点统一回到 END
-workflow.add_edge("post_code", END)
-workflow.add_edge("post_doc",  END)
+def route_groups(s: AgentState) -> Union[List[Send], str]:
+    """每个分组一条 Send；分支只拿自己那一组，避免整份状态被复制 N 次"""
+    keys = s.get("group_keys") or []
+    if not keys:
+        return END          # 兜底，无文件时直接结束
+    return [
+        Send("post", {
+            "group": k,
+            "grouped": {k: s["grouped"][k]},
+            "classified": [c for c in s["classified"] if c["type"] == k],
+            "extract_to": s.get("extract_to", ""),
+            "archive_path": s.get("archive_path", ""),
+            "streamed": s.get("streamed", False),
+        })
+        for k in keys
+    ]
+
+
+def build_graph(checkpointer=None):
+    # 1. 创建状态图实例
+    workflow = StateGraph(AgentState)
+
+    # 2. 添加节点（名字随意，但后续映射要保持一致）
+    workflow.add_node("extract",   node_extract)   # 解压
+    workflow.add_node("expand",    node_expand)    # 内层压缩包展开
+    workflow.add_node("sniff",     node_sniff)     # 本地预分类
+    workflow.add_node("classify",  node_classify)  # LLM 识别
+    workflow.add_node("dispatch",  node_dispatch)  # 分组
+    workflow.add_node("post",      node_post)      # 后处理（每组一个分支）
+
+    # 3. 普通边：顺序执行
+    workflow.add_edge("extract", "expand")
+    workflow.add_edge("expand", "sniff")
+    workflow.add_edge("sniff", "classify")
+    workflow.add_edge("classify", "dispatch")
+
+    # 4. 条件边：每个分组键并发触发一个 post 分支
+    workflow.add_conditional_edges("dispatch", route_groups, ["post", END])
+
+    # 5. 各后处理分支统一回到 END
+    workflow.add_edge("post", END)
+
+    # 6. 设定入口
+    workflow.set_entry_point("extract")
+
+    # 7. 编译成可执行对象（checkpointer 见 agent/checkpoint.py，断点续跑用）
+    return workflow.compile(checkpointer=checkpointer)
 
-# 6. 设定入口
-workflow.set_entry_point("extract")
 
-# 7. 编译成可执行对象
-graph = workflow.compile()
+graph = build_graph()
 
 # from IPython.display import Image,display
-# display(Image(graph.get_graph().draw_mermaid_png()))
\ No newline at end of file
+# display(Image(graph.get_graph().draw_mermaid_png()))
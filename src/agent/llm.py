@@ -2,11 +2,23 @@ import dotenv
 import os
 from langchain_openai import ChatOpenAI
 
+from .ratelimit import TokenBucketLimiter
+
 dotenv.load_dotenv()   # 把 .env 灌进环境变量
 
+# 各服务商的限流配置（请求数/分钟，token 数/分钟），按账号等级调整；
+# 也可用环境变量 LLM_RPM / LLM_TPM 统一覆盖
+RATE_LIMITS = {
+    "deepseek": {"rpm": 300, "tpm": 600_000},
+    "qwen":     {"rpm": 600, "tpm": 1_000_000},
+    "local":    {"rpm": 6000, "tpm": None},
+}
+
+_limiters = {}
+
 def get_llm(provider: str = "deepseek"):
     """
-    provider: deepseek | qwen
+    provider: deepseek | qwen | local
     返回 LangChain BaseChatModel 实例，接口跟 ChatOpenAI 100% 一致
     """
     if provider == "deepseek":
@@ -25,4 +37,25 @@ def get_llm(provider: str = "deepseek"):
             api_key=os.getenv("DASHSCOPE_API_KEY"),
             temperature=0,
         )
-    raise ValueError(f"unknown provider {provider}")
\ No newline at end of file
+    if provider == "local":
+        # 任意 OpenAI 兼容服务（vLLM / Ollama / 测试桩），重试交给调用方的退避
+        return ChatOpenAI(
+            model=os.getenv("LOCAL_LLM_MODEL", "local"),
+            base_url=os.getenv("LOCAL_LLM_BASE_URL", "http://127.0.0.1:8000/v1"),
+            api_key=os.getenv("LOCAL_LLM_API_KEY", "EMPTY"),
+            temperature=0,
+            max_tokens=256,
+            max_retries=0,
+        )
+    raise ValueError(f"unknown provider {provider}")
+
+def get_rate_limiter(provider: str = "deepseek") -> TokenBucketLimiter:
+    """同一进程内同一 provider 共用一个令牌桶"""
+    if provider not in RATE_LIMITS:
+        raise ValueError(f"unknown provider {provider}")
+    if provider not in _limiters:
+        conf = RATE_LIMITS[provider]
+        rpm = float(os.getenv("LLM_RPM") or conf["rpm"])
+        tpm = os.getenv("LLM_TPM") or conf["tpm"]
+        _limiters[provider] = TokenBucketLimiter(rpm, float(tpm) if tpm else None)
+    return _limiters[provider]
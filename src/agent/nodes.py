@@ -1,25 +1,55 @@
 """
 节点函数集合
 
-每个函数签名：def node_xxx(state: AgentState) -> AgentState
-返回值必须是 **完整状态字典**（或新增/覆盖字段），否则下游拿不到数据。
+每个函数签名：def node_xxx(state: AgentState) -> dict
+返回值只含**改动的字段**，由 LangGraph 并入状态；classified / skipped / pkg_status / counts
+带 reducer（见 state.py），返回的是要追加/累加的部分。不要 {**state, ...} 整份复制，
+也不要原地改 state 里的列表/字典（检查点异步落盘，原地改会把上一个检查点也改掉）。
 """
 import os
-from typing import Dict, List
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
-import tempfile
 
-from .state import AgentState
-from ..tools.archive import extract_archive
-from ..tools.classify import classify_file
-from ..tools.post_process import format_code_batch, doc_to_txt_batch
+from .checkpoint import compiled_with_checkpointer, invoke_resumable
+from .registry import POST_PROCESSORS, register_post_processor
+from .state import AgentState, FileRecord
+from ..tools.archive import (
+    extract_archive, extract_deduped, extract_filtered, extract_members, iter_members,
+    list_members, member_path, new_extract_dir, UnsupportedArchive,
+)
+from ..tools.blobstore import BlobStore, unshare
+from ..tools.nested import expand_nested, is_nested_archive
+from ..tools.filters import ExtractPolicy, apply_policy
+from ..tools.manifest import BatchManifest
+from ..tools.classify import classify_file, classify_batch, unknown_result
+from ..tools.classify_async import classify_files_async
+from ..tools.sinks import ResultSink, open_sink
+from ..tools.sniff import pre_classify
+from ..tools.workspace import get_workspace
+from ..tools.post_process import doc_errors, doc_to_txt_batch, format_code_batch
 from ..utils.logger import get_logger
+from ..utils.workers import set_batch_workers
 
 logger = get_logger(__name__)
 
 SUPPORT_SUFFIX = (".zip", ".rar", ".7z", ".tar", ".gz", ".tgz")
 
-def node_scan_dir(state: AgentState) -> AgentState:
+# full：整包解压再分类；stream：只读包内成员头部分类，后处理需要的成员再解出来；
+# cas：内容寻址存储，相同内容只写一份，目录树用 reflink/硬链接建出
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "full")
+
+# 解压前按清单过滤 node_modules/.git/视频等，并限制文件数与体积；EXTRACT_FILTER=0 关闭
+EXTRACT_POLICY = ExtractPolicy.from_env()
+
+# 包里的压缩包（zip 套 rar 套 7z）递归展开后一起分类；NESTED_EXPAND=0 关闭
+NESTED_EXPAND = os.getenv("NESTED_EXPAND", "1") == "1"
+
+# single：逐文件请求；batch：多文件打包成一次请求；async：并发 + 限流 + 退避
+CLASSIFY_MODE = os.getenv("CLASSIFY_MODE", "single")
+
+def node_scan_dir(state: AgentState) -> dict:
     """
     1. 扫描用户指定目录
     2. 把所有压缩包路径写进队列
@@ -34,50 +64,259 @@ def node_scan_dir(state: AgentState) -> AgentState:
     pkg_queue.sort()          # 固定顺序，方便测试
     logger.info("扫描到 %d 个压缩包", len(pkg_queue))
 
-    return {**state, "pkg_queue": pkg_queue, "current_pkg": ""}
+    # 增量：清单里指纹没变的包直接复用上次结果，不进队列
+    manifest = _get_manifest(state)
+    cached = []
+    if manifest and state.get("incremental", True):
+        todo = []
+        for pkg in pkg_queue:
+            prev = manifest.lookup(pkg)
+            if prev is None:
+                todo.append(pkg)
+            else:
+                cached.append({**prev, "status": "cached"})
+        logger.info("清单命中 %d 个，待处理 %d 个", len(pkg_queue) - len(todo), len(todo))
+        pkg_queue = todo
+
+    return {**_merge_results(state, cached),
+            "pkg_queue": pkg_queue, "pkg_next": 0, "current_pkg": ""}
+
+_manifests: Dict[str, BatchManifest] = {}
 
-def node_process_one(state: AgentState) -> AgentState:
+def _get_manifest(state: AgentState) -> Optional[BatchManifest]:
+    """manifest_path 为空表示关闭增量；同一路径进程内复用一个连接"""
+    path = state.get("manifest_path")
+    if not path:
+        return None
+    if path not in _manifests:
+        _manifests[path] = BatchManifest(path, use_hash=bool(state.get("manifest_hash")))
+    return _manifests[path]
+
+_sinks: Dict[str, ResultSink] = {}
+
+def _get_sink(state: AgentState) -> Optional[ResultSink]:
+    """result_sink 为空表示结果留在状态里（单包/库调用）；同一路径进程内复用"""
+    path = state.get("result_sink")
+    if not path:
+        return None
+    if path not in _sinks:
+        _sinks[path] = open_sink(path)
+    return _sinks[path]
+
+def package_thread(run_id: str, pkg: str) -> str:
     """
-    从队列 pop 出一个压缩包，调用**原来的单包图**完成
-    解压-分类-后处理，然后把结果合并回主状态。
+    单包图检查点的 thread_id。带上压缩包大小和 mtime：守护模式下一个 run_id 用到底，
+    学生在同一路径重新上传后指纹变了，不会续到旧包已跑完的检查点上拿回旧结果。
     """
-    queue = state["pkg_queue"]
-    if not queue:               # 队列空，直接返回
-        return state
+    st = os.stat(pkg)
+    return f"{run_id}:{pkg}:{st.st_size}:{st.st_mtime_ns}"
 
-    current_pkg = queue.pop(0)
-    logger.info(">>>> 开始处理 %s", current_pkg)
+def run_package(pkg: str, run_id: str = "", checkpoint_db: str = "") -> dict:
+    """
+    用**原来的单包图**处理一个压缩包：解压-分类-后处理。
+    异常在这里兜住，一个坏包不会拖垮整批；顶层函数，可直接丢进进程池。
+    给了 run_id + checkpoint_db 时单包图每个节点落检查点，续跑时从断点继续
+    （按包指纹区分，包被改写后从头处理，见 package_thread）。
+    解压目录从工作区管理器领，后处理结束即交回（失败的包按 WORKSPACE_KEEP 保留现场）。
+    :return: {"package", "status": ok|failed, "error", "files", "skipped", "seconds", "classified"}
+    """
+    logger.info(">>>> 开始处理 %s", pkg)
+    started = time.time()
+    workspace = get_workspace()
+    if EXTRACT_MODE == "cas":
+        _get_blob_store()            # 先 attach：工作区要知道 blob 在哪个盘，才不会把包放到内存盘上
+    work_dir = workspace.acquire(pkg)
 
     # 构造子状态（复用原来的图）
     sub_state: AgentState = {
-        "archive_path": current_pkg,
-        "extract_to": tempfile.mkdtemp(),
+        "archive_path": pkg,
+        "extract_to": work_dir,
         "files": [],
         "classified": [],
         "report": "",
         "grouped": {},
         "group_keys": [],
-        # 下面 3 个字段主图用不到，但状态定义要求给空
+        # 下面几个字段主图用不到，但状态定义要求给空
         "scan_dir": "",
         "pkg_queue": [],
+        "pkg_next": 0,
         "current_pkg": "",
+        "workers": 1,
+        "pkg_status": [],
     }
 
-    from .graph import graph as single_graph  # 函数内部才拿实例，延迟导入
-    sub_final = single_graph.invoke(sub_state)
+    from .graph import graph as single_graph, build_graph  # 函数内部才拿实例，延迟导入
+    try:
+        if run_id and checkpoint_db:
+            resumable_graph = compiled_with_checkpointer("single", build_graph, checkpoint_db)
+            sub_final = invoke_resumable(resumable_graph, sub_state, package_thread(run_id, pkg))
+        else:
+            sub_final = single_graph.invoke(sub_state)
+    except Exception as e:
+        logger.exception("处理失败: %s", pkg)
+        workspace.release(work_dir, ok=False, reason=f"{pkg}\n{type(e).__name__}: {e}")
+        return {"package": pkg, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                "files": 0, "skipped": 0, "seconds": round(time.time() - started, 3),
+                "classified": []}
+    failed_posts = [r for r in sub_final.get("post_results") or []
+                    if r["status"] in ("failed", "partial")]
+    workspace.release(work_dir, ok=not failed_posts, reason=pkg)
+    # 从检查点续跑时解压目录是上次领的，一并交回
+    prev_dir = os.path.dirname(sub_final.get("extract_to") or work_dir)
+    if prev_dir != work_dir:
+        workspace.release(prev_dir, ok=not failed_posts, reason=pkg)
+    return {"package": pkg, "status": "ok", "error": "",
+            "files": len(sub_final["files"]),
+            "skipped": len(sub_final.get("skipped") or []),
+            "seconds": round(time.time() - started, 3),
+            "classified": sub_final["classified"]}
+
+def _absorb(state: AgentState, result: dict) -> Tuple[dict, list, int]:
+    """
+    一个包的结果落地：新处理的包写进清单；配置了 result_sink 时分类结果立即写出去。
+    :return: (包状态, 要留在状态里的分类结果（写进 sink 的为空）, 文件数)
+    """
+    manifest = _get_manifest(state)
+    if manifest and result["status"] in ("ok", "failed"):
+        manifest.record(result["package"], result)
+    result = dict(result)
+    classified = result.pop("classified")
+    sink = _get_sink(state)
+    if sink is None:
+        return result, classified, len(classified)
+    sink.write(result, classified)
+    return result, [], len(classified)
+
+def _as_update(state: AgentState, absorbed: List[Tuple[dict, list, int]]) -> dict:
+    """_absorb 的结果 -> 状态增量：包状态、计数，没有 result_sink 时还有 classified"""
+    update: dict = {"pkg_status": [], "counts": {}}
+    if _get_sink(state) is None:
+        update["classified"] = []
+    for status, classified, n in absorbed:
+        if "classified" in update:
+            update["classified"].extend(classified)
+        update["pkg_status"].append(status)
+        for key, k in (("packages", 1), (status["status"], 1), ("files", n)):
+            update["counts"][key] = update["counts"].get(key, 0) + k
+    return update
+
+def _merge_results(state: AgentState, results: List[dict]) -> dict:
+    """一批包的结果 -> 状态增量（按给定顺序）"""
+    return _as_update(state, [_absorb(state, r) for r in results])
+
+def node_process_one(state: AgentState) -> dict:
+    """
+    取队列里下一个压缩包交给 run_package，返回它的结果增量。
+    队列本身不动，只把下标 pkg_next 往后挪一位：不切片、不复制。
+    """
+    queue, i = state["pkg_queue"], state.get("pkg_next") or 0
+    if i >= len(queue):         # 队列空，直接返回
+        return {}
+
+    current_pkg = queue[i]
+    result = run_package(current_pkg, state.get("run_id", ""), state.get("checkpoint_db", ""))
+    return {**_merge_results(state, [result]),
+            "pkg_next": i + 1,
+            "current_pkg": current_pkg}    # 记录当前包（调试用）
+
+def node_process_parallel(state: AgentState) -> dict:
+    """
+    --workers N：剩余队列整个丢进进程池并发处理（解压与 LLM 等待互相重叠）。
+    状态里的结果按队列（排序后的路径）顺序合并，与串行模式完全一致；
+    配置了 result_sink 时每个包一完成就写出去（sink 里是完成顺序）。
+    """
+    queue = state["pkg_queue"][state.get("pkg_next") or 0:]
+    workers = min(state.get("workers") or 1, len(queue)) or 1
+    logger.info("并行处理 %d 个压缩包，workers=%d", len(queue), workers)
+    set_batch_workers(workers)       # 包内格式化/文档提取进程池按包数分 CPU
+
+    # 每个包一完成就写清单/sink，进程里只留包状态；状态增量最后按队列顺序拼
+    absorbed: Dict[str, Tuple[dict, list, int]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_package, pkg, state.get("run_id", ""),
+                               state.get("checkpoint_db", "")): pkg
+                   for pkg in queue}
+        for fut in as_completed(futures):
+            pkg = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:     # 子进程崩溃（BrokenProcessPool 等）
+                logger.exception("worker crashed: %s", pkg)
+                result = {"package": pkg, "status": "failed",
+                          "error": f"{type(e).__name__}: {e}",
+                          "files": 0, "skipped": 0, "seconds": 0,
+                          "classified": []}
+            logger.info("<<<< %s %s", result["status"], pkg)
+            absorbed[pkg] = _absorb(state, result)
 
-    # 把子结果合并到主状态（简单示例：只累加分类结果）
-    state["classified"].extend(sub_final["classified"])
-    state["pkg_queue"] = queue          # 写回剩余队列
-    state["current_pkg"] = current_pkg  # 记录当前包（调试用）
-    return state
+    return {**_as_update(state, [absorbed[pkg] for pkg in queue]),
+            "pkg_next": len(state["pkg_queue"]),
+            "current_pkg": queue[-1] if queue else ""}
 
 # ---------- 节点：解压 ----------
-def node_extract(state: AgentState) -> AgentState:
+_blob_store: Optional[BlobStore] = None
+
+def _get_blob_store() -> BlobStore:
+    """进程内一个实例；所有包共用同一个 blob 目录（BLOB_STORE_DIR），计入工作区预算"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+        get_workspace().attach(_blob_store)
+    return _blob_store
+
+def collect_blobs() -> int:
+    """cas 模式下回收没人引用的 blob（批量跑完、守护模式空闲时调用），返回删除个数"""
+    if EXTRACT_MODE != "cas":
+        return 0
+    return _get_blob_store().gc()
+
+def _list_archive(arch: str, dest_parent: str) -> dict:
+    """
+    流式模式：只读成员头部 + 哈希，不落盘。
+    files 里是"将来解压后的路径"，真正需要的成员在后处理分支里再解出来。
+    """
+    only, skipped = None, []
+    if EXTRACT_POLICY:
+        only, skipped = apply_policy(list_members(arch), EXTRACT_POLICY)
+    extract_dir = str(new_extract_dir(dest_parent))
+    files, headers, hashes = [], {}, {}
+    for m in iter_members(arch, only=only):
+        path = member_path(extract_dir, m.name)
+        if path is None:             # ../ 越界成员
+            continue
+        files.append(path)
+        headers[path] = m.header
+        hashes[path] = m.digest
+    logger.info("Listed %d members (streamed) -> %s", len(files), extract_dir)
+    return {"files": files, "extract_to": extract_dir, "headers": headers,
+            "hashes": hashes, "streamed": True, "skipped": skipped}
+
+def node_extract(state: AgentState) -> dict:
     arch = state["archive_path"]
     dest_parent = state["extract_to"]
+    if EXTRACT_MODE == "stream":
+        try:
+            listed = _list_archive(arch, dest_parent)
+            return {**listed, "grouped": {}, "group_keys": []}
+        except UnsupportedArchive as e:
+            logger.info("%s，回退到整包解压", e)
+    if EXTRACT_MODE == "cas":
+        store = _get_blob_store()
+        extract_dir, hashes, skipped = extract_deduped(arch, dest_parent, store,
+                                                       EXTRACT_POLICY)
+        logger.info("Extracted %d files (blobs new %d / reused %d) -> %s",
+                    len(hashes), store.added, store.reused, extract_dir)
+        return {"files": list(hashes), "extract_to": extract_dir,
+                "headers": {}, "hashes": hashes, "streamed": False, "skipped": skipped,
+                "grouped": {}, "group_keys": []}
     logger.info("Start extracting %s", arch)
-    extract_dir = extract_archive(arch, dest_parent)
+    skipped = []
+    if EXTRACT_POLICY:
+        extract_dir, skipped = extract_filtered(arch, dest_parent, EXTRACT_POLICY)
+    else:
+        extract_dir = extract_archive(arch, dest_parent)
+    if skipped:
+        logger.info("Skipped %d members by extract policy", len(skipped))
 
     # 递归收集所有文件路径
     files = []
@@ -87,48 +326,130 @@ def node_extract(state: AgentState) -> AgentState:
 
     logger.info("Extracted %d files -> %s", len(files), extract_dir)
     # 初始化分组字段，避免后续 KeyError
-    return {**state, "files": files, "extract_to": extract_dir,
+    return {"files": files, "extract_to": extract_dir,
+            "headers": {}, "hashes": {}, "streamed": False, "skipped": skipped,
             "grouped": {}, "group_keys": []}
 
+# ---------- 节点：内层压缩包展开 ----------
+def node_expand(state: AgentState) -> dict:
+    """
+    files 里的压缩包（按魔数）原地展开成同名目录，成员替换进 files，作为同一个包继续分类。
+    流式模式下只把内层压缩包本身解出来，其余成员仍不落盘。
+    """
+    if not NESTED_EXPAND:
+        return {"nested": []}
+    files = state["files"]
+    headers = state.get("headers") or {}
+    if state.get("streamed"):
+        root = state["extract_to"]
+        inner = [f for f in files
+                 if f in headers and is_nested_archive(os.path.basename(f), headers[f])]
+        if not inner:
+            return {"nested": []}
+        extract_members(state["archive_path"],
+                        [Path(os.path.relpath(f, root)).as_posix() for f in inner], root)
+        headers = {f: h for f, h in headers.items() if f not in set(inner)}
+    files, nested, skipped = expand_nested(files, EXTRACT_POLICY, headers=headers)
+    if nested:
+        logger.info("Expanded %d nested archives -> %d files", len(nested), len(files))
+    return {"files": files, "nested": nested, "skipped": skipped}
+
+# ---------- 节点：本地预分类 ----------
+def _record(path: str, res: dict, state: AgentState) -> FileRecord:
+    """分类结果 -> FileRecord；大小取自磁盘（流式模式下还没落盘，记 -1）"""
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        size = -1
+    return FileRecord.of(path, res, size, (state.get("hashes") or {}).get(path, ""))
+
+def node_sniff(state: AgentState) -> dict:
+    """魔数/扩展名能确定的文件直接出结果，剩下的交给 node_classify"""
+    decided, pending = pre_classify(state["files"], headers=state.get("headers"))
+    logger.info("Sniffed %d files locally, %d left for LLM",
+                len(decided), len(pending))
+    return {"classified": [_record(d["file_path"], d, state) for d in decided]}
+
 # ---------- 节点：LLM 分类 ----------
-def node_classify(state: AgentState) -> AgentState:
+def node_classify(state: AgentState) -> dict:
+    """只返回新分类的记录，由 reducer 追加到 sniff 的结果后面"""
     files = state["files"]
-    logger.info("Classifying %d files", len(files))
-    classified = []
-    for f in files:
-        try:
-            res = classify_file(f)        # 调用 LLM
-            res["file_path"] = f
-            classified.append(res)
-        except Exception:
-            logger.exception("classify failed: %s", f)
-            classified.append({"type": "unknown", "language": "",
-                               "confidence": 0, "file_path": f})
+    done = {c["file_path"] for c in state.get("classified") or []}
+    todo = [f for f in files if f not in done]
+    logger.info("Classifying %d files (%s mode)", len(todo), CLASSIFY_MODE)
+    headers = state.get("headers") or {}
+    hashes = state.get("hashes") or {}
+    if CLASSIFY_MODE in ("batch", "async"):
+        engine = classify_batch if CLASSIFY_MODE == "batch" else classify_files_async
+        results = engine(todo, headers=headers, digests=hashes)
+    else:
+        results = []
+        for f in todo:
+            try:
+                results.append(classify_file(f, headers.get(f), hashes.get(f)))   # 调用 LLM
+            except Exception:
+                logger.exception("classify failed: %s", f)
+                results.append(unknown_result())
+    classified = [_record(f, res, state) for f, res in zip(todo, results)]
     logger.info("Classified done")
-    return {**state, "classified": classified}
+    return {"classified": classified}
 
 # ---------- 节点：分组 ----------
-def node_dispatch(state: AgentState) -> AgentState:
+def node_dispatch(state: AgentState) -> dict:
     grouped: Dict[str, List[str]] = {}
     for item in state["classified"]:
-        t = item["type"]
-        grouped.setdefault(t, []).append(item["file_path"])
+        grouped.setdefault(item["type"], []).append(item["file_path"])
     logger.info("Dispatch groups: %s", list(grouped.keys()))
-    return {**state, "grouped": grouped,
-            "group_keys": list(grouped.keys())}
-
-# ---------- 节点：代码后处理 ----------
-def node_post_code(state: AgentState) -> AgentState:
-    files = state.get("grouped", {}).get("code", [])
-    if files:
-        logger.info("Post-process %d code files", len(files))
-        format_code_batch(files)
-    return state
-
-# ---------- 节点：文档后处理 ----------
-def node_post_doc(state: AgentState) -> AgentState:
-    files = state.get("grouped", {}).get("doc", [])
-    if files:
-        logger.info("Post-process %d doc files", len(files))
-        doc_to_txt_batch(files)
-    return state
\ No newline at end of file
+    return {"grouped": grouped, "group_keys": list(grouped.keys())}
+
+# ---------- 节点：后处理分支 ----------
+def node_post(state: dict) -> dict:
+    """
+    由 dispatch 的 Send 触发，每个分组一个实例并发执行。
+    入参是分支状态 {group, grouped: {group: [...]}, classified, extract_to,
+    archive_path, streamed}，只返回 post_results 增量（带 reducer，并发分支不会互相覆盖）。
+    处理器返回的逐文件错误计入 failed_files：部分失败记 partial，全部失败记 failed。
+    流式模式下先把本组成员解出来，没有处理器的分组永远不落盘。
+    """
+    group = state["group"]
+    files = state["grouped"].get(group, [])
+    fn = POST_PROCESSORS.get(group)
+    started = time.time()
+    status, error, errors = "ok", "", []
+    if fn is None:
+        logger.info("No post-processor for %s, %d files kept as-is", group, len(files))
+        status = "skipped"
+    elif files:
+        try:
+            if state.get("streamed"):
+                root = state["extract_to"]
+                names = [Path(os.path.relpath(f, root)).as_posix() for f in files]
+                extract_members(state["archive_path"], names, root)
+                logger.info("Extracted %d %s members on demand", len(names), group)
+            elif EXTRACT_MODE == "cas":
+                unshare(files)       # 后处理会原地改文件，先断开与 blob 的硬链接
+            errors = fn(files, state) or []
+        except Exception as e:
+            logger.exception("post-process %s failed", group)
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        else:
+            if errors:
+                status = "failed" if len(errors) >= len(files) else "partial"
+                error = "; ".join(errors[:5]) + (f" ...（共 {len(errors)} 个）"
+                                                 if len(errors) > 5 else "")
+    return {"post_results": [{"group": group, "files": len(files), "status": status,
+                              "failed_files": len(errors), "error": error,
+                              "seconds": round(time.time() - started, 3)}]}
+
+# ---------- 代码后处理 ----------
+@register_post_processor("code")
+def post_code(files: List[str], state: dict) -> List[str]:
+    logger.info("Post-process %d code files", len(files))
+    languages = {c["file_path"]: c.get("language", "") for c in state.get("classified") or []}
+    return format_code_batch(files, languages).errors
+
+# ---------- 文档后处理 ----------
+@register_post_processor("doc")
+def post_doc(files: List[str], state: dict) -> List[str]:
+    logger.info("Post-process %d doc files", len(files))
+    return doc_errors(doc_to_txt_batch(files))
@@ -16,4 +16,27 @@ Rules:
 - type=image : png/jpg/svg/bmp
 - type=archive: zip/7z/tar/gz/rar
 - type=other : not above
-"""
\ No newline at end of file
+"""
+# 提示词版本：参与分类缓存的 key。
+# 改了 CLASSIFY_PROMPT 记得 +1，旧缓存会自动失效。
+CLASSIFY_PROMPT_VERSION = "1"
+
+# 批量分类：一次请求带 N 个文件，规则与 CLASSIFY_PROMPT 相同，
+# 因此共用 CLASSIFY_PROMPT_VERSION 与同一份缓存。
+BATCH_CLASSIFY_PROMPT = """
+You are a file-type expert.
+You will receive several files, one per line, formatted as:
+<id>|<file name>|<header bytes, base64>
+For EVERY line output exactly one result. Output **only** a JSON array:
+[
+  {"id": 0, "type": "code/doc/image/archive/other", "language": "py/js/ts/c/cpp/pdf/md/doc/docx/..", "confidence": 0.95},
+  ...
+]
+Rules:
+- type=code  : source code / script / executable
+- type=doc   : pdf, word, ppt, markdown, txt, csv
+- type=image : png/jpg/svg/bmp
+- type=archive: zip/7z/tar/gz/rar
+- type=other : not above
+- keep the ids exactly as given, do not skip or merge lines
+"""
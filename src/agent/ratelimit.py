@@ -0,0 +1,54 @@
+"""
+令牌桶限流（请求数/分钟 + token 数/分钟）
+
+两个桶同时满足才放行；异步调用方 await acquire()，拿不到就睡到够为止。
+内部用线程锁而不是 asyncio.Lock，这样同一个限流器可以跨多次 asyncio.run 复用。
+"""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucketLimiter:
+    def __init__(self, requests_per_minute: float,
+                 tokens_per_minute: Optional[float] = None):
+        self.rpm = float(requests_per_minute)
+        self.tpm = float(tokens_per_minute) if tokens_per_minute else None
+        self._req = self.rpm
+        self._tok = self.tpm or 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        self._req = min(self.rpm, self._req + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tok = min(self.tpm, self._tok + elapsed * self.tpm / 60)
+
+    def try_acquire(self, tokens: int = 0) -> float:
+        """
+        够就扣减并返回 0，不够返回还需等待的秒数。
+        单次请求估算超过整桶容量时按整桶算，避免永远等不到。
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            need_tok = min(tokens, self.tpm) if self.tpm else 0
+            wait = 0.0
+            if self._req < 1:
+                wait = (1 - self._req) * 60 / self.rpm
+            if need_tok and self._tok < need_tok:
+                wait = max(wait, (need_tok - self._tok) * 60 / self.tpm)
+            if wait:
+                return wait
+            self._req -= 1
+            self._tok -= need_tok
+            return 0.0
+
+    async def acquire(self, tokens: int = 0) -> None:
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
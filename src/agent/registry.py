@@ -0,0 +1,28 @@
+"""
+后处理器注册表
+
+dispatch 之后每个分组键（code/doc/image/archive/...）各起一个并发分支，
+分支里按分组键在这里查处理函数。新增类型只要：
+
+    @register_post_processor("image")
+    def post_image(files: List[str], state: dict) -> Optional[List[str]]:
+        ...
+        return errors      # 处理失败的文件各一条说明，全部成功返回 None / []
+
+注意要在 import agent.graph 之前完成注册（或注册后调用 build_graph() 重新编译）。
+没注册的分组不会丢，会在 post_results 里记一条 skipped。
+返回的逐文件错误记进 post_results（部分失败 partial、全部失败 failed），
+两者都会让 run_package 按失败处理（WORKSPACE_KEEP=failed 时保留现场）。
+"""
+from typing import Callable, Dict, List, Optional
+
+PostProcessor = Callable[[List[str], dict], Optional[List[str]]]
+
+POST_PROCESSORS: Dict[str, PostProcessor] = {}
+
+
+def register_post_processor(group: str):
+    def deco(fn: PostProcessor) -> PostProcessor:
+        POST_PROCESSORS[group] = fn
+        return fn
+    return deco
@@ -1,19 +1,93 @@
 """
 全局状态结构声明
 
-LangGraph 的每一个节点都会接收 & 返回这个 TypedDict，
+LangGraph 的每一个节点都会接收这个 TypedDict，返回的是**增量**（只含改动的字段），
 因此所有字段必须提前声明，避免 KeyError。
+带 Annotated reducer 的字段返回的是要追加/累加的部分，其余字段直接覆盖。
+
+每个文件的分类结果用 FileRecord（slots，无 __dict__），十万级成员的包也不会被
+一堆小字典撑爆内存；保留 record["file_path"] / record.get("type") 的字典式读法。
 """
-from typing import List, Dict, TypedDict
+import operator
+import sys
+from dataclasses import dataclass
+from typing import Annotated, Any, List, Dict, Optional, TypedDict
+
+
+@dataclass(slots=True)
+class FileRecord:
+    path: str
+    type: str
+    language: str = ""
+    confidence: float = 0.0
+    size: int = -1          # -1 表示未知（流式模式下还没落盘）
+    hash: str = ""
+
+    # 字典式访问用的旧键名
+    _KEYS = {"file_path": "path"}
+
+    @classmethod
+    def of(cls, path: str, res: dict, size: int = -1, hash: str = "") -> "FileRecord":
+        """分类结果字典 -> 记录；type/language 取值有限，intern 后所有记录共用一份字符串"""
+        try:
+            confidence = float(res.get("confidence") or 0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return cls(path, sys.intern(str(res.get("type") or "unknown")),
+                   sys.intern(str(res.get("language") or "")), confidence, size, hash)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, self._KEYS.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        return {"file_path": self.path, "type": self.type, "language": self.language,
+                "confidence": self.confidence, "size": self.size, "hash": self.hash}
+
+
+def add_counts(a: Optional[Dict[str, int]], b: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """计数 reducer：按键相加，返回新字典（检查点异步落盘，不能原地改）"""
+    out = dict(a or {})
+    for k, n in (b or {}).items():
+        out[k] = out.get(k, 0) + n
+    return out
+
 
 class AgentState(TypedDict):
     scan_dir: str  # 用户选择的文件夹
-    pkg_queue: List[str]  # 待解压的压缩包绝对路径
+    pkg_queue: List[str]  # 扫描出的压缩包绝对路径（扫描后不再改动）
+    pkg_next: int         # 下一个要处理的下标，pkg_queue[pkg_next:] 即剩余队列
     current_pkg: str  # 正在处理的压缩包
     archive_path: str          # 原始压缩包绝对路径
     extract_to: str            # 解压后根目录
     files: List[str]           # 解压出的所有文件完整路径
-    classified: List[dict]     # 每个文件的 LLM 分类结果
+    headers: Dict[str, bytes]  # 流式模式：路径 -> 头部字节（文件尚未落盘）
+    hashes: Dict[str, str]     # 流式 / cas 模式：路径 -> 内容 sha256（cas 下即 blob 地址）
+    streamed: bool             # True 表示 files 还没解压，后处理前按需解出
+    skipped: Annotated[List[dict], operator.add]  # 按解压策略跳过的成员 {name, size, reason}
+    nested: List[dict]         # 展开的内层压缩包 {archive, depth, files}
+    # 每个文件的分类结果（FileRecord；清单里回放的旧结果是同键的字典），
+    # 单包图里 sniff、classify 各追加一部分，批量图里每个包追加一次
+    classified: Annotated[List[FileRecord], operator.add]
     report: str                # 给人看的简要报告（可扩展）
     grouped: Dict[str, List[str]]  # 按类型分组 {type: [path, ...]}
-    group_keys: List[str]      # 分组键列表，供条件边使用
\ No newline at end of file
+    group_keys: List[str]      # 分组键列表，供条件边使用
+    workers: int               # 批量模式并行进程数，1 为串行
+    run_id: str                # 批量运行 id，检查点的 thread_id
+    checkpoint_db: str         # 检查点库路径，空字符串表示不落检查点
+    manifest_path: str         # 增量清单路径，空字符串表示每次全量处理
+    manifest_hash: bool        # mtime 变化时是否再比对内容哈希
+    incremental: bool          # False 时不复用清单结果（仍会写回）
+    pkg_status: Annotated[List[dict], operator.add]  # 每个压缩包的处理状态 {package, status(ok/failed/cached), ...}
+    result_sink: str           # 批量结果输出路径（.jsonl/.csv/.sqlite3），空则结果留在 classified
+    counts: Annotated[Dict[str, int], add_counts]  # 批量计数 {packages, files, ok, failed, cached}
+    # 各后处理分支并发写入，用 reducer 累加 {group, files, status, error, seconds}
+    post_results: Annotated[List[dict], operator.add]
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+监视文件夹（守护模式）：新压缩包一写完就送进单包流水线，不用等下一次批量重跑
+
+事件源：Linux 用 inotify（ctypes 直接调 libc，无额外依赖），其他平台/失败时退回轮询目录。
+"写完"判定：
+- 重命名到位（浏览器 .crdownload/.part -> .zip）或写端关闭（IN_CLOSE_WRITE）：立即就绪
+- 其余情况：大小与 mtime 连续 WATCH_SETTLE 秒不变
+并发上限 = workers，多出来的就绪包在内存队列里排队；结果写进批量清单，
+守护进程重启后清单里指纹没变的包不会重跑。
+每轮处理完（没有在跑和排队的包）回收一次 cas 模式的 blob（见 blobstore.gc）。
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Optional
+
+from .nodes import SUPPORT_SUFFIX, collect_blobs, run_package
+from ..tools.fswatch import WATCH_SETTLE, ReadyTracker, open_source
+from ..tools.manifest import BatchManifest
+from ..utils.logger import get_logger
+from ..utils.workers import set_batch_workers
+
+logger = get_logger(__name__)
+
+WATCH_TICK = float(os.getenv("WATCH_TICK", "0.5"))     # 秒：主循环最长等待
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(SUPPORT_SUFFIX) and not os.path.basename(path).startswith(".")
+
+
+def _failed(pkg: str, e: BaseException) -> dict:
+    return {"package": pkg, "status": "failed", "error": f"{type(e).__name__}: {e}",
+            "files": 0, "skipped": 0, "seconds": 0, "classified": []}
+
+
+def _collect(inflight: Dict[Future, str], manifest: Optional[BatchManifest],
+             on_result: Optional[Callable[[dict], None]], wait: bool) -> int:
+    """收回已完成的包，返回收回的个数"""
+    done = [f for f in inflight if wait or f.done()]
+    for fut in done:
+        pkg = inflight.pop(fut)
+        try:
+            result = fut.result()
+        except Exception as e:       # 子进程崩溃
+            logger.exception("worker crashed: %s", pkg)
+            result = _failed(pkg, e)
+        if manifest and os.path.exists(pkg):
+            manifest.record(pkg, result)
+        logger.info("<<<< %s %s", result["status"], pkg)
+        if on_result:
+            on_result(result)
+    return len(done)
+
+
+def watch(folder: str,
+          handler: Callable[[str], dict] = run_package,
+          workers: int = 2,
+          manifest: Optional[BatchManifest] = None,
+          on_result: Optional[Callable[[dict], None]] = None,
+          stop: Optional[threading.Event] = None,
+          settle: float = WATCH_SETTLE,
+          tick: float = WATCH_TICK,
+          use_inotify: bool = True) -> None:
+    """
+    一直跑到 stop 被置位（或 Ctrl+C）。
+    handler 在子进程里执行，必须是可 pickle 的顶层函数（或其 functools.partial）。
+    启动时目录里已有的包也会处理（清单命中的跳过）。
+    """
+    folder = os.path.abspath(folder)
+    stop = stop or threading.Event()
+    source = open_source(folder, use_inotify)
+    tracker = ReadyTracker(settle)
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if is_archive(path) and os.path.isfile(path):
+            tracker.touch(path)           # 可能还在下载，照样等稳定
+    logger.info("开始监视 %s（%s，workers=%d）", folder, type(source).__name__, workers)
+
+    ready: Deque[str] = deque()
+    inflight: Dict[Future, str] = {}
+    set_batch_workers(workers)       # 包内格式化/文档提取进程池按包数分 CPU
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while not stop.is_set():
+                busy = ready or len(tracker) or inflight
+                for path, done in source.changes(tick if busy else tick * 4):
+                    if is_archive(path):
+                        (tracker.mark_complete if done else tracker.touch)(path)
+
+                for path in tracker.poll():
+                    if path not in ready:
+                        ready.append(path)
+
+                while ready and len(inflight) < workers:
+                    pkg = ready.popleft()
+                    if pkg in inflight.values():     # 处理中又被改写：等这一轮结束再排
+                        ready.append(pkg)
+                        break
+                    try:
+                        if manifest and manifest.lookup(pkg):
+                            logger.info("清单命中，跳过 %s", pkg)
+                            continue
+                    except FileNotFoundError:        # 就绪后又被删/改名走了
+                        logger.info("已不存在，跳过 %s", pkg)
+                        continue
+                    logger.info(">>>> 就绪 %s", pkg)
+                    inflight[pool.submit(handler, pkg)] = pkg
+
+                if _collect(inflight, manifest, on_result, wait=False) and not (ready or inflight):
+                    collect_blobs()          # 一轮处理完
+            _collect(inflight, manifest, on_result, wait=True)   # 停止前把在跑的收完
+    finally:
+        source.close()
@@ -1,21 +1,79 @@
 """
 批量处理入口
 python batch_main.py --dir D:\downloads\pkgs
+python batch_main.py --dir D:\downloads\pkgs --workers 4
+默认增量：<dir>/.tas_manifest.sqlite3 记录处理过的包，重跑只处理新增/变化的包；
+--full 全部重新处理（结果照样写回清单）
+每个包/每个节点都会落检查点，进程被杀后：
+python batch_main.py --dir D:\downloads\pkgs --resume 20250101-120000-abcdef
+守护模式：一直监视 --dir，新包写完几秒内就处理（Ctrl+C 退出）
+python batch_main.py --dir D:\downloads\pkgs --watch --workers 4
+分类结果每处理完一个包就写进 --results（默认 <dir>/.tas_results.jsonl，也可 .csv / .sqlite3），
+运行中途即可查看：
+python batch_main.py --dir D:\downloads\pkgs --results D:\out\results.csv
 """
 import argparse, os, dotenv
-from src.agent.batch_graph import batch_graph
+from functools import partial
+from src.agent.batch_graph import batch_graph, build_batch_graph
+from src.agent.checkpoint import (
+    DEFAULT_DB, get_checkpointer, invoke_resumable, new_run_id, thread_config,
+)
 from src.agent.state import AgentState
+from src.agent.nodes import collect_blobs, run_package
+from src.agent.watch import watch
+from src.tools.manifest import MANIFEST_NAME, BatchManifest
+from src.tools.sinks import open_sink, read_results, reset_sink
+
+RESULTS_NAME = ".tas_results.jsonl"
 
 dotenv.load_dotenv()
 
+def _print_status(p: dict) -> None:
+    print(f"  [{p['status']}] {p['package']} ({p['files']} files, "
+          f"{p.get('skipped', 0)} skipped, {p['seconds']}s)"
+          + (f" {p['error']}" if p["error"] else ""))
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--dir", required=True, help="包含压缩包的文件夹")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并行处理的进程数，默认 1（串行）")
+    parser.add_argument("--full", action="store_true",
+                        help="不复用清单里的结果，全部重新处理")
+    parser.add_argument("--manifest", help="清单路径，默认 <dir>/.tas_manifest.sqlite3")
+    parser.add_argument("--hash", action="store_true",
+                        help="mtime 变化时再比对内容哈希（重新下载的同一文件不重跑）")
+    parser.add_argument("--resume", metavar="RUN_ID", help="从指定运行的检查点继续")
+    parser.add_argument("--checkpoint-db", default=DEFAULT_DB, help="检查点库路径")
+    parser.add_argument("--watch", action="store_true",
+                        help="守护模式：监视 --dir，新压缩包写完立即处理")
+    parser.add_argument("--results",
+                        help="结果输出（.jsonl/.csv/.sqlite3），默认 <dir>/.tas_results.jsonl")
     args = parser.parse_args()
 
+    run_id = args.resume or new_run_id()
+    checkpoint_db = args.checkpoint_db
+    try:
+        graph = build_batch_graph(get_checkpointer(checkpoint_db))
+    except RuntimeError as e:
+        if args.resume:
+            parser.error(str(e))
+        print(f"[warn] {e}，本次不落检查点")
+        graph, checkpoint_db = batch_graph, ""
+
+    scan_dir = os.path.abspath(args.dir)
+    results = os.path.abspath(args.results or os.path.join(scan_dir, RESULTS_NAME))
+    try:
+        open_sink(results).close()
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.resume:
+        reset_sink(results)             # 续跑接着写，新运行从头写
+
     state: AgentState = {
-        "scan_dir": os.path.abspath(args.dir),
+        "scan_dir": scan_dir,
         "pkg_queue": [],
+        "pkg_next": 0,
         "current_pkg": "",
         # 其余字段初始空
         "archive_path": "",
@@ -25,11 +83,51 @@ def main():
         "report": "",
         "grouped": {},
         "group_keys": [],
+        "workers": max(1, args.workers),
+        "manifest_path": args.manifest or os.path.join(scan_dir, MANIFEST_NAME),
+        "manifest_hash": args.hash,
+        "incremental": not args.full,
+        "run_id": run_id,
+        "checkpoint_db": checkpoint_db,
+        "pkg_status": [],
+        "result_sink": results,
+        "counts": {},
     }
 
-    final = batch_graph.invoke(state)
-    print(f"处理完成！共识别 {len(final['classified'])} 个文件")
-    for item in final["classified"]:
+    if args.watch:
+        handler = partial(run_package, run_id=run_id, checkpoint_db=checkpoint_db)
+        manifest = BatchManifest(state["manifest_path"], use_hash=args.hash)
+        sink = open_sink(results)
+
+        def _on_result(p: dict) -> None:
+            p = dict(p)
+            sink.write(p, p.pop("classified"))
+            _print_status(p)
+
+        print(f"结果写入: {results}")
+        try:
+            watch(scan_dir, handler=handler, workers=state["workers"],
+                  manifest=None if args.full else manifest, on_result=_on_result)
+        except KeyboardInterrupt:
+            print("已停止监视")
+        finally:
+            sink.close()
+        return
+
+    if args.resume and not graph.get_state(thread_config(run_id)).values:
+        parser.error(f"找不到运行 {run_id} 的检查点: {checkpoint_db}")
+    if checkpoint_db:
+        print(f"run id: {run_id}（中断后可加 --resume {run_id} 续跑）")
+        final = invoke_resumable(graph, state, run_id)
+    else:
+        final = graph.invoke(state)
+    collect_blobs()
+    counts = final.get("counts") or {}
+    print(f"处理完成！共 {counts.get('packages', 0)} 个压缩包，失败 {counts.get('failed', 0)} 个，"
+          f"共识别 {counts.get('files', 0)} 个文件，结果: {results}")
+    for p in final["pkg_status"]:
+        _print_status(p)
+    for item in read_results(results):
         print(f"  {item['file_path']} -> {item['type']}")
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@
 
 支持命令行：
 python main.py --zip xxx.zip
+python main.py --zip xxx.zip --keep      # 保留解压目录（默认处理完即删除）
 """
 import argparse
 import os
@@ -14,17 +15,24 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from agent.graph import graph
 from agent.state import AgentState
+from tools.workspace import get_workspace
 
 load_dotenv()
 
 def main():
     parser = argparse.ArgumentParser(description="AI 自动解压-分类-处理 Agent")
     parser.add_argument("--zip", required=True, help="zip/rar 压缩包路径")
+    parser.add_argument("--keep", action="store_true", help="处理完保留解压目录")
     args = parser.parse_args()
 
+    workspace = get_workspace()
+    if args.keep:
+        workspace.keep = "always"
+    work_dir = workspace.acquire(os.path.abspath(args.zip))
+
     state: AgentState = {
         "archive_path": os.path.abspath(args.zip),
-        "extract_to": os.path.join(os.getcwd(), "tmp"),
+        "extract_to": work_dir,
         "files": [],
         "classified": [],
         "report": "",
@@ -32,7 +40,13 @@ def main():
         "group_keys": [],
     }
 
-    final_state = graph.invoke(state)
+    ok = False
+    try:
+        final_state = graph.invoke(state)
+        ok = True
+    finally:
+        if workspace.release(work_dir, ok=ok, reason=args.zip):
+            print(f"解压目录已保留: {work_dir}")
     print(final_state["report"])
     return 0
 
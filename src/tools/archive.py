@@ -1,50 +1,490 @@
 """
 解压工具封装
 
-支持 zip/rar/7z/tar 等，底层用 pyunpack + patool，
-Windows 需提前安装 7-Zip 或 WinRAR 并加入 PATH。
-"""
-# import os
-# import uuid
-# from pyunpack import Archive
-#
-# def extract_archive(file_path: str, dest_parent: str) -> str:
-#     """
-#     :param file_path: 压缩包绝对路径
-#     :param dest_parent: 解压到哪个目录
-#     :return: 实际解压目录（含随机子目录，防冲突）
-#     """
-#     dest = os.path.join(dest_parent, uuid.uuid4().hex)
-#     os.makedirs(dest, exist_ok=True)
-#     Archive(file_path).extractall(dest)
-#     return dest
+按魔数识别格式（不看后缀），再从后端注册表里挑第一个可用的后端：
+  - zip / tar(.gz/.bz2/.xz) / 单文件 gz/bz2/xz：标准库进程内解压，分块流式写盘
+  - rar：pip install rarfile（进程内读取，底层仍需 unrar）
+  - 其余：系统 7z / 7zz / 7za、unrar、bsdtar；Windows 下用内嵌的 bin/7z.exe
 
+扩展：
+  register_backend(MyBackend())        # 插到最前，优先使用
+
+另提供流式读取：不落盘，逐个成员只读头部字节（并顺带算内容哈希），
+分类完只把后处理真正需要的成员解出来（extract_members）。
+不支持流式读取的格式抛 UnsupportedArchive，调用方回退到整包解压。
 """
-解压工具（内嵌 7-Zip，不依赖系统 PATH）
-"""
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import shutil
 import subprocess
+import sys
+import tarfile
+import tempfile
 import uuid
+import zipfile
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..utils.hashing import CHUNK_SIZE
+from .blobstore import BlobStore, ingest_tree
+from .filters import ExtractPolicy, apply_policy
+from ..utils.logger import get_logger
+from ..utils.validators import safe_path
+
+logger = get_logger(__name__)
 
 # 1. 先拿到本文件所在目录
 _HERE = Path(__file__).parent.resolve()
-# 2. 再拼 bin 子目录
+# 2. 再拼 bin 子目录（仅 Windows 可用）
 _7Z_EXE = _HERE / "bin" / "7z.exe"
 
-def extract_archive(file_path: str, dest_parent: str) -> str:
+HEADER_SIZE = 512
+
+
+class UnsupportedArchive(Exception):
+    """没有可用后端，或该格式不支持流式读取"""
+
+
+@dataclass
+class ArchiveMember:
+    name: str          # 包内相对路径（/ 分隔）
+    size: int
+    header: bytes = b""
+    digest: str = ""   # 内容 sha256，with_digest=False 时为空
+
+
+# (成员名, 大小, 打开函数)
+MemberEntry = Tuple[str, int, Callable]
+
+
+# ---------- 格式识别 ----------
+_MAGIC = [
+    (b"PK\x03\x04", "zip"),
+    (b"PK\x05\x06", "zip"),
+    (b"Rar!\x1a\x07", "rar"),
+    (b"7z\xbc\xaf\x27\x1c", "7z"),
+    (b"\x1f\x8b", "gz"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+]
+
+def detect_format(source: Union[str, BinaryIO]) -> Optional[str]:
+    """
+    按魔数识别：zip / rar / 7z / tar / tar.gz / tar.bz2 / tar.xz / gz / bz2 / xz。
+    source 可以是路径，也可以是可 seek 的文件对象（内存里的内层压缩包）。
+    识别不了返回 None。
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            head = f.read(262)
+    else:
+        source.seek(0)
+        head = source.read(262)
+        source.seek(0)
+    if head[257:262] == b"ustar":
+        return "tar"
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            if fmt in ("gz", "bz2", "xz") and _is_tar(source):
+                return f"tar.{fmt}"
+            return fmt
+    # 老式 v7 tar 没有 ustar 标记，只能让 tarfile 试
+    if _is_tar(source):
+        return "tar"
+    return None
+
+
+def _is_tar(source: Union[str, BinaryIO]) -> bool:
+    try:
+        return tarfile.is_tarfile(source)
+    finally:
+        if not isinstance(source, str):
+            source.seek(0)
+
+
+def member_path(dest: str, name: str) -> Optional[str]:
+    """包内路径映射到磁盘路径；../ 越界返回 None"""
+    target = os.path.join(dest, *[p for p in name.split("/") if p not in ("", ".")])
+    if not safe_path(target, dest) or os.path.abspath(target) == os.path.abspath(dest):
+        return None
+    return target
+
+def _copy_out(opener: Callable, target: str) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with opener() as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+# ---------- 后端 ----------
+class ArchiveBackend:
+    """
+    后端基类。
+    formats：支持的格式；streaming=True 的后端实现 open_members，可流式读取。
+    """
+    name = "base"
+    formats: frozenset = frozenset()
+    streaming = False
+
+    def available(self) -> bool:
+        return True
+
+    def open_members(self, file_path: Union[str, BinaryIO]) -> Tuple[object, List[MemberEntry]]:
+        """返回 (可 with 的容器, 成员列表)；目录项已过滤。file_path 也可以是文件对象"""
+        raise UnsupportedArchive(f"{self.name} 不支持流式读取")
+
+    def list(self, file_path: str) -> List[Tuple[str, int]]:
+        """包内清单 [(成员名, 大小)]，不解压"""
+        container, members = self.open_members(file_path)
+        with container:
+            return [(name, size) for name, size, _ in members]
+
+    def extract_selected(self, file_path: str, names: List[str], dest: str) -> List[str]:
+        """只解出指定成员，返回落盘路径；越界成员跳过"""
+        wanted = set(names)
+        out = []
+        container, members = self.open_members(file_path)
+        with container:
+            for name, _, opener in members:
+                if name not in wanted:
+                    continue
+                target = member_path(dest, name)
+                if target is None:
+                    logger.warning("skip unsafe member %s in %s", name, file_path)
+                    continue
+                _copy_out(opener, target)
+                out.append(target)
+        return out
+
+    def extract_all(self, file_path: str, dest: str) -> None:
+        self.extract_selected(file_path, [n for n, _ in self.list(file_path)], dest)
+
+
+def _zip_name(info: zipfile.ZipInfo) -> str:
+    """没打 UTF-8 标记的 zip（Windows 压缩软件常见）文件名多半是 GBK"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+class ZipBackend(ArchiveBackend):
+    name = "zipfile"
+    formats = frozenset({"zip"})
+    streaming = True
+
+    def open_members(self, file_path):
+        zf = zipfile.ZipFile(file_path)
+        return zf, [(_zip_name(i), i.file_size, lambda i=i: zf.open(i))
+                    for i in zf.infolist() if not i.is_dir()]
+
+
+class TarBackend(ArchiveBackend):
+    name = "tarfile"
+    formats = frozenset({"tar", "tar.gz", "tar.bz2", "tar.xz"})
+    streaming = True
+
+    def open_members(self, file_path):
+        tf = (tarfile.open(file_path, "r:*") if isinstance(file_path, str)
+              else tarfile.open(fileobj=file_path, mode="r:*"))
+        # 只要普通文件：软链接/设备文件一律不解
+        return tf, [(m.name, m.size, lambda m=m: tf.extractfile(m))
+                    for m in tf.getmembers() if m.isfile()]
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class CompressedFileBackend(ArchiveBackend):
+    """单文件 .gz/.bz2/.xz：成员名取去掉压缩后缀的文件名"""
+    name = "compressed-file"
+    formats = frozenset({"gz", "bz2", "xz"})
+    streaming = True
+    _OPEN = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+    def open_members(self, file_path):
+        fmt = detect_format(file_path)
+        stem = Path(file_path if isinstance(file_path, str)
+                    else getattr(file_path, "name", "data")).name
+        for suffix in (".gz", ".bz2", ".xz", ".tgz"):
+            if stem.lower().endswith(suffix):
+                stem = stem[: -len(suffix)] + (".tar" if suffix == ".tgz" else "")
+                break
+        opener = self._OPEN[fmt]
+
+        def _open():
+            if not isinstance(file_path, str):
+                file_path.seek(0)
+            return opener(file_path, "rb")
+        return _NullContext(), [(stem or "data", -1, _open)]
+
+
+class RarfileBackend(ArchiveBackend):
+    name = "rarfile"
+    formats = frozenset({"rar"})
+    streaming = True
+
+    def available(self) -> bool:
+        try:
+            import rarfile  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def open_members(self, file_path):
+        import rarfile
+        rf = rarfile.RarFile(file_path)
+        return rf, [(i.filename, i.file_size, lambda i=i: rf.open(i))
+                    for i in rf.infolist() if not i.is_dir()]
+
+
+class CliBackend(ArchiveBackend):
+    """外部命令后端：argv 模板里 {exe} {archive} {dest} 会被替换"""
+
+    def __init__(self, name: str, executables: List[str], argv: List[str],
+                 formats: frozenset):
+        self.name = name
+        self.executables = executables
+        self.argv = argv
+        self.formats = formats
+
+    def _exe(self) -> Optional[str]:
+        for exe in self.executables:
+            found = shutil.which(exe) or (exe if os.path.isfile(exe) else None)
+            if found:
+                return found
+        return None
+
+    def available(self) -> bool:
+        return self._exe() is not None
+
+    def _run(self, argv: List[str], **fmt) -> str:
+        cmd = [a.format(exe=self._exe(), **fmt) for a in argv]
+        try:
+            return subprocess.run(cmd, check=True, capture_output=True, text=True,
+                                  encoding="utf-8", errors="replace").stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"{self.name} 解压失败: {e.stderr}") from e
+
+    def list(self, file_path):
+        raise UnsupportedArchive(f"{self.name} 不支持列清单")
+
+    def extract_selected(self, file_path, names, dest):
+        raise UnsupportedArchive(f"{self.name} 不支持按成员解压")
+
+    def extract_all(self, file_path, dest):
+        self._run(self.argv, archive=file_path, dest=dest)
+
+
+class SevenZipCliBackend(CliBackend):
+    """7-Zip 命令行：l -slt 列清单，@listfile 按成员解压（不受命令行长度限制）"""
+
+    def __init__(self, executables: List[str]):
+        super().__init__("7z", executables, ["{exe}", "x", "-o{dest}", "-y", "{archive}"],
+                         _ALL_FORMATS)
+
+    def list(self, file_path):
+        out = self._run(["{exe}", "l", "-slt", "-sccUTF-8", "{archive}"], archive=file_path)
+        # 清单在 "----------" 之后，每个成员一段 "Key = Value"，空行分隔
+        body = out.split("\n----------\n", 1)[-1]
+        entries = []
+        for block in body.split("\n\n"):
+            kv = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+            if "Path" not in kv or kv.get("Folder") == "+" or "D" in kv.get("Attributes", ""):
+                continue
+            entries.append((kv["Path"].replace("\\", "/"), int(kv.get("Size") or -1)))
+        return entries
+
+    def extract_selected(self, file_path, names, dest):
+        fd, listfile = tempfile.mkstemp(suffix=".txt")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write("\n".join(names))
+            self._run(["{exe}", "x", "-o{dest}", "-y", "-scsUTF-8", "{archive}",
+                       "@{listfile}"], archive=file_path, dest=dest, listfile=listfile)
+        finally:
+            os.unlink(listfile)
+        return [t for t in (member_path(dest, n) for n in names)
+                if t and os.path.isfile(t)]
+
+
+# Windows 优先用内嵌 7z.exe（不依赖 PATH），其它系统找系统安装的 7-Zip
+_7Z_CANDIDATES = ([str(_7Z_EXE)] if sys.platform == "win32" else []) + ["7z", "7zz", "7za"]
+_ALL_FORMATS = frozenset({"zip", "rar", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz",
+                          "gz", "bz2", "xz"})
+
+# 注册表：按顺序挑第一个 available() 且支持该格式的后端
+BACKENDS: List[ArchiveBackend] = [
+    ZipBackend(),
+    TarBackend(),
+    CompressedFileBackend(),
+    RarfileBackend(),
+    SevenZipCliBackend(_7Z_CANDIDATES),
+    CliBackend("unrar", ["unrar"], ["{exe}", "x", "-o+", "-y", "{archive}", "{dest}/"],
+               frozenset({"rar"})),
+    CliBackend("bsdtar", ["bsdtar"], ["{exe}", "-xf", "{archive}", "-C", "{dest}"],
+               frozenset({"zip", "rar", "7z", "tar", "tar.gz", "tar.bz2", "tar.xz"})),
+]
+
+def register_backend(backend: ArchiveBackend, first: bool = True) -> None:
+    if first:
+        BACKENDS.insert(0, backend)
+    else:
+        BACKENDS.append(backend)
+
+def get_backend(fmt: Optional[str], streaming: bool = False) -> ArchiveBackend:
+    for b in BACKENDS:
+        if fmt in b.formats and (b.streaming or not streaming) and b.available():
+            return b
+    raise UnsupportedArchive(f"没有可用的{'流式' if streaming else ''}解压后端: {fmt}")
+
+def _try_backends(file_path: str, op: str, *args):
+    """按注册顺序找第一个支持 op（list / extract_selected）的后端"""
+    fmt = detect_format(file_path)
+    for b in BACKENDS:
+        if fmt in b.formats and b.available():
+            try:
+                return getattr(b, op)(file_path, *args)
+            except UnsupportedArchive:
+                continue
+    raise UnsupportedArchive(f"没有后端支持 {op}: {fmt}")
+
+
+# ---------- 整包解压 ----------
+def new_extract_dir(dest_parent: str) -> Path:
+    """每个包一个随机子目录，防冲突"""
     dest = Path(dest_parent) / uuid.uuid4().hex
     dest.mkdir(parents=True, exist_ok=True)
+    return dest
 
-    cmd = [
-        str(_7Z_EXE),      # 绝对路径调用
-        "x",
-        f"-o{dest}",
-        "-y",
-        file_path,
-    ]
+def extract_archive(file_path: str, dest_parent: str) -> str:
+    """
+    :param file_path: 压缩包绝对路径
+    :param dest_parent: 解压到哪个目录
+    :return: 实际解压目录（含随机子目录，防冲突）
+    """
+    fmt = detect_format(file_path)
+    backend = get_backend(fmt)
+    dest = new_extract_dir(dest_parent)
+    logger.info("extract %s as %s via %s", file_path, fmt, backend.name)
+    backend.extract_all(file_path, str(dest))
+    return str(dest)
+
+def extract_filtered(file_path: str, dest_parent: str,
+                     policy: ExtractPolicy) -> Tuple[str, List[dict]]:
+    """
+    先列清单、按策略过滤，再只解出保留的成员。
+    后端列不了清单时退回整包解压，再按同一策略删掉多余文件（跳过记录照样返回）。
+    :return: (解压目录, 跳过的成员 [{name, size, reason}])
+    """
+    try:
+        entries = list_members(file_path)
+    except UnsupportedArchive:
+        entries = None
+    if entries is not None:
+        kept, skipped = apply_policy(entries, policy)
+        dest = new_extract_dir(dest_parent)
+        try:
+            extract_members(file_path, kept, str(dest))
+            return str(dest), skipped
+        except UnsupportedArchive:
+            shutil.rmtree(dest, ignore_errors=True)
+
+    dest = extract_archive(file_path, dest_parent)
+    on_disk = []
+    for root, _, fs in os.walk(dest):
+        for f in fs:
+            full = os.path.join(root, f)
+            on_disk.append((Path(os.path.relpath(full, dest)).as_posix(),
+                            os.path.getsize(full)))
+    _, skipped = apply_policy(on_disk, policy)
+    for item in skipped:
+        os.unlink(os.path.join(dest, *item["name"].split("/")))
+    return dest, skipped
+
+def extract_deduped(file_path: str, dest_parent: str, store: BlobStore,
+                    policy: Optional[ExtractPolicy] = None
+                    ) -> Tuple[str, Dict[str, str], List[dict]]:
+    """
+    内容寻址解压：成员内容进 blob 存储，目录树用 reflink/硬链接建出来。
+    支持流式读取的格式边解边入库；其余格式整包解压后再逐个入库换成链接。
+    :return: (解压目录, {落盘路径: sha256}, 跳过的成员)
+    """
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"7-Zip 解压失败: {e.stderr}") from e
+        backend = get_backend(detect_format(file_path), streaming=True)
+    except UnsupportedArchive:
+        backend = None
+    if backend is None:
+        if policy:
+            dest, skipped = extract_filtered(file_path, dest_parent, policy)
+        else:
+            dest, skipped = extract_archive(file_path, dest_parent), []
+        return dest, ingest_tree(dest, store), skipped
+
+    dest = str(new_extract_dir(dest_parent))
+    hashes: Dict[str, str] = {}
+    skipped: List[dict] = []
+    container, members = backend.open_members(file_path)
+    with container:
+        if policy:
+            kept, skipped = apply_policy([(n, s) for n, s, _ in members], policy)
+            kept = set(kept)
+            members = [m for m in members if m[0] in kept]
+        for name, _, opener in members:
+            target = member_path(dest, name)
+            if target is None:
+                logger.warning("skip unsafe member %s in %s", name, file_path)
+                continue
+            with opener() as fp:
+                digest = store.put_stream(fp)
+            store.materialize(digest, target)
+            hashes[target] = digest
+    return dest, hashes, skipped
+
+
+# ---------- 流式读取 ----------
+def _read_member(fp, with_digest: bool, header_size: int):
+    """从成员文件对象里读头部；需要哈希时把剩余内容分块读完（只在内存里过一遍）"""
+    header = fp.read(header_size)
+    if not with_digest:
+        return header, ""
+    h = hashlib.sha256(header)
+    for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+    return header, h.hexdigest()
+
+def list_members(file_path: str) -> List[Tuple[str, int]]:
+    """包内清单 [(成员名, 大小)]，不解压"""
+    return _try_backends(file_path, "list")
+
+def iter_members(file_path: str, header_size: int = HEADER_SIZE,
+                 with_digest: bool = True,
+                 only: Optional[Iterable[str]] = None) -> Iterator[ArchiveMember]:
+    """逐个成员读头部（和哈希），全程不写盘；only 给定时只读这些成员"""
+    only = set(only) if only is not None else None
+    backend = get_backend(detect_format(file_path), streaming=True)
+    container, members = backend.open_members(file_path)
+    with container:
+        for name, size, opener in members:
+            if only is not None and name not in only:
+                continue
+            with opener() as fp:
+                header, digest = _read_member(fp, with_digest, header_size)
+            yield ArchiveMember(name, size, header, digest)
 
-    return str(dest)
\ No newline at end of file
+def extract_members(file_path: str, names: List[str], dest: str) -> List[str]:
+    """
+    只解出指定成员（流式分块写盘），返回落盘后的完整路径。
+    越界路径（../ 之类）直接跳过。
+    """
+    return _try_backends(file_path, "extract_selected", names, dest)
@@ -1,18 +1,32 @@
 import asyncio
 import base64
+import json
 import logging
 import os
 import sys
 import shutil
-import glob
 import time
+from typing import List, Optional
 import cv2
+import dotenv
 import numpy as np
 from browser_use import Agent, BrowserSession, Tools, ChatBrowserUse, BrowserProfile
 from browser_use.agent.views import ActionResult
-from playwright.async_api import Page, Frame, async_playwright
+from playwright.async_api import Page, Frame
 from pydantic import BaseModel, Field
 
+# 直接 python auto_login_and_download.py 运行时把仓库根目录加入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.tools.course_sync import (
+    COURSE_CONCURRENCY, collect_file_links, load_courses, print_results, state_is_fresh,
+    sync_semester,
+)
+from src.tools.downloads import DownloadEvents, Downloaded, wait_for_downloads
+from src.tools.side_channel import close_all, current_channel, get_side_channel
+from src.tools.slider import SliderSolver
+from src.tools.sync import SyncReport, async_sync
+from src.utils.hashing import sha256_file
+
 # 日志配置
 logging.basicConfig(
     level=logging.INFO,
@@ -22,171 +36,103 @@ logging.basicConfig(
 )
 LOG = logging.getLogger("RobotDebug")
 
-def move_downloaded_files(target_dir: str, start_time: float, source_dir: str = None, timeout: int = 60):
+def _move_to(target_dir: str, file_path: str) -> str:
+    """移动到目标目录；同名同内容直接丢弃新下载的，同名不同内容才加时间戳，返回最终路径"""
+    filename = os.path.basename(file_path)
+    target_path = os.path.join(target_dir, filename)
+    if os.path.exists(target_path) and sha256_file(target_path) == sha256_file(file_path):
+        os.remove(file_path)
+        return target_path
+    if os.path.exists(target_path):
+        name, ext = os.path.splitext(filename)
+        timestamp = int(time.time())
+        target_path = os.path.join(target_dir, f"{name}_{timestamp}{ext}")
+    shutil.move(file_path, target_path)
+    return target_path
+
+
+def move_downloaded_files(target_dir: str, start_time: float, source_dir: str = None,
+                          timeout: int = 60, expected: int = 0,
+                          events: Optional[DownloadEvents] = None) -> List[Downloaded]:
     """
-    移动自 start_time 之后在源目录中生成的所有文件到目标目录。
+    等 start_time 之后开始的下载全部完成（靠目录事件，下完立即返回），移动到目标目录。
 
     :param target_dir: 目标文件夹路径
     :param start_time: 任务开始的时间戳 (time.time())
     :param source_dir: 浏览器默认下载目录 (默认自动获取)
-    :param timeout: 等待下载完成的最大秒数
+    :param timeout: 多少秒没有任何下载进展就放弃（大文件只要还在增长就一直等）
+    :param expected: 已知文件个数时传入，凑齐立即返回
+    :param events: 旁路连接的 CDP 下载事件（channel.downloads），有就不用扫目录
+    :return: 每个文件移动后的最终路径与大小
     """
     # 1. 确定源目录
     if not source_dir:
         source_dir = os.path.join(os.path.expanduser("~"), "Downloads")
 
-    print(f"📂 [文件处理] 正在扫描新文件... (时间阈值: {time.strftime('%H:%M:%S', time.localtime(start_time))})")
+    print(f"📂 [文件处理] 等待下载完成... (时间阈值: {time.strftime('%H:%M:%S', time.localtime(start_time))})")
 
     # 确保目标目录存在
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-
-    moved_count = 0
-    wait_start = time.time()
-
-    while True:
-        # 获取源目录下所有文件
-        all_files = glob.glob(os.path.join(source_dir, '*'))
-
-        # 筛选出：任务开始后创建的 + 不是文件夹的文件
-        new_files = []
-        for f in all_files:
-            try:
-                # 注意：Windows下 getctime 是创建时间
-                if os.path.isfile(f) and os.path.getctime(f) > start_time:
-                    new_files.append(f)
-            except Exception:
-                continue  # 忽略无法读取的文件
-
-        if not new_files:
-            # 如果超时还没找到文件，退出
-            if time.time() - wait_start > timeout:
-                print("⚠️ [文件处理] 超时：未检测到任何新下载的文件。")
-                break
-            time.sleep(1)
-            continue
-
-        # 检查是否有文件正在下载 (以 .crdownload, .tmp, .part 结尾)
-        downloading_files = [f for f in new_files if f.endswith(('.crdownload', '.tmp', '.part'))]
-
-        if downloading_files:
-            # 如果还有文件在下载，继续等待
-            if time.time() - wait_start > timeout:
-                print(f"⚠️ [文件处理] 等待下载完成超时，剩余未完成文件: {downloading_files}")
-                break
-            print(f"   ⏳ 正在下载 {len(downloading_files)} 个文件，等待完成...")
-            time.sleep(2)
-            continue
+    os.makedirs(target_dir, exist_ok=True)
 
-        # --- 所有文件均已就绪，开始移动 ---
-        print(f"✅ 检测到 {len(new_files)} 个新文件，准备移动...")
-
-        for file_path in new_files:
-            filename = os.path.basename(file_path)
-            target_path = os.path.join(target_dir, filename)
-
-            # 处理重名：若目标存在同名文件，添加时间戳
-            if os.path.exists(target_path):
-                name, ext = os.path.splitext(filename)
-                timestamp = int(time.time())
-                target_path = os.path.join(target_dir, f"{name}_{timestamp}{ext}")
+    finished = wait_for_downloads(source_dir, start_time, expected=expected, idle_timeout=timeout,
+                                  events=events)
+    if not finished:
+        print("⚠️ [文件处理] 超时：未检测到任何新下载的文件。")
+        return []
 
+    # 源目录就是目标目录（浏览器直接下到 DOWNLOAD_DIR）时不用再搬
+    if os.path.abspath(source_dir) == os.path.abspath(target_dir):
+        moved = finished
+    else:
+        moved = []
+        for item in finished:
             try:
-                shutil.move(file_path, target_path)
-                print(f"   -> 已移动: {filename}")
-                moved_count += 1
+                moved.append(Downloaded(_move_to(target_dir, item.path), item.size))
             except Exception as e:
-                print(f"   ❌ 移动失败 {filename}: {e}")
+                print(f"   ❌ 移动失败 {os.path.basename(item.path)}: {e}")
+
+    for item in moved:
+        print(f"   -> {item.path} ({item.size} bytes)")
+    print(f"🎉 [文件处理] 完成，共 {len(moved)} 个文件。")
+    return moved
 
-        break  # 移动完成后退出循环
 
-    print(f"🎉 [文件处理] 完成，共移动 {moved_count} 个文件。")
 def move_latest_file_to_target(target_dir: str, source_dir: str = None, timeout: int = 30):
     """
-    将源目录（默认为系统下载文件夹）中最新下载的文件移动到目标目录。
+    等下一个下载完成，把它移动到目标目录。
 
     :param target_dir: 最终文件要存放的目录
     :param source_dir: 浏览器默认下载路径 (如果不传，自动获取当前用户的 Downloads 目录)
-    :param timeout: 等待文件下载完成的最大秒数
+    :param timeout: 多少秒没有任何下载进展就放弃
+    :return: 移动后的 Downloaded，超时返回 None
     """
-    # 1. 确定源目录
-    if not source_dir:
-        # 自动获取系统默认下载路径 (Windows/Mac/Linux 通用)
-        source_dir = os.path.join(os.path.expanduser("~"), "Downloads")
-
-    print(f"📂 [文件处理] 正在扫描源目录: {source_dir}")
-
-    # 2. 循环检测最新文件
-    start_time = time.time()
-    target_file = None
-
-    while time.time() - start_time < timeout:
-        # 获取目录下所有文件
-        list_of_files = glob.glob(os.path.join(source_dir, '*'))
-
-        if not list_of_files:
-            print("   ⏳ 目录为空，等待中...")
-            time.sleep(1)
-            continue
-
-        # 按修改时间排序，获取最新的文件
-        latest_file = max(list_of_files, key=os.path.getctime)
-        filename = os.path.basename(latest_file)
-
-        # 排除非文件类型（如文件夹）
-        if not os.path.isfile(latest_file):
-            continue
-
-        # 3. 检查是否正在下载 (.crdownload 为 Chrome/Edge 临时后缀, .part 为 Firefox)
-        if filename.endswith('.crdownload') or filename.endswith('.tmp') or filename.endswith('.part'):
-            print(f"   ⏳ 文件正在下载中: {filename}，等待完成...")
-            time.sleep(1)
-            continue
-
-        # 检查文件是否是最近生成的（防止移动了几天前的旧文件）
-        # 这里设定为只移动最近 2 分钟内创建/修改的文件
-        if time.time() - os.path.getctime(latest_file) > 120:
-            print(f"   ⚠️ 发现的最新文件 [{filename}] 是旧文件，继续等待新下载...")
-            time.sleep(1)
-            continue
-
-        target_file = latest_file
-        break
-
-    if not target_file:
-        print("❌ [文件处理] 超时：未找到新下载的文件。")
-        return
-
-    # 4. 准备移动
-    if not os.path.exists(target_dir):
-        os.makedirs(target_dir)
-
-    target_path = os.path.join(target_dir, os.path.basename(target_file))
-
-    # 5. 处理重名文件 (添加时间戳)
-    if os.path.exists(target_path):
-        name, ext = os.path.splitext(os.path.basename(target_file))
-        timestamp = int(time.time())
-        target_path = os.path.join(target_dir, f"{name}_{timestamp}{ext}")
-
-    try:
-        # 使用 shutil.move 移动文件
-        shutil.move(target_file, target_path)
-        print(f"✅ [文件处理] 成功将文件移动到: {target_path}")
-    except Exception as e:
-        print(f"❌ [文件处理] 移动失败: {e}")
+    # 只认最近 2 分钟内开始的下载（防止移动了几天前的旧文件）
+    moved = move_downloaded_files(target_dir, time.time() - 120, source_dir,
+                                  timeout=timeout, expected=1)
+    return max(moved, key=lambda d: os.path.getctime(d.path)) if moved else None
 
 # ================= 配置区域 =================
 # 下载路径 (确保路径存在)
 DOWNLOAD_DIR = 'D:/Code/Python/西电资料'
+# 1：agent 只负责登录和导航，文件由 HTTP 下载器直接并发拉取；0：让 agent 点"批量下载"
+DIRECT_DOWNLOAD = os.getenv("DIRECT_DOWNLOAD", "1") == "1"
+# 登录态保存位置（多课程同步时只登录一次，各课程共享）
+STATE_PATH = os.getenv("TAS_STATE_PATH", 'D:/Code/Python/UserData/storage_state.json')
 # 指定一个用于存放浏览器缓存和用户数据的目录
 USER_DATA_DIR = 'D:/Code/Python/UserData/browser_data'
+# 统一认证账号密码：从环境变量 / .env 读（XDSPOC_USERNAME、XDSPOC_PASSWORD），不写进代码
+dotenv.load_dotenv()
+LOGIN_USERNAME = os.getenv("XDSPOC_USERNAME", "")
+LOGIN_PASSWORD = os.getenv("XDSPOC_PASSWORD", "")
+
+
+def login_credentials() -> str:
+    """给 agent 提示词用的"账号: xxx, 密码: xxx"；没配置就直接报错，不让 agent 瞎试"""
+    if not LOGIN_USERNAME or not LOGIN_PASSWORD:
+        raise RuntimeError("请在环境变量或 .env 里设置 XDSPOC_USERNAME / XDSPOC_PASSWORD")
+    return f"账号: {LOGIN_USERNAME}, 密码: {LOGIN_PASSWORD}"
 
 
-# ================= 全局变量 (用于旁路连接) =================
-side_playwright = None
-side_browser = None
-side_context = None
 # ================= 核心修复：系统提示词 =================
 extend_system_message = """
 # 核心指令：验证码处理与文件下载
@@ -208,19 +154,7 @@ async def get_base64_img(target: Page | Frame, selector: str) -> np.ndarray:
     header, data = src.split(',', 1)
     img_bytes = base64.b64decode(data)
     img_np = np.frombuffer(img_bytes, np.uint8)
-    return cv2.imdecode(img_np, cv2.IMREAD_COLOR)
-
-
-class SliderSolver:
-    @staticmethod
-    def identify_gap(bg_img: np.ndarray, slider_img: np.ndarray) -> float:
-        bg_gray = cv2.cvtColor(bg_img, cv2.COLOR_BGR2GRAY)
-        slider_gray = cv2.cvtColor(slider_img, cv2.COLOR_BGR2GRAY)
-        bg_edge = cv2.Canny(bg_gray, 100, 200)
-        slider_edge = cv2.Canny(slider_gray, 100, 200)
-        result = cv2.matchTemplate(bg_edge, slider_edge, cv2.TM_CCOEFF_NORMED)
-        _, _, _, max_loc = cv2.minMaxLoc(result)
-        return float(max_loc[0])
+    return cv2.imdecode(img_np, cv2.IMREAD_UNCHANGED)   # 保留透明通道，识别时用来定位拼图块
 
 
 tools = Tools()
@@ -229,26 +163,10 @@ tools = Tools()
 # ================= 工具定义 =================
 async def init_side_playwright(cdp_url: str):
     """
-    连接到 browser-use 已经打开的浏览器
+    连接到 browser-use 已经打开的浏览器（常驻复用，断了自动重连）
     """
-    global side_playwright, side_browser, side_context
     try:
-        if side_context:
-            return side_context
-
-        LOG.info(f"🔌 正在建立 Playwright 旁路连接 (CDP: {cdp_url})...")
-        side_playwright = await async_playwright().start()
-        # 连接到现有的 CDP
-        side_browser = await side_playwright.chromium.connect_over_cdp(cdp_url)
-
-        # 获取上下文
-        if side_browser.contexts:
-            side_context = side_browser.contexts[0]
-        else:
-            side_context = await side_browser.new_context()
-
-        LOG.info("✅ 旁路连接建立成功，已获取 Context，")
-        return side_context
+        return await get_side_channel(cdp_url).context()
     except Exception as e:
         LOG.error(f"❌ 建立旁路连接失败: {e}")
         return None
@@ -256,14 +174,38 @@ async def init_side_playwright(cdp_url: str):
 
 async def get_latest_page_from_side_context():
     """从旁路 Context 中获取最新活动的页面"""
-    if not side_context:
+    channel = current_channel()
+    if channel is None:
         return None
+    try:
+        return await channel.latest_page()
+    except Exception as e:
+        LOG.error(f"❌ 旁路连接取页面失败: {e}")
+        return None
+
+
+async def export_storage_state(cdp_url: str) -> dict:
+    """通过旁路连接导出浏览器登录态（cookies + localStorage），给 HTTP 下载器用"""
+    context = await init_side_playwright(cdp_url)
+    if context is None:
+        raise RuntimeError("旁路连接失败，无法导出登录态")
+    return await context.storage_state()
 
-    # 简单的策略：找最后一个未关闭的页面
-    pages = [p for p in side_context.pages if not p.is_closed()]
-    if pages:
-        return pages[-1]
-    return None
+
+async def download_course_files(browser_session: BrowserSession, dest_dir: str) -> SyncReport:
+    """
+    复用 agent 已登录的会话：收集当前页的文件链接，用连接池并发下载（支持续传）。
+    增量同步：上次下过且没变的文件跳过，内容重复的文件硬链接去重。
+    """
+    state = await export_storage_state(browser_session.cdp_url)
+    page = await get_latest_page_from_side_context()
+    if page is None:
+        raise RuntimeError("旁路连接里没有可用页面")
+    items = await collect_file_links(page)
+    LOG.info(f"📄 收集到 {len(items)} 个文件链接，开始直连下载")
+    user_agent = await page.evaluate("navigator.userAgent")
+    return await async_sync(items, dest_dir, storage_state=state,
+                            headers={"User-Agent": user_agent, "Referer": page.url})
 
 
 @tools.registry.action(
@@ -305,7 +247,10 @@ async def playwright_slider_verification(params: PlaywrightSliderAction):
         await target_page.wait_for_selector('.slider', state='attached', timeout=5000)
         bg_img = await get_base64_img(target_page, '#slider-img1')
         piece_img = await get_base64_img(target_page, '#slider-img2')
-        gap = SliderSolver.identify_gap(bg_img, piece_img)
+        found = SliderSolver.solve(bg_img, piece_img)
+        gap = found.x
+        if not found.confident:
+            LOG.warning(f"⚠️ 缺口识别置信度低 (score={found.score:.2f}, margin={found.margin:.2f})，仍按最佳结果拖动")
 
         bg_w = bg_img.shape[1]
         canvas_box = await target_page.locator('canvas.block').first.bounding_box()
@@ -331,44 +276,31 @@ async def playwright_slider_verification(params: PlaywrightSliderAction):
         await asyncio.sleep(0.5)
         await page.mouse.up()
 
-        await asyncio.sleep(3)
-        if await target_page.locator("text=向右滑动").count() == 0:
+        # 提示文字一消失就算通过，不再固定等 3 秒
+        try:
+            await target_page.locator("text=向右滑动").first.wait_for(state="detached", timeout=3000)
             return ActionResult(extracted_content=f'✅ Slider solved!')
-        else:
+        except Exception:
             return ActionResult(error="❌ 验证失败，请重试")
 
     except Exception as e:
         import traceback
         traceback.print_exc()
+        if type(e).__name__ == "TargetClosedError" or "closed" in str(e).lower():
+            channel = current_channel()
+            if channel is not None:
+                channel.invalidate()        # 连接坏了：下次验证时重连
         return ActionResult(error=f"Slider error: {str(e)}")
 
     finally:
-        # 取消playwright连接，防止影响下载功能
-        global side_playwright, side_browser, side_context
-        try:
-            # 1. 关闭上下文
-            if side_context:
-                await side_context.close()
-
-            # 2. 断开浏览器 CDP 连接 (注意：connect_over_cdp 的 close 通常只是断开连接，不会关闭实际浏览器)
-            if side_browser:
-                await side_browser.close()
-
-            # 3. 停止 Playwright 驱动
-            if side_playwright:
-                await side_playwright.stop()
-
-            LOG.info("🔌 旁路 Playwright 连接已断开，控制权归还主程序")
-        except Exception as disconnect_err:
-            LOG.error(f"⚠️ 断开旁路连接时发生非致命错误: {disconnect_err}")
-        finally:
-            # 确保全局变量重置，方便下次重新连接
-            side_context = None
-            side_browser = None
-            side_playwright = None
-
-        global browser_session
-        browser_session.BrowserProfile.downloads_path = DOWNLOAD_DIR
+        # 连接常驻复用；只把下载目录交还给浏览器，防止影响下载功能
+        channel = current_channel()
+        if channel is not None and not DIRECT_DOWNLOAD:
+            try:
+                await channel.set_download_dir(DOWNLOAD_DIR)
+            except Exception as e:
+                LOG.error(f"⚠️ 恢复下载目录失败，下次取用时重连: {e}")
+                channel.invalidate()
 
 
 async def test():
@@ -390,13 +322,20 @@ async def test():
 
 
 
-    # 【修复步骤 2】等待 Session 稳定
-    # browser-use 启动浏览器后可能还在进行一些内部初始化，稍微等一下能避免死锁
-    await asyncio.sleep(10)
+    # 【修复步骤 2】等待 Session 暴露出 CDP 地址（就绪即继续，不再固定等 10 秒）
+    for _ in range(100):
+        if getattr(browser_session, 'cdp_url', None):
+            break
+        await asyncio.sleep(0.1)
 
     # 我们利用 session 暴露的 CDP URL 自己连上去
     if hasattr(browser_session, 'cdp_url') and browser_session.cdp_url:
         await init_side_playwright(browser_session.cdp_url)
+        if not DIRECT_DOWNLOAD:
+            try:        # 开启下载事件，下载完成靠 CDP 事件判断
+                await get_side_channel(browser_session.cdp_url).set_download_dir(DOWNLOAD_DIR)
+            except Exception as e:
+                LOG.error(f"⚠️ 开启下载事件失败，改为扫描下载目录: {e}")
     else:
         LOG.error("❌ BrowserSession 没有提供 cdp_url，无法建立连接！")
 
@@ -405,17 +344,19 @@ async def test():
     task_prompt = """
         1. 打开 https://xdspoc.xidian.edu.cn/ 
         2. 【登录流程】：
-           - 如果页面显示存在用户登录按钮则表示未登录，点击用户登录，账号: 24031212124, 密码: lww496177401。
+           - 如果页面显示存在用户登录按钮则表示未登录，点击用户登录，{credentials}。
            - 如果已经登录（直接进入了系统），则**跳过登录步骤**，直接进行下一步。
            - 若出现滑块验证，必须调用工具 [playwright_slider_verification]。
         3. 导航操作：点击 "个人空间" -> "组合数学" -> "资料" -> "新建文件夹"。
-        4. 【下载操作】：
-           - 识别文件列表。
-           - 勾选所有文件，点击"批量下载"（或者逐个下载）。
-           - **重要**：点击下载后，请等待至少 5 秒，不要急着结束任务，等待文件保存。
+        4. {download_step}
         说明：
            - 若操作过程中出现了统一认证页面，则先进行登录流程
-        """
+        """.format(credentials=login_credentials(), download_step=(
+        "停在文件列表页面即可结束任务，文件由程序直接下载。" if DIRECT_DOWNLOAD else
+        """【下载操作】：
+           - 识别文件列表。
+           - 勾选所有文件，点击"批量下载"（或者逐个下载）。
+           - 点击下载后即可结束任务，下载完成由程序自动检测。"""))
 
     agent = Agent(
         task=task_prompt,
@@ -434,27 +375,82 @@ async def test():
         task_start_time = time.time()
         await agent.run()
 
-        LOG.info("⏳ 任务结束，额外等待 10 秒以确保最后的文件写入完成...")
-        await asyncio.sleep(10)
-
-        LOG.info("📦 任务执行完毕，等待文件落盘并移动...")
+        if DIRECT_DOWNLOAD:
+            report = await download_course_files(browser_session, DOWNLOAD_DIR)
+            LOG.info(f"新下载 {len(report.downloaded)} 个，未变跳过 {len(report.unchanged)} 个，"
+                     f"重下核对未变 {len(report.verified)} 个，重复去重 {len(report.deduped)} 个")
+            for r in report.failed:
+                LOG.error(f"❌ {r.url}: {r.error}")
+            return
 
-        # 2. 给一点缓冲时间，确保下载请求已经发起了
-        await asyncio.sleep(5)
+        LOG.info("📦 任务执行完毕，等待下载全部完成...")
 
         # ==========================================
-        # 3. 【关键】调用批量移动函数
+        # 2. 【关键】按 CDP 下载事件（没有则按目录事件）等下载完成（下完立即返回），再批量移动
         # ==========================================
-        move_downloaded_files(
+        channel = current_channel()
+        downloaded = await asyncio.to_thread(
+            move_downloaded_files,
             target_dir=DOWNLOAD_DIR,
             start_time=task_start_time,
-            timeout=120  # 如果文件很大或很多，适当增加超时时间(秒)
+            source_dir=DOWNLOAD_DIR,      # 下载目录已经设成 DOWNLOAD_DIR
+            timeout=120,  # 120 秒没有任何下载进展才放弃
+            events=channel.downloads if channel is not None else None,
         )
+        LOG.info(f"共下载 {len(downloaded)} 个文件，{sum(d.size for d in downloaded)} 字节")
 
     finally:
         LOG.info("🔒 关闭浏览器会话")
+        await close_all()
+        await browser_session.close()
+
+
+async def login_and_save_state(state_path: str = STATE_PATH) -> dict:
+    """agent 只做登录（含滑块），导出登录态写到 state_path，供多课程并发同步复用"""
+    browser_session = BrowserSession(browser_profile=BrowserProfile(headless=False))
+    await browser_session.start()
+    try:
+        for _ in range(100):
+            if getattr(browser_session, 'cdp_url', None):
+                break
+            await asyncio.sleep(0.1)
+        agent = Agent(
+            task=f"""
+            1. 打开 https://xdspoc.xidian.edu.cn/
+            2. 如果页面显示用户登录按钮则点击登录，{login_credentials()}；已登录则直接结束。
+               若出现滑块验证，必须调用工具 [playwright_slider_verification]。
+            3. 看到 "个人空间" 即表示登录成功，结束任务。
+            """,
+            llm=ChatBrowserUse(),
+            use_vision=True,
+            extend_system_message=extend_system_message,
+            browser_session=browser_session,
+            tools=tools
+        )
+        await agent.run()
+        state = await export_storage_state(browser_session.cdp_url)
+        os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        LOG.info(f"🔑 登录态已保存: {state_path}")
+        return state
+    finally:
+        await close_all()
         await browser_session.close()
 
 
+async def semester(courses_path: str, concurrency: int = COURSE_CONCURRENCY):
+    """整个学期的课程一次同步：登录态过期才登录，之后各课程并发下载"""
+    if not state_is_fresh(STATE_PATH):
+        await login_and_save_state(STATE_PATH)
+    results = await sync_semester(load_courses(courses_path), STATE_PATH, DOWNLOAD_DIR,
+                                  concurrency)
+    print_results(results)
+
+
 if __name__ == "__main__":
-    asyncio.run(test())
\ No newline at end of file
+    # python auto_login_and_download.py [courses.json]：给了课程清单就走多课程并发同步
+    if len(sys.argv) > 1:
+        asyncio.run(semester(sys.argv[1]))
+    else:
+        asyncio.run(test())
\ No newline at end of file
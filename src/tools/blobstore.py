@@ -0,0 +1,191 @@
+"""
+内容寻址的解压存储：同样内容的文件全局只写一份
+
+几百个学生的包里同一份起始代码、同一份作业 PDF 字节完全一致，
+以前每个包都解到新的 uuid 目录再写一遍。EXTRACT_MODE=cas 时：
+- 成员边解压边算 sha256，内容写进 <BLOB_STORE_DIR>/ab/cdef...（已有则直接丢弃临时文件）
+- 包的目录树用 reflink（写时复制，Btrfs/XFS）或硬链接指向 blob，都不行才复制；
+  哪种可用按目标目录所在的设备分别记（blob 和内存盘、其他挂载点的工作区可能不在一个文件系统）
+- 每个文件的 sha256 写进状态的 hashes，分类缓存/去重直接用，不用再读一遍
+
+注意硬链接与 blob 共用 inode：后处理原地改文件（black 格式化）前必须 unshare，
+否则会把所有包里的同一份文件一起改掉。node_post 在 cas 模式下会自动做。
+
+blob 目录计入工作区磁盘预算（Workspace.attach）；gc 删掉已没有链接引用、且 BLOB_GC_AGE 秒内
+没被复用过的 blob，在批量/守护模式每轮结束、工作区超预算时调用。
+
+环境变量：
+  BLOB_STORE_DIR   blob 目录，默认 <系统临时目录>/tas_blobs（与解压目录同盘，硬链接才可用）
+  BLOB_GC_AGE      秒：这么久内入库/复用过的 blob 不回收（别的进程可能正要链接），默认 600
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from ..utils.hashing import CHUNK_SIZE, sha256_file
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_STORE = os.getenv("BLOB_STORE_DIR") or os.path.join(tempfile.gettempdir(), "tas_blobs")
+BLOB_GC_AGE = float(os.getenv("BLOB_GC_AGE", "600"))
+
+_FICLONE = 0x40049409     # linux/fs.h：ioctl(dst, FICLONE, src)
+
+
+def reflink(src: str, dst: str) -> bool:
+    """写时复制克隆（仅 Linux 且文件系统支持），失败返回 False 且不留下 dst"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+class BlobStore:
+    """
+    put_stream / put_file 入库返回 sha256，materialize 把 blob 放到目标路径。
+    links：reflink / hardlink / copy 各用了几次；reused：入库时 blob 已存在的次数。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or DEFAULT_STORE)
+        self._tmp = self.root / "tmp"
+        self._tmp.mkdir(parents=True, exist_ok=True)
+        self._reflink_ok: Dict[int, bool] = {}     # 目标设备 -> 是否支持 reflink
+        self._link_ok: Dict[int, bool] = {}        # 目标设备 -> 能否硬链接到 blob
+        self.added = 0
+        self.reused = 0
+        self.links: Dict[str, int] = {"reflink": 0, "hardlink": 0, "copy": 0}
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).is_file()
+
+    def _commit(self, tmp: str, digest: str) -> str:
+        blob = self.path_for(digest)
+        if blob.is_file():
+            os.unlink(tmp)
+            os.utime(blob)               # 刷新 mtime：gc 不会回收马上要链接的 blob
+            self.reused += 1
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            os.replace(tmp, blob)        # 并发入库同一内容也安全：原子替换，内容一样
+            self.added += 1
+        return digest
+
+    def put_stream(self, fp) -> str:
+        """从文件对象分块读入（边读边算哈希），返回 sha256"""
+        h = hashlib.sha256()
+        tmp = str(self._tmp / uuid.uuid4().hex)
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                out.write(chunk)
+        return self._commit(tmp, h.hexdigest())
+
+    def put_file(self, path: str) -> str:
+        """已落盘的文件入库，并把它换成指向 blob 的链接（CLI 后端整包解压后用）"""
+        digest = sha256_file(path)
+        blob = self.path_for(digest)
+        if blob.is_file():
+            os.utime(blob)
+            self.reused += 1
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            tmp = str(self._tmp / uuid.uuid4().hex)
+            shutil.copyfile(path, tmp)
+            self._commit(tmp, digest)
+        self.materialize(digest, path)
+        return digest
+
+    def materialize(self, digest: str, target: str) -> str:
+        """target 指向 blob：优先 reflink，其次硬链接，跨盘等情况复制；返回用的方式"""
+        blob = str(self.path_for(digest))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        dev = os.stat(os.path.dirname(target)).st_dev
+        tmp = target + ".blob"
+        how = "copy"
+        if self._reflink_ok.get(dev, True) and reflink(blob, tmp):
+            self._reflink_ok[dev] = True
+            how = "reflink"
+        else:
+            self._reflink_ok[dev] = False    # 这个文件系统不支持就别每个文件都试一次
+            try:
+                if not self._link_ok.get(dev, True):
+                    raise OSError(errno.EXDEV, "跨设备")
+                os.link(blob, tmp)
+                how = "hardlink"
+            except OSError as e:             # 跨盘、链接数上限、文件系统不支持
+                if e.errno == errno.EXDEV:
+                    self._link_ok[dev] = False
+                logger.debug("硬链接失败，改为复制 %s: %s", target, e)
+                shutil.copyfile(blob, tmp)
+        os.replace(tmp, target)
+        self.links[how] += 1
+        return how
+
+    def gc(self, min_age: float = BLOB_GC_AGE) -> int:
+        """
+        删除已没有硬链接引用（st_nlink == 1）且 min_age 秒内没入库/复用过的 blob，
+        连同崩溃留下的临时文件；返回删除个数。多进程同时 gc 也安全（找不到就算了）。
+        """
+        cutoff = time.time() - min_age
+        removed = 0
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for blob in sub.iterdir():
+                try:
+                    st = blob.stat()
+                    if st.st_mtime < cutoff and (sub == self._tmp or st.st_nlink == 1):
+                        blob.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        if removed:
+            logger.info("blob gc: 删除 %d 个 %s", removed, self.root)
+        return removed
+
+
+def unshare(paths: Iterable[str]) -> int:
+    """硬链接的文件换成独立副本（原地修改前调用），返回处理的文件数"""
+    count = 0
+    for p in paths:
+        try:
+            if os.stat(p).st_nlink <= 1:
+                continue
+        except FileNotFoundError:
+            continue
+        tmp = p + ".unshare"
+        shutil.copyfile(p, tmp)
+        os.replace(tmp, p)
+        count += 1
+    return count
+
+
+def ingest_tree(dest: str, store: BlobStore) -> Dict[str, str]:
+    """已解压的目录整体入库（不支持流式读取的格式），返回 {路径: sha256}"""
+    hashes: Dict[str, str] = {}
+    for root, _, fs in os.walk(dest):
+        for f in fs:
+            path = os.path.join(root, f)
+            hashes[path] = store.put_file(path)
+    return hashes
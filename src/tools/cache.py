@@ -0,0 +1,245 @@
+"""
+分类结果持久化缓存（SQLite）
+
+key = sha256(文件内容) + 扩展名 + 提示词版本
+同一份起始代码、作业 PDF、node_modules 在不同学生的包里字节完全一致，
+命中缓存就不用再问 LLM。超过 max_entries 时按最近使用时间（LRU）淘汰。
+查询不写库：命中时间与命中/未命中计数先记在内存，攒够 FLUSH_EVERY 条或隔 FLUSH_INTERVAL 秒、
+淘汰前、stats() 和 close() 时一次写回；条目总数也在内存里维护，不再每次写入都 COUNT(*)。
+
+环境变量：
+  CLASSIFY_CACHE          0 关闭缓存（默认开启）
+  CLASSIFY_CACHE_PATH     数据库路径，默认 ~/.cache/teaching_assistant/classify.sqlite3
+  CLASSIFY_CACHE_MAX      最多保留条目数，默认 200000
+
+命令行：
+python -m src.tools.cache stats
+python -m src.tools.cache list --limit 20
+python -m src.tools.cache clear
+"""
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from ..agent.prompts import CLASSIFY_PROMPT_VERSION
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PATH = Path.home() / ".cache" / "teaching_assistant" / "classify.sqlite3"
+DEFAULT_MAX_ENTRIES = 200_000
+FLUSH_EVERY = 500          # 攒这么多条命中记录就写回
+FLUSH_INTERVAL = 5.0       # 秒：最长多久写回一次
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classify_cache (
+    key        TEXT PRIMARY KEY,
+    result     TEXT NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_classify_cache_last_used ON classify_cache(last_used);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def make_key(digest: str, filename: str,
+             prompt_version: str = CLASSIFY_PROMPT_VERSION) -> str:
+    """内容哈希 + 扩展名 + 提示词版本，三者任一变化都视为新条目"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{digest}:{ext}:{prompt_version}"
+
+
+class ClassifyCache:
+    """
+    线程安全的 SQLite 缓存。
+    hits / misses 是本进程计数，累计值落在 cache_stats 表里（批量写回，见 flush）。
+    """
+
+    def __init__(self, path: Optional[str] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path) if path else DEFAULT_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # 其他进程也在写，内存里的总数只是近似，启动时校准一次
+        self._count = self._conn.execute(
+            "SELECT COUNT(*) FROM classify_cache").fetchone()[0]
+        self._touched: Dict[str, Tuple[float, int]] = {}    # key -> (最后命中时间, 命中次数)
+        self._pending: Dict[str, int] = {}                  # 未写回的 cache_stats 增量
+        self._last_flush = time.monotonic()
+
+    # ---------- 读写 ----------
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM classify_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                self._pending["misses"] = self._pending.get("misses", 0) + 1
+            else:
+                self.hits += 1
+                self._pending["hits"] = self._pending.get("hits", 0) + 1
+                self._touched[key] = (time.time(), self._touched.get(key, (0, 0))[1] + 1)
+            if (len(self._touched) >= FLUSH_EVERY
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL):
+                self._flush()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: str, result: dict) -> None:
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO classify_cache(key, result, created, last_used) "
+                "VALUES (?, ?, ?, ?)", (key, payload, now, now))
+            if cur.rowcount:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE classify_cache SET result=?, last_used=? WHERE key=?",
+                    (payload, now, key))
+            if self._count > self.max_entries:
+                self._evict(self._count - self.max_entries)
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """把内存里的命中时间与统计写回库"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """调用方已持锁"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE classify_cache SET last_used=MAX(last_used, ?), hits=hits+? WHERE key=?",
+                [(t, n, k) for k, (t, n) in self._touched.items()])
+            self._touched.clear()
+        for name, n in self._pending.items():
+            self._bump(name, n)
+        self._pending.clear()
+        self._conn.commit()
+        self._last_flush = time.monotonic()
+
+    def _evict(self, n: int) -> None:
+        """删掉最久没用过的 n 条（调用方已持锁）"""
+        self._flush()                    # 先把最近的命中时间写回，别把刚用过的淘汰了
+        self._conn.execute(
+            "DELETE FROM classify_cache WHERE key IN ("
+            "SELECT key FROM classify_cache ORDER BY last_used ASC LIMIT ?)", (n,))
+        self._bump("evictions", n)
+        self._count -= n
+        logger.info("classify cache evicted %d entries", n)
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        self._conn.execute(
+            "INSERT INTO cache_stats(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value=value+excluded.value", (name, n))
+
+    # ---------- 管理 ----------
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush()
+            totals = dict(self._conn.execute(
+                "SELECT name, value FROM cache_stats").fetchall())
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM classify_cache").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+            "total_evictions": totals.get("evictions", 0),
+        }
+
+    def entries(self, limit: int = 20) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, result, hits, last_used FROM classify_cache "
+                "ORDER BY last_used DESC LIMIT ?", (limit,)).fetchall()
+
+    def clear(self) -> int:
+        with self._lock:
+            n = self._conn.execute("DELETE FROM classify_cache").rowcount
+            self._conn.execute("DELETE FROM cache_stats")
+            self._conn.commit()
+            self._count = 0
+            self._touched.clear()
+            self._pending.clear()
+        return n
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush()
+            except sqlite3.ProgrammingError:     # 已关闭
+                return
+            self._conn.close()
+
+
+# ---------- 进程级单例 ----------
+_default: Optional[ClassifyCache] = None
+_default_pid: Optional[int] = None
+
+
+def get_cache() -> Optional[ClassifyCache]:
+    """默认缓存；CLASSIFY_CACHE=0 时返回 None。多进程下每个进程各开一个连接"""
+    global _default, _default_pid
+    if os.getenv("CLASSIFY_CACHE", "1") == "0":
+        return None
+    if _default is None or _default_pid != os.getpid():
+        _default = ClassifyCache(
+            os.getenv("CLASSIFY_CACHE_PATH") or None,
+            int(os.getenv("CLASSIFY_CACHE_MAX", DEFAULT_MAX_ENTRIES)),
+        )
+        _default_pid = os.getpid()
+        atexit.register(_default.close)      # 退出时写回未落库的统计
+    return _default
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分类缓存管理")
+    parser.add_argument("--path", help="缓存数据库路径（默认同 CLASSIFY_CACHE_PATH）")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="查看条目数与命中统计")
+    p_list = sub.add_parser("list", help="列出最近使用的条目")
+    p_list.add_argument("--limit", type=int, default=20)
+    sub.add_parser("clear", help="清空缓存")
+    args = parser.parse_args(argv)
+
+    cache = ClassifyCache(args.path or os.getenv("CLASSIFY_CACHE_PATH") or None)
+    if args.cmd == "stats":
+        for k, v in cache.stats().items():
+            print(f"{k:16s} {v}")
+    elif args.cmd == "list":
+        for key, result, hits, last_used in cache.entries(args.limit):
+            ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_used))
+            print(f"{ts}  hits={hits:<5d} {key}  {result}")
+    elif args.cmd == "clear":
+        print(f"已清空 {cache.clear()} 条缓存")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,27 +1,205 @@
 import base64
+import json
 import os
+from typing import Dict, List, Optional, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from ..agent.llm import get_llm
-from ..agent.prompts import CLASSIFY_PROMPT
+from ..agent.prompts import CLASSIFY_PROMPT, BATCH_CLASSIFY_PROMPT
+from ..utils.hashing import sha256_file
+from .cache import get_cache, make_key
+from ..utils.logger import get_logger
 
-model = get_llm()
+logger = get_logger(__name__)
 
-# 单文件分类
-def classify_file(file_path: str) -> dict:
-    name = os.path.basename(file_path)
-    header = b""
+HEADER_SIZE = 512
+
+# deepseek | qwen | local，见 agent/llm.py
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "deepseek")
+
+# 批量模式：单次请求的输入 token 预算 / 最多文件数 / 每个结果预留的输出 token
+BATCH_TOKEN_BUDGET = int(os.getenv("CLASSIFY_BATCH_TOKENS", "6000"))
+BATCH_MAX_FILES = int(os.getenv("CLASSIFY_BATCH_MAX", "40"))
+BATCH_OUTPUT_TOKENS_PER_FILE = 40
+
+_model = None
+
+def get_model():
+    """延迟创建模型：全部命中缓存时不需要 API Key"""
+    global _model
+    if _model is None:
+        _model = get_llm(LLM_PROVIDER)
+    return _model
+
+def read_header(file_path: str, size: int = HEADER_SIZE) -> bytes:
     try:
         with open(file_path, "rb") as f:
-            header = f.read(512)
+            return f.read(size)
     except Exception:
-        pass
-    header_b64 = base64.b64encode(header).decode() if header else ""
-    messages = [
+        return b""
+
+def cache_key(file_path: str, digest: Optional[str] = None):
+    """
+    digest 已知（流式读包时顺带算过）就不再读盘；
+    文件读不了就不走缓存，返回 None
+    """
+    try:
+        return make_key(digest or sha256_file(file_path), os.path.basename(file_path))
+    except OSError:
+        return None
+
+def lookup_cache(files: List[str], digests: Optional[Dict[str, str]] = None):
+    """
+    批量查缓存。
+    :return: (results 命中处有值, keys, misses 未命中下标)
+    """
+    cache = get_cache()
+    digests = digests or {}
+    results: List[Optional[dict]] = [None] * len(files)
+    keys: List[Optional[str]] = [None] * len(files)
+    misses = []
+    for i, f in enumerate(files):
+        if cache:
+            keys[i] = cache_key(f, digests.get(f))
+            if keys[i]:
+                results[i] = cache.get(keys[i])
+        if results[i] is None:
+            misses.append(i)
+    return results, keys, misses
+
+def store_cache(key: Optional[str], res: dict) -> None:
+    cache = get_cache()
+    if cache and key and res["type"] != "unknown":
+        cache.put(key, res)
+
+def unknown_result() -> dict:
+    return {"type": "unknown", "language": "", "confidence": 0}
+
+def estimate_tokens(text: str) -> int:
+    """粗估：base64/英文约 3~4 字符一个 token，宁多勿少"""
+    return len(text) // 3 + 1
+
+def _strip_fence(content: str) -> str:
+    """模型偶尔会包一层 ```json ... ```"""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1] if "\n" in content else ""
+        content = content.rsplit("```", 1)[0]
+    return content.strip()
+
+def read_header_b64(file_path: str, header: Optional[bytes] = None) -> str:
+    if header is None:
+        header = read_header(file_path)
+    return base64.b64encode(header).decode() if header else ""
+
+def _build_messages(name: str, header_b64: str) -> list:
+    return [
         SystemMessage(content=CLASSIFY_PROMPT),
         HumanMessage(content=f"filename:{name}\nheader_base64:{header_b64}")
     ]
+
+# 单文件分类（先查缓存，未命中再问 LLM）
+# header / digest 可由调用方给出（流式模式下文件还没落盘）
+def classify_file(file_path: str, header: Optional[bytes] = None,
+                  digest: Optional[str] = None) -> dict:
+    cache = get_cache()
+    key = cache_key(file_path, digest) if cache else None
+    if key:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    messages = _build_messages(os.path.basename(file_path),
+                               read_header_b64(file_path, header))
     # 强制 JSON
-    content = model.invoke(messages).content
-    import json
-    return json.loads(content)
\ No newline at end of file
+    content = get_model().invoke(messages).content
+    res = json.loads(_strip_fence(content))
+    store_cache(key, res)
+    return res
+
+# ---------- 批量分类 ----------
+# 样本 = (文件名, 头部 base64)，只读一次盘，拆批重试时复用
+Sample = Tuple[str, str]
+
+def _batch_line(idx: int, sample: Sample) -> str:
+    return f"{idx}|{sample[0]}|{sample[1]}"
+
+def pack_batches(lines: List[str], token_budget: int = BATCH_TOKEN_BUDGET,
+                 max_files: int = BATCH_MAX_FILES) -> List[List[int]]:
+    """
+    按 token 预算把行切成若干批，返回每批的下标列表。
+    头部短的文件一批能塞更多，单行超预算的也至少自成一批。
+    """
+    budget = token_budget - estimate_tokens(BATCH_CLASSIFY_PROMPT)
+    batches, cur, used = [], [], 0
+    for i, line in enumerate(lines):
+        cost = estimate_tokens(line)
+        if cur and (used + cost > budget or len(cur) >= max_files):
+            batches.append(cur)
+            cur, used = [], 0
+        cur.append(i)
+        used += cost
+    if cur:
+        batches.append(cur)
+    return batches
+
+def parse_batch_reply(content: str, n: int) -> List[dict]:
+    """
+    校验模型返回：必须是长度为 n 的数组，id 0..n-1 各出现一次。
+    不合格直接抛 ValueError，由调用方拆批重试。
+    """
+    data = json.loads(_strip_fence(content))
+    if not isinstance(data, list) or len(data) != n:
+        raise ValueError(f"expect {n} results, got {type(data).__name__} "
+                         f"of {len(data) if isinstance(data, list) else '?'}")
+    out: List[Optional[dict]] = [None] * n
+    for item in data:
+        idx = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(idx, int) or not 0 <= idx < n or out[idx] is not None:
+            raise ValueError(f"bad or duplicated id: {item!r}")
+        if not isinstance(item.get("type"), str):
+            raise ValueError(f"missing type: {item!r}")
+        out[idx] = {"type": item["type"], "language": item.get("language", ""),
+                    "confidence": item.get("confidence", 0)}
+    return out
+
+def _classify_batch_llm(samples: List[Sample]) -> List[dict]:
+    """一批文件一次请求；回答不合格就对半拆开重试，拆到单个文件退回单文件模式"""
+    if len(samples) == 1:
+        try:
+            messages = _build_messages(*samples[0])
+            return [json.loads(_strip_fence(get_model().invoke(messages).content))]
+        except Exception:
+            logger.exception("classify failed: %s", samples[0][0])
+            return [unknown_result()]
+
+    lines = [_batch_line(i, s) for i, s in enumerate(samples)]
+    messages = [SystemMessage(content=BATCH_CLASSIFY_PROMPT),
+                HumanMessage(content="\n".join(lines))]
+    model = get_model().bind(max_tokens=BATCH_OUTPUT_TOKENS_PER_FILE * len(samples) + 64)
+    try:
+        return parse_batch_reply(model.invoke(messages).content, len(samples))
+    except Exception as e:
+        mid = len(samples) // 2
+        logger.warning("batch of %d malformed (%s), re-splitting", len(samples), e)
+        return _classify_batch_llm(samples[:mid]) + _classify_batch_llm(samples[mid:])
+
+def classify_batch(files: List[str], headers: Optional[Dict[str, bytes]] = None,
+                   digests: Optional[Dict[str, str]] = None) -> List[dict]:
+    """
+    批量分类，结果与 files 一一对应。
+    先查缓存，未命中的按 token 预算打包，每批一次请求。
+    """
+    headers = headers or {}
+    results, keys, misses = lookup_cache(files, digests)
+    samples = [(os.path.basename(files[i]), read_header_b64(files[i], headers.get(files[i])))
+               for i in misses]
+    batches = pack_batches([_batch_line(j, s) for j, s in enumerate(samples)])
+    logger.info("Batch classify: %d cached, %d files in %d requests",
+                len(files) - len(misses), len(misses), len(batches))
+    for batch in batches:
+        idxs = [misses[j] for j in batch]
+        for i, res in zip(idxs, _classify_batch_llm([samples[j] for j in batch])):
+            results[i] = res
+            store_cache(keys[i], res)
+    return results
@@ -0,0 +1,119 @@
+"""
+异步并发分类引擎（基于 ainvoke）
+
+- asyncio.Semaphore 限制同时在途的请求数（CLASSIFY_CONCURRENCY，默认 8）
+- 令牌桶按 provider 限制 请求数/分钟、token 数/分钟（见 agent/llm.py）
+- 429 / 5xx / 网络错误：指数退避 + 随机抖动，最多 CLASSIFY_MAX_RETRIES 次
+- 结果顺序与输入一致；先查缓存，命中的不发请求
+- 同步入口在进程内一个常驻事件循环（后台线程）上跑：模型的异步连接池（langchain_openai
+  进程级缓存的 httpx 客户端）绑在第一次用它的循环上，每个包 asyncio.run 一个新循环的话，
+  同一进程里的第二个包起请求全部 "Event loop is closed"
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from ..agent.llm import get_rate_limiter
+from ..agent.ratelimit import TokenBucketLimiter
+from ..utils.logger import get_logger
+from ..utils.retry import backoff_delay
+from .classify import (
+    LLM_PROVIDER, get_model, lookup_cache, store_cache, read_header_b64,
+    unknown_result, estimate_tokens, _build_messages, _strip_fence,
+)
+
+logger = get_logger(__name__)
+
+CONCURRENCY = int(os.getenv("CLASSIFY_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("CLASSIFY_MAX_RETRIES", "5"))
+BACKOFF_BASE = 0.5     # 秒
+BACKOFF_CAP = 30.0
+OUTPUT_TOKENS = 64     # 单文件回答预留的 token
+
+
+def _is_retryable(e: Exception) -> bool:
+    """限流、服务端错误、连接/超时都值得重试；4xx 参数错误不重试"""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(e).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+async def _classify_one(model, limiter: TokenBucketLimiter,
+                        sem: asyncio.Semaphore, file_path: str,
+                        header: Optional[bytes], max_retries: int) -> dict:
+    name = os.path.basename(file_path)
+    messages = _build_messages(name, read_header_b64(file_path, header))
+    tokens = sum(estimate_tokens(m.content) for m in messages) + OUTPUT_TOKENS
+    async with sem:
+        for attempt in range(max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                reply = await model.ainvoke(messages)
+                return json.loads(_strip_fence(reply.content))
+            except Exception as e:
+                if attempt < max_retries and _is_retryable(e):
+                    delay = backoff_delay(attempt, BACKOFF_BASE, BACKOFF_CAP)
+                    logger.warning("classify %s: %s, retry in %.2fs", name,
+                                   type(e).__name__, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                logger.error("classify failed: %s (%s)", file_path, e)
+                return unknown_result()
+    return unknown_result()
+
+
+async def aclassify_files(files: List[str], model=None,
+                          limiter: Optional[TokenBucketLimiter] = None,
+                          concurrency: int = CONCURRENCY,
+                          max_retries: int = MAX_RETRIES,
+                          headers: Optional[Dict[str, bytes]] = None,
+                          digests: Optional[Dict[str, str]] = None) -> List[dict]:
+    """并发分类，返回与 files 一一对应的结果"""
+    headers = headers or {}
+    results, keys, misses = lookup_cache(files, digests)
+    if not misses:
+        return results
+    model = model or get_model()
+    limiter = limiter or get_rate_limiter(LLM_PROVIDER)
+    sem = asyncio.Semaphore(concurrency)
+
+    logger.info("Async classify: %d cached, %d requests, concurrency=%d",
+                len(files) - len(misses), len(misses), concurrency)
+    fresh = await asyncio.gather(*(
+        _classify_one(model, limiter, sem, files[i], headers.get(files[i]), max_retries)
+        for i in misses
+    ))
+    for i, res in zip(misses, fresh):
+        results[i] = res
+        store_cache(keys[i], res)
+    return results
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid = 0
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """进程内常驻事件循环；fork 出来的子进程里线程不在了，按 pid 重建"""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="classify-loop",
+                             daemon=True).start()
+        return _loop
+
+
+def classify_files_async(files: List[str], **kwargs) -> List[dict]:
+    """同步入口，给 LangGraph 的同步节点用（可多线程同时调用）"""
+    future = asyncio.run_coroutine_threadsafe(aclassify_files(files, **kwargs),
+                                              _background_loop())
+    return future.result()
@@ -0,0 +1,166 @@
+"""
+多课程并发同步：只登录一次，整个学期的课程并行拉取
+
+- 登录态：agent 登录一次后导出 Playwright storage_state 存成 JSON（见 auto_login_and_download.py），
+  未过期（COURSE_STATE_MAX_AGE 小时）就直接复用，不再每次走登录 + 滑块
+- 每门课一个独立的浏览器上下文（带同一份登录态）：打开资料页 -> 收集文件链接 -> 增量同步（sync.py）
+- COURSE_CONCURRENCY 限制同时进行的课程数；一门课失败不影响其他，按课程汇报结果
+
+课程清单（JSON）：
+[{"name": "组合数学", "url": "https://.../资料页", "folder": "组合数学"}, ...]
+
+python -m src.tools.course_sync --courses courses.json --state state.json --dest D:/资料
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from .http_download import DownloadItem
+from .sync import SyncReport, async_sync
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COURSE_CONCURRENCY = int(os.getenv("COURSE_CONCURRENCY", "4"))
+COURSE_STATE_MAX_AGE = float(os.getenv("COURSE_STATE_MAX_AGE", "12"))   # 小时
+COURSE_PAGE_TIMEOUT = 30_000                                             # 毫秒
+
+# 资料页里哪些链接算文件
+FILE_LINK_PATTERN = r"download|\.(zip|rar|7z|pdf|docx?|pptx?|xlsx?|txt)(\?|$)"
+
+
+@dataclass
+class Course:
+    name: str
+    url: str                   # 资料页地址
+    folder: str = ""           # 下载到 <dest>/<folder>，默认用课程名
+    pattern: str = ""          # 覆盖默认的文件链接规则
+
+
+@dataclass
+class CourseResult:
+    course: str
+    status: str                # ok | partial（部分文件失败）| failed
+    downloaded: int = 0
+    unchanged: int = 0
+    deduped: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+
+def load_courses(path: str) -> List[Course]:
+    with open(path, encoding="utf-8") as f:
+        return [Course(**c) for c in json.load(f)]
+
+
+def state_is_fresh(path: str, max_age_hours: float = COURSE_STATE_MAX_AGE) -> bool:
+    return os.path.isfile(path) and time.time() - os.path.getmtime(path) < max_age_hours * 3600
+
+
+async def collect_file_links(page, pattern: str = FILE_LINK_PATTERN) -> List[DownloadItem]:
+    """从当前资料页收集文件链接（href 匹配 pattern 的 <a>），文件名优先取 download 属性"""
+    links = await page.eval_on_selector_all(
+        "a[href]",
+        "els => els.map(e => [e.href, (e.getAttribute('download') || '').trim()])")
+    seen, items = set(), []
+    for url, name in links:
+        if url.startswith("http") and re.search(pattern, url, re.I) and url not in seen:
+            seen.add(url)
+            items.append(DownloadItem(url, name=name))
+    return items
+
+
+async def run_courses(courses: List[Course],
+                      worker: Callable[[Course], Awaitable[SyncReport]],
+                      concurrency: int = COURSE_CONCURRENCY) -> List[CourseResult]:
+    """并发跑每门课的 worker，结果顺序与 courses 一致"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(course: Course) -> CourseResult:
+        async with sem:
+            started = time.monotonic()
+            logger.info(">>>> 开始同步 %s", course.name)
+            try:
+                report = await worker(course)
+            except Exception as e:
+                logger.exception("课程同步失败: %s", course.name)
+                return CourseResult(course.name, "failed", error=f"{type(e).__name__}: {e}",
+                                    seconds=round(time.monotonic() - started, 3))
+            result = CourseResult(course.name, "partial" if report.failed else "ok",
+                                  len(report.downloaded),
+                                  len(report.unchanged) + len(report.verified),   # 重下核对也是没变
+                                  len(report.deduped), len(report.failed),
+                                  round(time.monotonic() - started, 3))
+            logger.info("<<<< %s %s", result.status, course.name)
+            return result
+
+    return list(await asyncio.gather(*(one(c) for c in courses)))
+
+
+async def sync_course_in_browser(browser, storage_state, course: Course, dest_root: str) -> SyncReport:
+    """独立上下文打开课程资料页，收集链接后走 HTTP 增量同步"""
+    context = await browser.new_context(storage_state=storage_state)
+    try:
+        page = await context.new_page()
+        await page.goto(course.url, wait_until="networkidle", timeout=COURSE_PAGE_TIMEOUT)
+        items = await collect_file_links(page, course.pattern or FILE_LINK_PATTERN)
+        logger.info("%s: 收集到 %d 个文件链接", course.name, len(items))
+        user_agent = await page.evaluate("navigator.userAgent")
+        fresh_state = await context.storage_state()      # 打开页面时 cookie 可能被刷新
+        return await async_sync(items, os.path.join(dest_root, course.folder or course.name),
+                                storage_state=fresh_state,
+                                headers={"User-Agent": user_agent, "Referer": page.url})
+    finally:
+        await context.close()
+
+
+async def sync_semester(courses: List[Course], state_path: str, dest_root: str,
+                        concurrency: int = COURSE_CONCURRENCY,
+                        headless: bool = True) -> List[CourseResult]:
+    """一个无头浏览器 + 每门课一个上下文，共享同一份登录态"""
+    from playwright.async_api import async_playwright
+
+    with open(state_path, encoding="utf-8") as f:
+        storage_state = json.load(f)
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=headless)
+        try:
+            return await run_courses(
+                courses,
+                lambda c: sync_course_in_browser(browser, storage_state, c, dest_root),
+                concurrency)
+        finally:
+            await browser.close()
+
+
+def print_results(results: List[CourseResult]) -> None:
+    for r in results:
+        print(f"  [{r.status}] {r.course}: 新下载 {r.downloaded}，未变 {r.unchanged}，"
+              f"去重 {r.deduped}，失败 {r.failed} ({r.seconds}s)"
+              + (f" {r.error}" if r.error else ""))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="多课程资料并发同步（需已保存的登录态）")
+    parser.add_argument("--courses", required=True, help="课程清单 JSON")
+    parser.add_argument("--state", required=True, help="登录态 storage_state JSON")
+    parser.add_argument("--dest", required=True, help="下载根目录")
+    parser.add_argument("--concurrency", type=int, default=COURSE_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    if not state_is_fresh(args.state):
+        parser.error(f"登录态不存在或已过期: {args.state}（先运行 auto_login_and_download.py 登录）")
+    results = asyncio.run(sync_semester(load_courses(args.courses), args.state, args.dest,
+                                        args.concurrency))
+    print_results(results)
+    return 0 if all(r.status == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
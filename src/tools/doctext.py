@@ -0,0 +1,421 @@
+"""
+文档转文本引擎：PDF / DOCX / PPTX 进程内提取，进程池并行，带页数/体积/超时限制
+
+以前每个 PDF 串行起一个 pdftotext 进程，docx/pptx/md/txt 直接忽略。现在：
+- PDF：PyMuPDF（fitz）> pypdf > pdftotext 命令行，按可用性依次选择
+- DOCX / PPTX：标准库 zipfile + XML 解析，不需要额外依赖
+- md/txt/csv 等纯文本：原样使用（输出就是输入本身），不复制
+- 限制：最多 DOC_MAX_PAGES 页（PPTX 按幻灯片），输出最多 DOC_MAX_BYTES 字节（超出截断），
+  单个文件 DOC_TIMEOUT 秒（逐页检查；卡死在单页里的，父进程从它开始算起超时后杀掉
+  那一个 worker 换新的，排在后面的文件照常处理）
+- 进程池：spawn 启动（后处理分支跑在线程里，线程里 fork 不安全）、进程内共享、用到才建，
+  worker 常驻复用；大小按同时在跑的包数平分（utils/workers.py）
+- 跳过：输出 .txt 比输入新就不再提取；内容哈希命中缓存（同一份作业 PDF 在几百个包里）
+  直接写出缓存的文本
+
+输出：与输入同目录、原文件名后加 .txt（a.pdf -> a.pdf.txt）。不用 a.txt：学生常在
+a.docx 旁边自己交一份 a.txt，同名会被覆盖，或被当成"已是最新"的提取结果。
+
+环境变量：
+  DOC_WORKERS（进程总数，默认 CPU 核数）/ DOC_MAX_PAGES / DOC_MAX_BYTES / DOC_TIMEOUT
+  DOC_CACHE=0 关闭缓存；DOC_CACHE_PATH 默认 ~/.cache/teaching_assistant/doctext.sqlite3
+
+扩展：
+  register_extractor(".odt", my_odt_pages)     # fn(path, max_pages, deadline) -> Iterator[str]
+"""
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+
+from ..utils.hashing import sha256_file
+from ..utils.logger import get_logger
+from ..utils.workers import cpu_share
+
+logger = get_logger(__name__)
+
+DOC_WORKERS = int(os.getenv("DOC_WORKERS", "0")) or os.cpu_count() or 1
+DOC_MAX_PAGES = int(os.getenv("DOC_MAX_PAGES", "200"))
+DOC_MAX_BYTES = int(os.getenv("DOC_MAX_BYTES", str(2 << 20)))
+DOC_TIMEOUT = float(os.getenv("DOC_TIMEOUT", "60"))
+DOC_CACHE = os.getenv("DOC_CACHE", "1") != "0"
+DOC_CACHE_PATH = os.getenv("DOC_CACHE_PATH") or str(
+    Path.home() / ".cache" / "teaching_assistant" / "doctext.sqlite3")
+
+_BOOT_GRACE = 30.0          # 秒：新 worker 启动（spawn 要重新 import）还没开始干活时多给的时间
+
+TEXT_SUFFIXES = {".txt", ".md", ".csv", ".tex", ".rst", ".log"}
+
+
+class DocTimeout(Exception):
+    """单个文件提取超时"""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    def check(self) -> None:
+        if time.monotonic() > self.at:
+            raise DocTimeout("提取超时")
+
+
+@dataclass
+class DocResult:
+    path: str
+    output: str = ""           # 文本文件路径（纯文本即输入本身）
+    status: str = ""           # extracted | passthrough | uptodate | cached | skipped | failed | timeout
+    pages: int = 0             # 提取的页数（PPTX 为幻灯片数，DOCX 为段落数）
+    truncated: bool = False
+    error: str = ""
+
+
+# ---------- 各格式提取（逐页产出文本） ----------
+PageExtractor = Callable[[str, int, Deadline], Iterator[str]]
+
+
+def _pdf_backend() -> str:
+    for mod, name in (("fitz", "pymupdf"), ("pypdf", "pypdf")):
+        try:
+            __import__(mod)
+            return name
+        except ImportError:
+            continue
+    return "pdftotext" if shutil.which("pdftotext") else ""
+
+
+def pdf_pages(path: str, max_pages: int, deadline: Deadline) -> Iterator[str]:
+    backend = _pdf_backend()
+    if backend == "pymupdf":
+        import fitz
+        with fitz.open(path) as doc:
+            for i, page in enumerate(doc):
+                if i >= max_pages:
+                    break
+                deadline.check()
+                yield page.get_text()
+    elif backend == "pypdf":
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        for page in reader.pages[:max_pages]:
+            deadline.check()
+            yield page.extract_text() or ""
+    elif backend == "pdftotext":
+        try:
+            res = subprocess.run(["pdftotext", "-l", str(max_pages), "-enc", "UTF-8", path, "-"],
+                                 capture_output=True, check=True,
+                                 timeout=max(deadline.remaining(), 0.1))
+        except subprocess.TimeoutExpired as e:
+            raise DocTimeout("pdftotext 超时") from e
+        yield from res.stdout.decode("utf-8", "replace").split("\f")
+    else:
+        raise RuntimeError("没有可用的 PDF 后端（pip install pymupdf 或 pypdf，或安装 poppler）")
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+def docx_pages(path: str, max_pages: int, deadline: Deadline) -> Iterator[str]:
+    """DOCX 没有分页信息：整篇按段落输出，只受体积和超时限制"""
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        for _, el in ElementTree.iterparse(f):
+            if el.tag == f"{_W}p":
+                deadline.check()
+                yield "".join(t.text or "" for t in el.iter(f"{_W}t")) + "\n"
+                el.clear()
+
+
+def pptx_pages(path: str, max_pages: int, deadline: Deadline) -> Iterator[str]:
+    """每张幻灯片算一页，按编号顺序"""
+    with zipfile.ZipFile(path) as z:
+        slides = sorted((n for n in z.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", n)),
+                        key=lambda n: int(re.search(r"\d+", n.rsplit("/", 1)[1]).group()))
+        for name in slides[:max_pages]:
+            deadline.check()
+            root = ElementTree.fromstring(z.read(name))
+            paras = ("".join(t.text or "" for t in p.iter(f"{_A}t")) for p in root.iter(f"{_A}p"))
+            yield "\n".join(p for p in paras if p) + "\n"
+
+
+EXTRACTORS: Dict[str, PageExtractor] = {
+    ".pdf": pdf_pages,
+    ".docx": docx_pages,
+    ".pptx": pptx_pages,
+}
+
+
+def register_extractor(suffix: str, fn: PageExtractor) -> None:
+    EXTRACTORS[suffix.lower()] = fn
+
+
+def output_path(path: str) -> str:
+    return path + ".txt"
+
+
+def _variant(suffix: str, max_pages: int, max_bytes: int) -> str:
+    """缓存键的一部分：提取方式或限制变了，缓存的文本就不能用"""
+    backend = _pdf_backend() if suffix == ".pdf" else "stdlib"
+    return f"{suffix}:{backend}:{max_pages}:{max_bytes}"
+
+
+def _write(path: str, text: str) -> None:
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def extract_one(path: str, max_pages: int = DOC_MAX_PAGES, max_bytes: int = DOC_MAX_BYTES,
+                timeout: float = DOC_TIMEOUT, fn: Optional[PageExtractor] = None) -> DocResult:
+    """
+    单个文档 -> <原文件名>.txt；进程池 worker 入口。
+    fn 由父进程按扩展名选好传进来（spawn 的子进程看不到父进程里 register_extractor 的注册）
+    """
+    fn = fn or EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    out = output_path(path)
+    if fn is None:
+        return DocResult(path, status="skipped", error="没有对应的提取器")
+    deadline = Deadline(timeout)
+    parts, size, pages, truncated = [], 0, 0, False
+    try:
+        for text in fn(path, max_pages, deadline):
+            pages += 1
+            data = text.encode("utf-8")
+            if size + len(data) > max_bytes:
+                parts.append(data[:max_bytes - size].decode("utf-8", "ignore"))
+                truncated = True
+                break
+            parts.append(text)
+            size += len(data)
+    except DocTimeout as e:
+        return DocResult(path, status="timeout", pages=pages, error=str(e))
+    except Exception as e:
+        return DocResult(path, status="failed", pages=pages, error=f"{type(e).__name__}: {e}")
+    _write(out, "".join(parts))
+    return DocResult(path, out, "extracted", pages, truncated)
+
+
+# ---------- 缓存 ----------
+class DocTextCache:
+    """(内容 sha256, 提取方式) -> 压缩后的文本"""
+
+    def __init__(self, path: str = DOC_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS doc_text (key TEXT PRIMARY KEY, "
+                           "text BLOB NOT NULL, pages INTEGER NOT NULL, "
+                           "truncated INTEGER NOT NULL, created REAL NOT NULL)")
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute("SELECT text, pages, truncated FROM doc_text WHERE key=?",
+                                     (key,)).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8"), row[1], bool(row[2])
+
+    def put(self, key: str, text: str, pages: int, truncated: bool) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO doc_text VALUES (?, ?, ?, ?, ?)",
+                               (key, zlib.compress(text.encode("utf-8")), pages,
+                                int(truncated), time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- 批量 ----------
+def _worker_main(conn) -> None:
+    """常驻 worker：一次收一个任务，先回一个 None 表示开始，再回 DocResult；收到 None 或管道关闭就退出"""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        path, args = task
+        conn.send(None)
+        try:
+            res = extract_one(path, *args)
+        except Exception as e:
+            res = DocResult(path, status="failed", error=f"{type(e).__name__}: {e}")
+        conn.send(res)
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.proc.start()
+        child.close()
+        self.path = ""
+        self.started: Optional[float] = None
+        self.submitted = 0.0
+
+    def submit(self, path: str, args: tuple) -> None:
+        self.conn.send((path, args))
+        self.path, self.started, self.submitted = path, None, time.monotonic()
+
+    def deadline(self, timeout: float) -> float:
+        """逐页检查拦不住的（卡在单页里），从 worker 真正开始算，多给 1 秒余量再杀"""
+        if self.started is None:
+            return self.submitted + timeout + 1 + _BOOT_GRACE
+        return self.started + timeout + 1
+
+    def kill(self) -> None:
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+
+class _DocPool:
+    """
+    每个任务从真正开始算超时：卡住的那个 worker 单独杀掉换新的，
+    不会因为前面一个文件卡死，让排队的文件没跑就被判超时。
+    """
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._idle: List[_Worker] = []
+
+    def run(self, paths: List[str], workers: int, max_pages: int, max_bytes: int,
+            timeout: float) -> Dict[str, DocResult]:
+        with self._lock:
+            queue: Deque[str] = deque(paths)
+            results: Dict[str, DocResult] = {}
+            active: Dict[object, _Worker] = {}
+            slots = min(workers, len(paths))
+            while queue or active:
+                while queue and len(active) < slots:
+                    p = queue.popleft()
+                    w = self._take()
+                    fn = EXTRACTORS.get(os.path.splitext(p)[1].lower())
+                    w.submit(p, (max_pages, max_bytes, timeout, fn))
+                    active[w.conn] = w
+                wait = min(w.deadline(timeout) for w in active.values()) - time.monotonic()
+                for conn in multiprocessing.connection.wait(list(active), max(wait, 0.01)):
+                    w = active[conn]
+                    try:
+                        msg = conn.recv()
+                    except (EOFError, OSError) as e:       # worker 崩了（比如段错误）
+                        del active[conn]
+                        results[w.path] = DocResult(w.path, status="failed",
+                                                    error=f"提取进程异常退出: {e!r}")
+                        w.kill()
+                        continue
+                    if msg is None:                        # 开始干活：从现在起计时
+                        w.started = time.monotonic()
+                        continue
+                    del active[conn]
+                    results[w.path] = msg
+                    self._idle.append(w)
+                now = time.monotonic()
+                for conn, w in list(active.items()):
+                    if now > w.deadline(timeout):
+                        logger.warning("文档提取卡死，终止 worker: %s", w.path)
+                        results[w.path] = DocResult(w.path, status="timeout",
+                                                    error="提取超时（进程被终止）")
+                        del active[conn]
+                        w.kill()
+            return results
+
+    def _take(self) -> _Worker:
+        while self._idle:
+            w = self._idle.pop()
+            if w.proc.is_alive():
+                return w
+            w.kill()
+        return _Worker(self._ctx)
+
+
+_pool: Optional[_DocPool] = None
+_pool_pid = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _DocPool:
+    """进程内共享；fork 出来的子进程不能用父进程的 worker，重建"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool, _pool_pid = _DocPool(), os.getpid()
+        return _pool
+
+
+def _run_pool(paths: List[str], workers: int, max_pages: int, max_bytes: int,
+              timeout: float) -> Dict[str, DocResult]:
+    if workers <= 1 or len(paths) <= 1:
+        return {p: extract_one(p, max_pages, max_bytes, timeout) for p in paths}
+    return _get_pool().run(paths, workers, max_pages, max_bytes, timeout)
+
+
+def extract_documents(files: List[str], workers: int = 0,
+                      max_pages: int = DOC_MAX_PAGES, max_bytes: int = DOC_MAX_BYTES,
+                      timeout: float = DOC_TIMEOUT, cache: Optional[DocTextCache] = None,
+                      use_cache: bool = DOC_CACHE) -> List[DocResult]:
+    """
+    结果顺序与 files 一致；workers 不传时取 DOC_WORKERS 按同时在跑的包数平分；
+    cache 不传且 use_cache 时打开默认缓存
+    """
+    workers = workers or cpu_share(DOC_WORKERS)
+    done: Dict[str, DocResult] = {}
+    todo: List[str] = []
+    keys: Dict[str, str] = {}
+    own_cache = cache is None and use_cache
+    if own_cache:
+        cache = DocTextCache()
+    try:
+        for f in files:
+            suffix = os.path.splitext(f)[1].lower()
+            out = output_path(f)
+            if suffix in TEXT_SUFFIXES:
+                done[f] = DocResult(f, f, "passthrough")
+            elif suffix not in EXTRACTORS:
+                done[f] = DocResult(f, status="skipped", error="没有对应的提取器")
+            elif os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(f):
+                done[f] = DocResult(f, out, "uptodate")
+            else:
+                if cache is not None:
+                    keys[f] = f"{sha256_file(f)}:{_variant(suffix, max_pages, max_bytes)}"
+                    hit = cache.get(keys[f])
+                    if hit is not None:
+                        text, pages, truncated = hit
+                        _write(out, text)
+                        done[f] = DocResult(f, out, "cached", pages, truncated)
+                        continue
+                todo.append(f)
+
+        done.update(_run_pool(todo, workers, max_pages, max_bytes, timeout))
+
+        if cache is not None:
+            for f in todo:
+                r = done[f]
+                if r.status == "extracted":
+                    with open(r.output, encoding="utf-8") as fp:
+                        cache.put(keys[f], fp.read(), r.pages, r.truncated)
+    finally:
+        if own_cache:
+            cache.close()
+    return [done[f] for f in files]
@@ -0,0 +1,183 @@
+"""
+浏览器下载完成检测：优先用 CDP 下载事件，没有事件才看目录变化，而不是固定 sleep + 定时 glob
+
+- CDP：旁路连接（side_channel）设置下载目录时开了 eventsEnabled，浏览器推送
+  Browser.downloadWillBegin / Browser.downloadProgress，每个下载 completed/canceled 就知道，
+  空文件、同名覆盖都不用猜
+- 目录兜底：Chrome/Edge 先写 xxx.crdownload，Firefox 先写 xxx.part（外加一个同名空文件占位），
+  写完再改名成最终文件名；所有"开始后出现的"临时文件都消失、最终文件都稳定 -> 全部下载完成
+- 超时按"多久没有任何进展"算：大文件只要还在增长就一直等，不会被固定超时截断
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from .fswatch import InotifySource, ReadyTracker, open_source
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PARTIAL_SUFFIX = (".crdownload", ".tmp", ".part", ".download")
+
+DOWNLOAD_IDLE_TIMEOUT = float(os.getenv("DOWNLOAD_IDLE_TIMEOUT", "60"))  # 秒：无进展多久放弃
+DOWNLOAD_GRACE = float(os.getenv("DOWNLOAD_GRACE", "1.5"))    # 秒：全部完成后再等等有没有下一个
+DOWNLOAD_SETTLE = 0.3                                          # 秒：最终文件大小不再变化
+DOWNLOAD_TICK = 0.1                                            # 秒：inotify 下等事件的间隔
+DOWNLOAD_POLL = float(os.getenv("DOWNLOAD_POLL", "0.5"))       # 秒：没有 inotify 时列目录的间隔
+
+
+@dataclass
+class Downloaded:
+    path: str
+    size: int
+
+
+def is_partial(path: str) -> bool:
+    return path.lower().endswith(PARTIAL_SUFFIX)
+
+
+class DownloadEvents:
+    """
+    收 CDP 下载事件（回调在事件循环线程里调用），wait() 在别的线程里阻塞等，
+    有事件就被唤醒，不轮询。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._items: Dict[str, dict] = {}       # guid -> name/path/state/received/started
+        self._last = clock()
+
+    def on_begin(self, params: dict) -> None:
+        """Browser.downloadWillBegin"""
+        with self._cond:
+            self._items[params["guid"]] = {
+                "name": params.get("suggestedFilename", ""), "path": "",
+                "state": "inProgress", "received": 0, "started": time.time()}
+            self._last = self.clock()
+            self._cond.notify_all()
+
+    def on_progress(self, params: dict) -> None:
+        """Browser.downloadProgress：inProgress / completed / canceled"""
+        with self._cond:
+            item = self._items.get(params["guid"])
+            if item is None:                    # 订阅前就开始的下载
+                item = self._items[params["guid"]] = {
+                    "name": "", "path": "", "state": "inProgress", "received": 0,
+                    "started": time.time()}
+            item["state"] = params.get("state", item["state"])
+            item["received"] = params.get("receivedBytes", item["received"])
+            item["path"] = params.get("filePath") or item["path"]
+            self._last = self.clock()
+            self._cond.notify_all()
+
+    def wait(self, folder: str, since: float, expected: int = 0,
+             idle_timeout: float = DOWNLOAD_IDLE_TIMEOUT,
+             grace: float = DOWNLOAD_GRACE) -> Optional[List[Downloaded]]:
+        """
+        等 since 之后开始的下载都 completed/canceled；grace 内一个下载事件都没有返回 None
+        （浏览器没推事件，交给目录扫描兜底）
+        """
+        start = self.clock()
+        with self._cond:
+            while True:
+                now = self.clock()
+                items = [i for i in self._items.values() if i["started"] >= since]
+                active = [i for i in items if i["state"] == "inProgress"]
+                done = [i for i in items if i["state"] == "completed"]
+                if not items:
+                    if now - start >= grace:
+                        return None
+                    deadline = start + grace
+                elif not active:
+                    if expected and len(done) >= expected:
+                        break
+                    if not expected and now - self._last >= grace:
+                        break
+                    deadline = self._last + grace
+                else:
+                    if now - self._last > idle_timeout:
+                        logger.warning("等待下载超时（%ss 无进展），未完成: %s",
+                                       idle_timeout, sorted(i["name"] for i in active))
+                        break
+                    deadline = self._last + idle_timeout
+                self._cond.wait(max(0.01, deadline - now))
+        out = []
+        for item in done:
+            path = item["path"] or os.path.join(folder, item["name"])
+            size = os.path.getsize(path) if os.path.exists(path) else item["received"]
+            out.append(Downloaded(path, size))
+        return sorted(out, key=lambda d: d.path)
+
+
+def wait_for_downloads(source_dir: str, since: float, expected: int = 0,
+                       idle_timeout: float = DOWNLOAD_IDLE_TIMEOUT,
+                       grace: float = DOWNLOAD_GRACE,
+                       events: Optional[DownloadEvents] = None) -> List[Downloaded]:
+    """
+    等 since 之后开始的下载全部完成，返回每个文件的最终路径与大小（按路径排序）。
+
+    :param since: time.time() 时间戳，之前就存在且没动过的文件不算
+    :param expected: 已知下载个数时，凑够就立即返回，不再等 grace
+    :param idle_timeout: 这么久没有任何新文件/增长就放弃，返回已完成的部分
+    :param events: 旁路连接的 CDP 下载事件；收不到事件时退回目录扫描
+    """
+    if events is not None:
+        got = events.wait(source_dir, since, expected, idle_timeout, grace)
+        if got is not None:
+            return got
+        logger.info("没有收到 CDP 下载事件，改为扫描 %s", source_dir)
+
+    source = open_source(source_dir)
+    tick = DOWNLOAD_TICK if isinstance(source, InotifySource) else DOWNLOAD_POLL
+    tracker = ReadyTracker(DOWNLOAD_SETTLE, min_size=0)
+    partial: Set[str] = set()
+    done: Dict[str, Downloaded] = {}
+
+    def note(path: str, complete: bool) -> None:
+        try:
+            if not os.path.isfile(path) or os.path.getctime(path) <= since:
+                return
+        except OSError:                       # 临时文件刚被改名走
+            return
+        if is_partial(path):
+            partial.add(path)
+        elif not os.path.basename(path).startswith("."):
+            done.pop(path, None)              # 同名文件被覆盖写：重新等稳定
+            (tracker.mark_complete if complete else tracker.touch)(path)
+
+    with os.scandir(source_dir) as it:        # 调用前就已经开始/完成的下载
+        for entry in it:
+            note(entry.path, True)
+
+    last_progress = time.monotonic()
+    try:
+        while True:
+            changes = source.changes(tick)
+            now = time.monotonic()
+            if changes:
+                last_progress = now
+            for path, complete in changes:
+                note(path, complete)
+            partial = {p for p in partial if os.path.exists(p)}
+            for path in tracker.poll():
+                if path + ".part" in partial:     # Firefox 的空占位文件，真正的内容还在 .part 里
+                    tracker.touch(path)
+                    continue
+                done[path] = Downloaded(path, os.path.getsize(path))
+                last_progress = now
+
+            if done and not partial and not len(tracker):
+                if expected and len(done) >= expected:
+                    break
+                if not expected and now - last_progress >= grace:
+                    break
+            if now - last_progress > idle_timeout:
+                logger.warning("等待下载超时（%ss 无进展），未完成: %s",
+                               idle_timeout, sorted(partial))
+                break
+    finally:
+        source.close()
+    return sorted(done.values(), key=lambda d: d.path)
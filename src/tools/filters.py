@@ -0,0 +1,99 @@
+"""
+解压过滤与预算
+
+学生包里常见 node_modules、.git、venv、编译产物、录屏视频……
+在解压**之前**按包内清单过滤：glob 包含/排除 + 单包文件数、总字节、单文件大小上限。
+被跳过的成员都会带原因返回，写进状态的 skipped 字段。
+
+glob 规则：
+  不含 / 的模式匹配任意一级路径名，如 node_modules、.git、*.mp4
+  含 / 的模式匹配完整包内路径，如 docs/*.pdf、*/build/*
+
+环境变量（逗号分隔）：
+  EXTRACT_FILTER=0          关闭过滤
+  EXTRACT_INCLUDE           默认 *
+  EXTRACT_EXCLUDE           覆盖默认排除列表
+  EXTRACT_MAX_FILES         默认 5000
+  EXTRACT_MAX_BYTES         单包解压总字节，默认 512 MiB
+  EXTRACT_MAX_FILE_SIZE     单文件上限，默认 64 MiB
+"""
+import os
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_EXCLUDE = [
+    # 依赖 / 虚拟环境 / 版本库
+    "node_modules", "bower_components", ".git", ".svn", ".hg",
+    "venv", ".venv", "site-packages", "__pycache__",
+    # IDE 与系统垃圾
+    ".idea", ".vs", ".vscode", "__MACOSX", ".DS_Store", "Thumbs.db",
+    # 编译产物
+    "build", "dist", "target", "cmake-build-*",
+    "*.o", "*.obj", "*.class", "*.pyc", "*.pdb", "*.ilk",
+    # 音视频
+    "*.mp4", "*.mov", "*.avi", "*.mkv", "*.flv", "*.wmv", "*.mp3", "*.wav",
+]
+
+
+def _split(v: Optional[str]) -> Optional[List[str]]:
+    return [p.strip() for p in v.split(",") if p.strip()] if v else None
+
+
+@dataclass
+class ExtractPolicy:
+    include: List[str] = field(default_factory=lambda: ["*"])
+    exclude: List[str] = field(default_factory=lambda: list(DEFAULT_EXCLUDE))
+    max_files: int = 5000
+    max_total_bytes: int = 512 << 20
+    max_file_size: int = 64 << 20
+
+    @classmethod
+    def from_env(cls) -> Optional["ExtractPolicy"]:
+        """EXTRACT_FILTER=0 时返回 None，表示不过滤"""
+        if os.getenv("EXTRACT_FILTER", "1") == "0":
+            return None
+        p = cls()
+        p.include = _split(os.getenv("EXTRACT_INCLUDE")) or p.include
+        p.exclude = _split(os.getenv("EXTRACT_EXCLUDE")) or p.exclude
+        p.max_files = int(os.getenv("EXTRACT_MAX_FILES", p.max_files))
+        p.max_total_bytes = int(os.getenv("EXTRACT_MAX_BYTES", p.max_total_bytes))
+        p.max_file_size = int(os.getenv("EXTRACT_MAX_FILE_SIZE", p.max_file_size))
+        return p
+
+
+def match(name: str, pattern: str) -> bool:
+    name = name.strip("/")
+    if "/" in pattern:
+        return fnmatch(name, pattern)
+    return any(fnmatch(part, pattern) for part in name.split("/"))
+
+
+def apply_policy(entries: Iterable[Tuple[str, int]], policy: ExtractPolicy
+                 ) -> Tuple[List[str], List[dict]]:
+    """
+    :param entries: 包内清单 [(成员名, 大小)]，大小未知传 -1
+    :return: (保留的成员名, 跳过的成员 [{name, size, reason}])
+    """
+    kept, skipped = [], []
+    total = 0
+    for name, size in entries:
+        reason = ""
+        if not any(match(name, p) for p in policy.include):
+            reason = "not included"
+        else:
+            hit = next((p for p in policy.exclude if match(name, p)), None)
+            if hit:
+                reason = f"excluded:{hit}"
+            elif size > policy.max_file_size:
+                reason = "max_file_size"
+            elif len(kept) >= policy.max_files:
+                reason = "max_files"
+            elif total + max(size, 0) > policy.max_total_bytes:
+                reason = "max_total_bytes"
+        if reason:
+            skipped.append({"name": name, "size": size, "reason": reason})
+        else:
+            kept.append(name)
+            total += max(size, 0)
+    return kept, skipped
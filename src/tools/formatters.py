@@ -0,0 +1,348 @@
+"""
+代码格式化引擎：按语言分派，多核并行，格式化过的内容不再重复处理
+
+- Python：进程内调用 black API（black.format_file_in_place），按块分给进程池，不再一条命令行塞全部路径；
+  进程池用 spawn 启动、进程内共享一个（后处理分支跑在线程里，线程里 fork 不安全，
+  每个包重新起进程也浪费）
+- C/C++/Java/C#：clang-format -i；JS/TS/CSS/HTML/Vue：prettier --write；Go：gofmt -w
+  命令行工具按块批量调用（每块受 FORMAT_CHUNK 个数和命令行长度双重限制），多块并发
+- 缓存（SQLite）：按"格式化器 + 版本 + 输入内容 sha256"记下格式化后的内容，命中直接写回
+  （同一份起始代码在几百个包里只格式化一次；已是格式化输出的内容也算命中；
+  格式化器升级后自动失效）
+
+环境变量：
+  FORMAT_WORKERS      并行进程/批次总数，默认 CPU 核数；批量模式按同时在跑的包数平分
+  FORMAT_CHUNK        每块文件数，默认 64
+  FORMAT_CACHE        0 关闭缓存
+  FORMAT_CACHE_PATH   默认 ~/.cache/teaching_assistant/format.sqlite3
+
+扩展：
+  register_formatter(CliFormatter("rustfmt", ["rustfmt"], ["{exe}", "--quiet"], {"rs"}))
+"""
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .sniff import EXTENSIONS
+from ..utils.hashing import sha256_bytes, sha256_file
+from ..utils.logger import get_logger
+from ..utils.workers import cpu_share
+
+logger = get_logger(__name__)
+
+FORMAT_WORKERS = int(os.getenv("FORMAT_WORKERS", "0")) or os.cpu_count() or 1
+FORMAT_CHUNK = int(os.getenv("FORMAT_CHUNK", "64"))
+FORMAT_CACHE = os.getenv("FORMAT_CACHE", "1") != "0"
+FORMAT_CACHE_PATH = os.getenv("FORMAT_CACHE_PATH") or str(
+    Path.home() / ".cache" / "teaching_assistant" / "format.sqlite3")
+MAX_CMDLINE = 30_000          # 字符：Windows 命令行上限 32767，留点余量
+
+
+@dataclass
+class FormatStats:
+    formatted: int = 0        # 内容有改动
+    unchanged: int = 0        # 本来就符合格式
+    cached: int = 0           # 缓存命中，没调用格式化器
+    failed: int = 0
+    skipped: int = 0          # 没有对应格式化器 / 格式化器不可用
+    errors: List[str] = field(default_factory=list)
+
+    def add(self, status: str, error: str = "") -> None:
+        setattr(self, status, getattr(self, status) + 1)
+        if error:
+            self.errors.append(error)
+
+
+# ---------- 缓存 ----------
+class FormatCache:
+    """
+    (格式化器@版本, 输入内容 sha256) -> 格式化后的内容；output 为 NULL 表示输入本来就符合格式。
+    格式化出的新内容本身也以"不变"登记，已格式化过的文件再来同样命中。
+    """
+
+    def __init__(self, path: str = FORMAT_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS format_outputs (formatter TEXT NOT NULL, "
+                           "digest TEXT NOT NULL, output BLOB, created REAL NOT NULL, "
+                           "PRIMARY KEY (formatter, digest))")
+
+    def lookup(self, formatter: str, digests: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """命中的 {输入 sha256: 格式化后内容（None 为不变）}"""
+        digests = list(set(digests))
+        found: Dict[str, Optional[bytes]] = {}
+        with self._lock:
+            for i in range(0, len(digests), 500):          # SQLite 参数个数上限
+                part = digests[i:i + 500]
+                found.update(self._conn.execute(
+                    f"SELECT digest, output FROM format_outputs WHERE formatter=? AND digest IN "
+                    f"({','.join('?' * len(part))})", (formatter, *part)))
+        return found
+
+    def add(self, formatter: str, entries: Iterable[Tuple[str, Optional[bytes]]]) -> None:
+        """entries: (输入 sha256, 格式化后内容或 None)"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO format_outputs(formatter, digest, output, created) "
+                "VALUES (?, ?, ?, ?)", [(formatter, d, out, now) for d, out in entries])
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------- 格式化器 ----------
+def _chunks(paths: List[str], size: int, max_chars: int = MAX_CMDLINE) -> List[List[str]]:
+    out, cur, chars = [], [], 0
+    for p in paths:
+        if cur and (len(cur) >= size or chars + len(p) + 1 > max_chars):
+            out.append(cur)
+            cur, chars = [], 0
+        cur.append(p)
+        chars += len(p) + 1
+    if cur:
+        out.append(cur)
+    return out
+
+
+class Formatter(ABC):
+    name = "base"
+    languages: frozenset = frozenset()
+
+    def available(self) -> bool:
+        return True
+
+    def version(self) -> str:
+        return ""
+
+    @abstractmethod
+    def format_chunk(self, paths: List[str]) -> List[Tuple[str, str, str]]:
+        """原地格式化一块文件，返回 [(路径, formatted|unchanged|failed, 错误)]"""
+
+    def run(self, paths: List[str], workers: int, chunk: int) -> List[Tuple[str, str, str]]:
+        """分块并发；默认线程池（每块是一次外部命令）"""
+        chunks = _chunks(paths, chunk)
+        if len(chunks) == 1 or workers <= 1:
+            return [r for c in chunks for r in self.format_chunk(c)]
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            return [r for rs in pool.map(self.format_chunk, chunks) for r in rs]
+
+
+def _black_chunk(paths: List[str]) -> List[Tuple[str, str, str]]:
+    """进程池 worker：进程内调 black，不起子进程"""
+    import black
+    mode = black.Mode()
+    out = []
+    for p in paths:
+        try:
+            changed = black.format_file_in_place(Path(p), fast=False, mode=mode,
+                                                 write_back=black.WriteBack.YES)
+            out.append((p, "formatted" if changed else "unchanged", ""))
+        except Exception as e:                 # 语法错误的学生代码很常见，单个失败不影响整块
+            out.append((p, "failed", f"{p}: {type(e).__name__}: {e}"))
+    return out
+
+
+_black_pool: Optional[ProcessPoolExecutor] = None
+_black_pool_key: Tuple[int, int] = (0, 0)          # (pid, 进程数)
+_black_pool_lock = threading.Lock()
+
+
+def _get_black_pool(workers: int) -> ProcessPoolExecutor:
+    """进程内共享、用到才建；fork 出来的子进程或要更多进程时重建"""
+    global _black_pool, _black_pool_key
+    with _black_pool_lock:
+        pid = os.getpid()
+        if _black_pool is None or _black_pool_key[0] != pid or _black_pool_key[1] < workers:
+            if _black_pool is not None and _black_pool_key[0] == pid:
+                _black_pool.shutdown(wait=False)
+            _black_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _black_pool_key = (pid, workers)
+        return _black_pool
+
+
+class BlackFormatter(Formatter):
+    name = "black"
+    languages = frozenset({"py"})
+
+    def available(self) -> bool:
+        try:
+            import black  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def version(self) -> str:
+        import black
+        return black.__version__
+
+    def format_chunk(self, paths):
+        return _black_chunk(paths)
+
+    def run(self, paths, workers, chunk):
+        # black 是纯 Python、吃 CPU：用进程池才能用上多核；一块就不起进程了
+        chunks = _chunks(paths, chunk)
+        if len(chunks) == 1 or workers <= 1:
+            return [r for c in chunks for r in _black_chunk(c)]
+        pool = _get_black_pool(workers)
+        return [r for rs in pool.map(_black_chunk, chunks) for r in rs]
+
+
+class CliFormatter(Formatter):
+    """外部格式化命令：argv 里 {exe} 会被替换，文件路径追加在末尾"""
+
+    def __init__(self, name: str, executables: List[str], argv: List[str],
+                 languages: Set[str], version_argv: Optional[List[str]] = None):
+        self.name = name
+        self.executables = executables
+        self.argv = argv
+        self.languages = frozenset(languages)
+        self.version_argv = version_argv or ["{exe}", "--version"]
+        self._version: Optional[str] = None
+
+    def _exe(self) -> Optional[str]:
+        return next((shutil.which(e) for e in self.executables if shutil.which(e)), None)
+
+    def available(self) -> bool:
+        return self._exe() is not None
+
+    def version(self) -> str:
+        if self._version is None:
+            cmd = [a.format(exe=self._exe()) for a in self.version_argv]
+            try:
+                res = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+                self._version = (res.stdout or res.stderr).strip().splitlines()[0]
+            except (OSError, subprocess.SubprocessError, IndexError):
+                self._version = "unknown"
+        return self._version
+
+    def _invoke(self, paths: List[str]) -> subprocess.CompletedProcess:
+        cmd = [a.format(exe=self._exe()) for a in self.argv] + paths
+        return subprocess.run(cmd, capture_output=True, text=True,
+                              encoding="utf-8", errors="replace")
+
+    def format_chunk(self, paths):
+        before = {p: sha256_file(p) for p in paths}
+        res = self._invoke(paths)
+        errors = {}
+        if res.returncode != 0:
+            if len(paths) == 1:
+                errors[paths[0]] = res.stderr
+            else:
+                # 一块里有文件报错（语法错误等）时工具可能放弃其余文件：逐个重试，找出坏的
+                for p in paths:
+                    single = self._invoke([p])
+                    if single.returncode != 0:
+                        errors[p] = single.stderr
+        out = []
+        for p in paths:
+            if p in errors:
+                out.append((p, "failed", f"{p}: {errors[p].strip()[:200]}"))
+            else:
+                out.append((p, "formatted" if sha256_file(p) != before[p] else "unchanged", ""))
+        return out
+
+
+# 同一语言可以有多个候选，按顺序取第一个可用的
+FORMATTERS: List[Formatter] = [
+    BlackFormatter(),
+    CliFormatter("clang-format", ["clang-format"], ["{exe}", "-i", "--style=file"],
+                 {"c", "cpp", "java", "cs"}),
+    CliFormatter("prettier", ["prettier", "prettier.cmd"], ["{exe}", "--write"],
+                 {"js", "ts", "css", "html", "vue"}),
+    CliFormatter("gofmt", ["gofmt"], ["{exe}", "-w"], {"go"}, version_argv=["go", "version"]),
+]
+
+
+def register_formatter(formatter: Formatter, first: bool = True) -> None:
+    if first:
+        FORMATTERS.insert(0, formatter)
+    else:
+        FORMATTERS.append(formatter)
+
+
+def formatter_for(language: str) -> Optional[Formatter]:
+    return next((f for f in FORMATTERS if language in f.languages and f.available()), None)
+
+
+def language_of(path: str) -> str:
+    """分类结果没给语言时按扩展名推断"""
+    hit = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    return hit[1] if hit and hit[0] == "code" else ""
+
+
+def format_files(files: List[str], languages: Optional[Dict[str, str]] = None,
+                 workers: int = 0, chunk: int = FORMAT_CHUNK,
+                 cache: Optional[FormatCache] = None,
+                 use_cache: bool = FORMAT_CACHE) -> FormatStats:
+    """
+    :param languages: {路径: 语言}（分类结果里的 language）；缺省或不认识
+                      （LLM 给的 "Python3"、"C++" 之类）时按扩展名推断
+    :param workers: 不传时取 FORMAT_WORKERS 按同时在跑的包数平分
+    :param cache: 不传且 use_cache 时打开默认缓存
+    """
+    workers = workers or cpu_share(FORMAT_WORKERS)
+    languages = languages or {}
+    stats = FormatStats()
+    by_formatter: Dict[str, Tuple[Formatter, List[str]]] = {}
+    for f in files:
+        fmt = formatter_for((languages.get(f) or "").lower()) or formatter_for(language_of(f))
+        if fmt is None:
+            stats.add("skipped")
+            continue
+        by_formatter.setdefault(fmt.name, (fmt, []))[1].append(f)
+
+    own_cache = cache is None and use_cache
+    if own_cache:
+        cache = FormatCache()
+    try:
+        for fmt, paths in by_formatter.values():
+            key = f"{fmt.name}@{fmt.version()}"
+            todo = paths
+            if cache is not None:
+                digests = {p: sha256_file(p) for p in paths}
+                hits = cache.lookup(key, digests.values())
+                todo = []
+                for p in paths:
+                    if digests[p] not in hits:
+                        todo.append(p)
+                        continue
+                    output = hits[digests[p]]
+                    if output is not None:
+                        with open(p, "wb") as fp:
+                            fp.write(output)
+                    stats.cached += 1
+            results = fmt.run(todo, workers, chunk) if todo else []
+            entries = []
+            for path, status, error in results:
+                stats.add(status, error)
+                if cache is None or status == "failed":
+                    continue
+                if status == "formatted":
+                    with open(path, "rb") as fp:
+                        output = fp.read()
+                    entries += [(digests[path], output), (sha256_bytes(output), None)]
+                else:
+                    entries.append((digests[path], None))
+            if entries:
+                cache.add(key, entries)
+            logger.info("%s: %d files, %d cached, %d failed", key, len(paths),
+                        len(paths) - len(todo), sum(r[1] == "failed" for r in results))
+    finally:
+        if own_cache:
+            cache.close()
+    return stats
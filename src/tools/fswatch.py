@@ -0,0 +1,148 @@
+"""
+目录变化监视的基础件：就绪判定 + 事件源（Linux inotify / 通用轮询）
+
+- 守护模式（agent/watch.py）用来发现新到的压缩包
+- 下载完成检测（tools/downloads.py）用来等浏览器把文件写完
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WATCH_SETTLE = float(os.getenv("WATCH_SETTLE", "2"))   # 秒：大小不再变化多久算写完
+
+Change = Tuple[str, bool]          # (路径, 是否已确认写完)
+
+
+class ReadyTracker:
+    """记录候选文件的 (大小, mtime)，稳定够久才放行；小于 min_size 的不放行（0 表示空文件也算）"""
+
+    def __init__(self, settle: float = WATCH_SETTLE, clock: Callable[[], float] = time.monotonic,
+                 min_size: int = 1):
+        self.settle = settle
+        self.clock = clock
+        self.min_size = min_size
+        self._pending: Dict[str, Tuple[int, int, float]] = {}   # path -> (size, mtime_ns, since)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _stat(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def touch(self, path: str) -> None:
+        """文件有变化：从现在起重新计时"""
+        stat = self._stat(path)
+        if stat is not None:
+            self._pending[path] = (*stat, self.clock())
+
+    def mark_complete(self, path: str) -> None:
+        """写端已确认写完：下一次 poll 只要大小没再变就放行"""
+        stat = self._stat(path)
+        if stat is not None:
+            self._pending[path] = (*stat, self.clock() - self.settle)
+
+    def poll(self) -> List[str]:
+        now, ready = self.clock(), []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            stat = self._stat(path)
+            if stat is None:                     # 被删/被改名走了
+                del self._pending[path]
+            elif stat != (size, mtime):
+                self._pending[path] = (*stat, now)
+            elif size >= self.min_size and now - since >= self.settle:
+                del self._pending[path]
+                ready.append(path)
+        return ready
+
+
+class PollingSource:
+    """通用事件源：定期列目录，比较 (大小, mtime)"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._seen: Dict[str, Tuple[int, int]] = {}
+
+    def changes(self, timeout: float) -> List[Change]:
+        time.sleep(timeout)
+        out, seen = [], {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except FileNotFoundError:          # 列目录和 stat 之间被删/改名
+                    continue
+                seen[entry.path] = (st.st_size, st.st_mtime_ns)
+                if self._seen.get(entry.path) != seen[entry.path]:
+                    out.append((entry.path, False))
+        self._seen = seen
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+class InotifySource:
+    """Linux inotify：有事件立刻返回，没有事件最多等 timeout"""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    _EVENT = struct.Struct("iIII")          # wd, mask, cookie, len
+
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.folder = folder
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch 失败: {folder}")
+
+    def changes(self, timeout: float) -> List[Change]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        out, pos = [], 0
+        while pos + self._EVENT.size <= len(buf):
+            _, mask, _, length = self._EVENT.unpack_from(buf, pos)
+            pos += self._EVENT.size
+            name = buf[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name:
+                done = bool(mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO))
+                out.append((os.path.join(self.folder, os.fsdecode(name)), done))
+        return out
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_source(folder: str, use_inotify: bool = True):
+    if use_inotify and sys.platform.startswith("linux"):
+        try:
+            return InotifySource(folder)
+        except OSError as e:
+            logger.warning("inotify 不可用（%s），改用轮询", e)
+    return PollingSource(folder)
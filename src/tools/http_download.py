@@ -0,0 +1,224 @@
+"""
+直连 HTTP 下载器：复用浏览器登录态，不再让 agent 在可见浏览器里点"批量下载"
+
+- 登录态：Playwright storage_state（context.storage_state() 导出的 cookies）转成 httpx Cookies
+- 一个 httpx.AsyncClient 连接池（keep-alive 复用），Semaphore 限制并发（HTTP_DOWNLOAD_CONCURRENCY）
+- 先写 <name>.part，断了带 Range: bytes=<已下载>- 续传；服务端不支持 Range（回 200）就截断从头写
+- 续传带 If-Range（第一次响应的强 ETag 或 Last-Modified，存在 <name>.part.validator），
+  服务端文件变了会回 200 整个重传，而不是把新文件的后半截拼到旧文件上
+- 416 且对不上已知大小：删掉 .part 从 0 重来
+- Accept-Encoding: identity：落盘的字节和 Content-Length / Content-Range 是同一种计量；
+  服务端仍然压缩时不拿 Content-Length 校验
+- 大小（Content-Length / Content-Range / 清单给的 size）与 sha256（若给出）校验不过则删掉重下
+- 网络错误 / 5xx / 429：指数退避重试，已下载的部分保留
+"""
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+from urllib.parse import unquote, urlparse
+
+import httpx
+
+from ..utils.hashing import CHUNK_SIZE
+from ..utils.logger import get_logger
+from ..utils.retry import backoff_delay
+
+logger = get_logger(__name__)
+
+CONCURRENCY = int(os.getenv("HTTP_DOWNLOAD_CONCURRENCY", "6"))
+MAX_RETRIES = int(os.getenv("HTTP_DOWNLOAD_RETRIES", "5"))
+TIMEOUT = float(os.getenv("HTTP_DOWNLOAD_TIMEOUT", "30"))    # 秒：连接/两次读之间
+
+
+class VerifyError(Exception):
+    """下载完成但大小对不上（可续传重试）"""
+
+
+class ChecksumError(VerifyError):
+    """sha256 对不上：文件已删除，不再重试"""
+
+
+@dataclass
+class DownloadItem:
+    url: str
+    name: str = ""                   # 为空时取 URL 最后一段
+    size: Optional[int] = None       # 已知大小（文件列表接口给的）
+    sha256: Optional[str] = None
+    modified: str = ""               # 列表给的修改时间 / Last-Modified（增量同步用）
+    etag: str = ""
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: str
+    size: int
+    status: str                      # ok | failed
+    error: str = ""
+    resumed: bool = False            # 是否用过 Range 续传
+    etag: str = ""                   # 响应头里的 ETag / Last-Modified
+    modified: str = ""
+
+
+def cookies_from_storage_state(state: Union[dict, str]) -> httpx.Cookies:
+    """state 可以是 storage_state() 返回的 dict，也可以是保存下来的 JSON 文件路径"""
+    if isinstance(state, str):
+        with open(state, encoding="utf-8") as f:
+            state = json.load(f)
+    jar = httpx.Cookies()
+    for c in state.get("cookies", []):
+        jar.set(c["name"], c["value"], domain=c.get("domain", "").lstrip("."),
+                path=c.get("path", "/"))
+    return jar
+
+
+def target_name(item: DownloadItem) -> str:
+    name = item.name or unquote(os.path.basename(urlparse(item.url).path)) or "download"
+    return os.path.basename(name)           # 不允许带目录
+
+
+def _total_size(resp: httpx.Response, offset: int) -> Optional[int]:
+    if resp.status_code == 206:             # Content-Range: bytes 100-999/1000
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    length = resp.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def _validator(headers: httpx.Headers) -> str:
+    """If-Range 只接受强 ETag，弱 ETag（W/...）时退回 Last-Modified"""
+    etag = headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified", "")
+
+
+def _discard(part: str) -> None:
+    for p in (part, part + ".validator"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    if isinstance(e, ChecksumError):
+        return False
+    return isinstance(e, (httpx.TransportError, VerifyError))
+
+
+async def _fetch_once(client: httpx.AsyncClient, item: DownloadItem, part: str) -> tuple:
+    """下载（或续传）到 part，返回 (总大小, sha256, 是否续传, 响应头)"""
+    digest = hashlib.sha256()
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    vfile = part + ".validator"
+    if offset:
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if os.path.exists(vfile):
+            with open(vfile, encoding="utf-8") as f:
+                validator = f.read().strip()
+            if validator:
+                headers["If-Range"] = validator
+
+    async with client.stream("GET", item.url, headers=headers) as resp:
+        if resp.status_code == 416 and offset:
+            # Content-Range: bytes */1000
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            expect = item.size if item.size is not None else \
+                (int(total) if total.isdigit() else None)
+            if offset == expect:
+                return offset, digest.hexdigest(), True, resp.headers   # 上次其实已经下完
+            _discard(part)                                  # 对不上（文件变小了 / 大小未知）：从 0 重来
+            raise VerifyError(f"416: 已下载 {offset} 字节，服务端大小 {total or '未知'}")
+        resp.raise_for_status()
+        if resp.status_code != 206:         # 不支持 Range 或 If-Range 不匹配：截断从头写
+            offset, digest = 0, hashlib.sha256()
+        if not offset:
+            validator = _validator(resp.headers)
+            if validator:
+                with open(vfile, "w", encoding="utf-8") as f:
+                    f.write(validator)
+            elif os.path.exists(vfile):
+                os.remove(vfile)
+        encoding = resp.headers.get("Content-Encoding", "identity").lower()
+        # 服务端无视 identity 照样压缩：Content-Length 是压缩后的大小，不能拿来比
+        total = _total_size(resp, offset) if encoding == "identity" else None
+        with open(part, "ab" if offset else "wb") as f:
+            async for chunk in resp.aiter_bytes():     # 收到多少写多少，断了也不丢
+                f.write(chunk)
+                digest.update(chunk)
+    return total, digest.hexdigest(), bool(offset), resp.headers
+
+
+async def _download_one(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                        item: DownloadItem, dest_dir: str, max_retries: int) -> DownloadResult:
+    path = os.path.join(dest_dir, target_name(item))
+    part = path + ".part"
+    resumed = False
+    async with sem:
+        for attempt in range(max_retries + 1):
+            try:
+                total, sha, used_range, headers = await _fetch_once(client, item, part)
+                resumed = resumed or used_range
+                size = os.path.getsize(part)
+                expect = item.size if item.size is not None else total
+                if expect is not None and size != expect:
+                    raise VerifyError(f"大小不符: {size} != {expect}")
+                if item.sha256 and sha != item.sha256.lower():
+                    _discard(part)              # 内容错了，续传也没用
+                    raise ChecksumError(f"sha256 不符: {sha}")
+                os.replace(part, path)
+                _discard(part)
+                return DownloadResult(item.url, path, size, "ok", resumed=resumed,
+                                      etag=headers.get("ETag", ""),
+                                      modified=headers.get("Last-Modified", ""))
+            except Exception as e:
+                if attempt >= max_retries or not _is_retryable(e):
+                    logger.error("下载失败 %s: %s", item.url, e)
+                    return DownloadResult(item.url, path, 0, "failed",
+                                          f"{type(e).__name__}: {e}", resumed)
+                delay = backoff_delay(attempt)
+                logger.warning("下载中断 %s（%s），%.1fs 后续传", item.url, e, delay)
+                await asyncio.sleep(delay)
+
+
+def make_client(storage_state: Union[dict, str, None] = None,
+                headers: Optional[Dict[str, str]] = None,
+                concurrency: int = CONCURRENCY) -> httpx.AsyncClient:
+    """带登录态的连接池；用 async with 管理生命周期"""
+    cookies = cookies_from_storage_state(storage_state) if storage_state else None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(cookies=cookies, headers=headers, limits=limits,
+                             timeout=TIMEOUT, follow_redirects=True)
+
+
+async def download_items(client: httpx.AsyncClient, items: List[DownloadItem], dest_dir: str,
+                         concurrency: int = CONCURRENCY,
+                         max_retries: int = MAX_RETRIES) -> List[DownloadResult]:
+    """在已有连接池上并发下载，结果顺序与 items 一致；单个失败不影响其他"""
+    os.makedirs(dest_dir, exist_ok=True)
+    sem = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(
+        *(_download_one(client, sem, it, dest_dir, max_retries) for it in items)))
+
+
+async def adownload_all(items: List[DownloadItem], dest_dir: str,
+                        storage_state: Union[dict, str, None] = None,
+                        headers: Optional[Dict[str, str]] = None,
+                        concurrency: int = CONCURRENCY,
+                        max_retries: int = MAX_RETRIES) -> List[DownloadResult]:
+    async with make_client(storage_state, headers, concurrency) as client:
+        return await download_items(client, items, dest_dir, concurrency, max_retries)
+
+
+def download_all(items: List[DownloadItem], dest_dir: str, **kw) -> List[DownloadResult]:
+    """同步入口"""
+    return asyncio.run(adownload_all(items, dest_dir, **kw))
@@ -0,0 +1,85 @@
+"""
+批量处理清单（SQLite）：记录每个压缩包处理过的结果，重跑时只处理新增/变化的包
+
+指纹 = 路径 + 大小 + mtime；开启 use_hash 后，mtime 变了但大小没变时再比对内容 sha256
+（复制、重新下载同一文件会改 mtime，内容其实没变）。
+只复用成功（ok）的结果，失败的包下次照样重跑。
+
+默认位置：<扫描目录>/.tas_manifest.sqlite3
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from ..utils.hashing import sha256_file
+
+MANIFEST_NAME = ".tas_manifest.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    sha256    TEXT NOT NULL DEFAULT '',
+    status    TEXT NOT NULL,
+    result    TEXT NOT NULL,
+    updated   REAL NOT NULL
+);
+"""
+
+
+def _jsonable(obj):
+    """分类结果里的 FileRecord 等带 to_dict 的对象按字典写入"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+class BatchManifest:
+    def __init__(self, path: str, use_hash: bool = False):
+        self.path = path
+        self.use_hash = use_hash
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.executescript(_SCHEMA)
+
+    def lookup(self, pkg: str) -> Optional[dict]:
+        """指纹一致且上次成功则返回上次的结果，否则 None（需要重新处理）"""
+        pkg = os.path.abspath(pkg)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, sha256, status, result FROM archives WHERE path=?",
+                (pkg,)).fetchone()
+        if row is None or row[3] != "ok":
+            return None
+        size, mtime_ns, digest, _, result = row
+        st = os.stat(pkg)
+        if st.st_size != size:
+            return None
+        if st.st_mtime_ns != mtime_ns:
+            if not (self.use_hash and digest and sha256_file(pkg) == digest):
+                return None
+            with self._lock:            # 内容没变，刷新 mtime 免得下次再算哈希
+                self._conn.execute("UPDATE archives SET mtime_ns=? WHERE path=?",
+                                   (st.st_mtime_ns, pkg))
+                self._conn.commit()
+        return json.loads(result)
+
+    def record(self, pkg: str, result: dict) -> None:
+        pkg = os.path.abspath(pkg)
+        st = os.stat(pkg)
+        digest = sha256_file(pkg) if self.use_hash else ""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archives(path, size, mtime_ns, sha256, status, "
+                "result, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pkg, st.st_size, st.st_mtime_ns, digest, result["status"],
+                 json.dumps(result, ensure_ascii=False, default=_jsonable), time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,222 @@
+"""
+嵌套压缩包递归展开：7z 里套 rar 里套 zip 的提交，内层成员也进分类
+
+按魔数（sniff）认出 type=archive 的文件，原地换成同名目录：
+    作业.zip/src/main.py      （原来的 作业.zip 文件被删除，目录名保留 .zip 方便看出来源）
+- 深度：包里直接出现的压缩包算第 1 层，超过 NESTED_MAX_DEPTH 的原样保留
+- 体积：整个包所有内层展开的字节累计不超过 NESTED_MAX_BYTES（防 zip 炸弹），
+  超了就回滚当前这个内层包、后面的也不再展开
+- 内层的内层（≤ NESTED_MEMORY_MAX）直接在内存里打开，不落临时文件
+- 解压策略（EXTRACT_POLICY）同样作用于每个内层包的清单
+损坏/不支持的内层包原样保留，照常按 archive 分类。
+"""
+import io
+import os
+import shutil
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from .archive import (
+    HEADER_SIZE, UnsupportedArchive, detect_format, extract_archive, get_backend, member_path,
+)
+from .classify import read_header
+from .filters import ExtractPolicy, apply_policy
+from .sniff import sniff
+from ..utils.hashing import CHUNK_SIZE
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+NESTED_MAX_DEPTH = int(os.getenv("NESTED_MAX_DEPTH", "3"))
+NESTED_MAX_BYTES = int(os.getenv("NESTED_MAX_BYTES", str(2 << 30)))
+NESTED_MEMORY_MAX = int(os.getenv("NESTED_MEMORY_MAX", str(64 << 20)))
+
+# zip 容器但不是"压缩包"的格式，保持原样交给分类
+NOT_NESTED_EXT = {".jar", ".war", ".apk", ".whl", ".epub", ".odt", ".ods", ".odp",
+                  ".vsix", ".xpi", ".ipa", ".aar"}
+
+_SUFFIX = ".nested"      # 展开期间内层包暂存名
+
+
+class NestedBudgetExceeded(Exception):
+    """内层展开累计字节超过 NESTED_MAX_BYTES"""
+
+
+def is_nested_archive(name: str, header: bytes) -> bool:
+    if os.path.splitext(name)[1].lower() in NOT_NESTED_EXT:
+        return False
+    res = sniff(name, header)
+    return bool(res) and res["type"] == "archive" and res["confidence"] >= 0.8
+
+
+class NestedExpander:
+    """
+    一个包一个实例：expand(files) 返回展开后的文件列表。
+    expanded：[{archive, depth, files}]；skipped：[{name, size, reason}]（同解压策略的格式）
+    """
+
+    def __init__(self, max_depth: int = NESTED_MAX_DEPTH, max_bytes: int = NESTED_MAX_BYTES,
+                 memory_max: int = NESTED_MEMORY_MAX, policy: Optional[ExtractPolicy] = None):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.memory_max = memory_max
+        self.policy = policy
+        self.used = 0
+        self.exhausted = False
+        self.expanded: List[dict] = []
+        self.skipped: List[dict] = []
+
+    # ---------- 记账 ----------
+    def _charge(self, n: int) -> None:
+        self.used += n
+        if self.used > self.max_bytes:
+            raise NestedBudgetExceeded(f"内层展开超过 {self.max_bytes} 字节")
+
+    def _copy(self, header: bytes, fp: BinaryIO, target: str) -> None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as out:
+            self._charge(len(header))
+            out.write(header)
+            for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                self._charge(len(chunk))
+                out.write(chunk)
+
+    def _read(self, header: bytes, fp: BinaryIO, name: str) -> io.BytesIO:
+        buf = io.BytesIO()
+        self._charge(len(header))
+        buf.write(header)
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            self._charge(len(chunk))
+            buf.write(chunk)
+        buf.seek(0)
+        buf.name = name
+        return buf
+
+    # ---------- 展开 ----------
+    def _members(self, source: Union[str, BinaryIO]):
+        backend = get_backend(detect_format(source), streaming=True)
+        container, members = backend.open_members(source)
+        if self.policy:
+            kept, skipped = apply_policy([(n, s) for n, s, _ in members], self.policy)
+            self.skipped.extend(skipped)
+            kept = set(kept)
+            members = [m for m in members if m[0] in kept]
+        return container, members
+
+    def _expand_source(self, source: Union[str, BinaryIO], dest: str, depth: int) -> List[str]:
+        """source（路径或内存）展开到 dest 目录，成员处于 depth + 1 层"""
+        out: List[str] = []
+        container, members = self._members(source)
+        with container:
+            for name, size, opener in members:
+                target = member_path(dest, name)
+                if target is None:
+                    logger.warning("skip unsafe nested member %s", name)
+                    continue
+                with opener() as fp:
+                    header = fp.read(HEADER_SIZE)
+                    nested = is_nested_archive(name, header)
+                    if (nested and depth + 1 <= self.max_depth
+                            and 0 <= size <= self.memory_max):
+                        buf = self._read(header, fp, os.path.basename(target))
+                        out += self._expand_memory(buf, target, depth + 1)
+                        continue
+                    self._copy(header, fp, target)
+                out += self._expand_file(target, depth + 1) if nested else [target]
+        return out
+
+    def _expand_memory(self, buf: io.BytesIO, target: str, depth: int) -> List[str]:
+        """内存里的内层包：能流式读就直接展开，不行再落盘走 _expand_file"""
+        try:
+            files = self._expand_source(buf, target, depth)
+        except NestedBudgetExceeded:
+            raise
+        except Exception as e:
+            shutil.rmtree(target, ignore_errors=True)
+            with open(target, "wb") as f:
+                f.write(buf.getvalue())
+            if isinstance(e, UnsupportedArchive):      # 内存里打不开的格式：落盘再试
+                return self._expand_file(target, depth)
+            logger.warning("内层压缩包损坏，保留原文件 %s: %s", target, e)
+            self.skipped.append({"name": target, "size": len(buf.getvalue()),
+                                 "reason": "nested_corrupt"})
+            return [target]
+        self.expanded.append({"archive": target, "depth": depth, "files": len(files)})
+        return files
+
+    def _expand_file(self, path: str, depth: int) -> List[str]:
+        """磁盘上的内层包原地换成同名目录；失败或超限时原样保留"""
+        size = os.path.getsize(path)
+        if self.exhausted:
+            self.skipped.append({"name": path, "size": size, "reason": "nested_budget"})
+            return [path]
+        if depth > self.max_depth:
+            self.skipped.append({"name": path, "size": size, "reason": "nested_depth"})
+            return [path]
+        stash = path + _SUFFIX
+        os.replace(path, stash)
+        marks = len(self.expanded), len(self.skipped)
+        try:
+            try:
+                files = self._expand_source(stash, path, depth)
+            except UnsupportedArchive:             # 只有命令行后端（7z 等）：整包解出再逐个看
+                files = self._expand_cli(stash, path, depth)
+        except NestedBudgetExceeded:
+            self.exhausted = True
+            self._restore(stash, path)
+            del self.expanded[marks[0]:], self.skipped[marks[1]:]   # 回滚掉的内层记录
+            logger.warning("内层展开超出体积预算，停止展开: %s", path)
+            self.skipped.append({"name": path, "size": size, "reason": "nested_budget"})
+            return [path]
+        except Exception as e:
+            self._restore(stash, path)
+            del self.expanded[marks[0]:], self.skipped[marks[1]:]
+            logger.warning("内层压缩包无法展开，保留原文件 %s: %s", path, e)
+            self.skipped.append({"name": path, "size": size, "reason": "nested_corrupt"})
+            return [path]
+        os.unlink(stash)
+        self.expanded.append({"archive": path, "depth": depth, "files": len(files)})
+        return files
+
+    def _expand_cli(self, stash: str, dest: str, depth: int) -> List[str]:
+        tmp = extract_archive(stash, os.path.dirname(dest))
+        os.replace(tmp, dest)
+        out: List[str] = []
+        for root, _, fs in os.walk(dest):
+            for f in fs:
+                full = os.path.join(root, f)
+                self._charge(os.path.getsize(full))
+                nested = is_nested_archive(f, read_header(full))
+                out += self._expand_file(full, depth + 1) if nested else [full]
+        return out
+
+    @staticmethod
+    def _restore(stash: str, path: str) -> None:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.unlink(path)
+        os.replace(stash, path)
+
+    def expand(self, files: List[str], headers: Optional[Dict[str, bytes]] = None) -> List[str]:
+        """
+        包里第 1 层的文件列表 -> 展开所有内层包后的文件列表（顺序保持，内层成员就地插入）。
+        headers 给了的文件不读盘（流式模式下它们还没解出来）。
+        """
+        headers = headers or {}
+        out: List[str] = []
+        for f in files:
+            header = headers[f] if f in headers else read_header(f)
+            if is_nested_archive(os.path.basename(f), header) and os.path.isfile(f):
+                out += self._expand_file(f, 1)
+            else:
+                out.append(f)
+        return out
+
+
+def expand_nested(files: List[str], policy: Optional[ExtractPolicy] = None,
+                  headers: Optional[Dict[str, bytes]] = None,
+                  **kw) -> Tuple[List[str], List[dict], List[dict]]:
+    """:return: (展开后的文件, 展开记录, 跳过记录)"""
+    expander = NestedExpander(policy=policy, **kw)
+    out = expander.expand(files, headers)
+    return out, expander.expanded, expander.skipped
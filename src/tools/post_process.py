@@ -1,28 +1,33 @@
 """
 示例后续处理节点
 """
-import subprocess
-import os
+from typing import Dict, List, Optional
+
+from .doctext import DocResult, extract_documents
+from .formatters import FormatStats, format_files
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def format_code_batch(files: list[str]):
-    """black 格式化 Python；其它语言可扩展"""
-    py_files = [f for f in files if f.endswith(".py")]
-    if py_files:
-        try:
-            subprocess.run(["black"] + py_files, check=True)
-            logger.info("black formatted %d files", len(py_files))
-        except FileNotFoundError:
-            logger.warning("black not found, skip")
+def format_code_batch(files: list[str], languages: Optional[Dict[str, str]] = None) -> FormatStats:
+    """按语言分派格式化器（black 进程内 + 进程池，clang-format/prettier/gofmt 批量调用），见 formatters.py"""
+    stats = format_files(files, languages)
+    logger.info("formatted %d, unchanged %d, cached %d, failed %d, no formatter %d",
+                stats.formatted, stats.unchanged, stats.cached, stats.failed, stats.skipped)
+    return stats
+
+def doc_to_txt_batch(files: list[str]) -> List[DocResult]:
+    """PDF/DOCX/PPTX 转 <原文件名>.txt（进程池 + 页数/体积/超时限制），纯文本原样使用，见 doctext.py"""
+    results = extract_documents(files)
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+        if r.status in ("failed", "timeout"):
+            logger.warning("doc to txt %s: %s %s", r.status, r.path, r.error)
+    logger.info("doc to txt: %s", counts)
+    return results
 
-def doc_to_txt_batch(files: list[str]):
-    """pdf→txt 简单示例；生产可用 pdfplumber 等"""
-    for f in files:
-        if f.lower().endswith(".pdf"):
-            txt = f[:-4] + ".txt"
-            try:
-                subprocess.run(["pdftotext", f, txt], check=True)
-            except FileNotFoundError:
-                logger.warning("pdftotext not found, skip %s", f)
\ No newline at end of file
+def doc_errors(results: List[DocResult]) -> List[str]:
+    """转换失败/超时的文件，每个一条说明"""
+    return [f"{r.path}: {r.status} {r.error}".rstrip() for r in results
+            if r.status in ("failed", "timeout")]
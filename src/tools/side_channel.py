@@ -0,0 +1,146 @@
+"""
+Playwright 旁路连接池：按 CDP 地址复用同一个 driver + 浏览器连接
+
+以前每次滑块验证都 start driver -> connect_over_cdp -> 用完全部关掉，冷启动要好几秒；
+现在连接常驻，取用时做一次健康检查（driver 还在、浏览器还连着、上下文没被关），
+坏了才重连。多个验证/多个页面并发取用时由锁保证只连一次。
+
+注意：connect_over_cdp 拿到的是浏览器已有的默认上下文，不能 close（会关掉用户的标签页），
+只能断开浏览器连接。
+
+设置下载目录用的浏览器级 CDP 会话保持连着，Browser.downloadWillBegin / downloadProgress
+事件转给 self.downloads（downloads.DownloadEvents），下载完成检测靠它而不是扫目录。
+"""
+import asyncio
+from typing import Dict, Optional
+
+from .downloads import DownloadEvents
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class SideChannel:
+    def __init__(self, cdp_url: str):
+        self.cdp_url = cdp_url
+        self.connects = 0                # 实际建立连接的次数（观察复用效果）
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._download_session = None
+        self.downloads = DownloadEvents()
+
+    async def _start_driver(self):
+        from playwright.async_api import async_playwright
+        return await async_playwright().start()
+
+    def _healthy(self) -> bool:
+        if self._context is None or self._browser is None:
+            return False
+        if not self._browser.is_connected():
+            return False
+        return self._context in self._browser.contexts
+
+    async def _disconnect(self, stop_driver: bool = False) -> None:
+        browser, self._context, self._browser = self._browser, None, None
+        self._download_session = None          # 随浏览器连接一起断
+        try:
+            if browser is not None:
+                await browser.close()          # CDP 连接：只断开，不关实际浏览器
+        except Exception as e:
+            logger.debug("断开旁路浏览器连接出错: %s", e)
+        if stop_driver and self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.debug("停止 Playwright driver 出错: %s", e)
+            self._playwright = None
+
+    async def _connect(self) -> None:
+        for attempt in range(2):
+            if self._playwright is None:
+                self._playwright = await self._start_driver()
+            try:
+                self._browser = await self._playwright.chromium.connect_over_cdp(self.cdp_url)
+                break
+            except Exception:
+                if attempt:
+                    raise
+                logger.warning("CDP 连接失败，重启 Playwright driver 再试一次")
+                await self._disconnect(stop_driver=True)
+        contexts = self._browser.contexts
+        self._context = contexts[0] if contexts else await self._browser.new_context()
+        self.connects += 1
+        logger.info("旁路连接已建立 (CDP: %s，第 %d 次)", self.cdp_url, self.connects)
+
+    async def context(self):
+        """取健康的上下文；连接断了自动重连（driver 还活着就复用 driver）"""
+        if self._healthy():
+            return self._context
+        async with self._lock:
+            if not self._healthy():
+                if self._browser is not None:
+                    logger.warning("旁路连接已失效，重连: %s", self.cdp_url)
+                await self._disconnect()
+                await self._connect()
+            return self._context
+
+    async def latest_page(self):
+        """最后一个未关闭的页面（agent 当前操作的页面）"""
+        context = await self.context()
+        pages = [p for p in context.pages if not p.is_closed()]
+        return pages[-1] if pages else None
+
+    async def set_download_dir(self, path: str) -> None:
+        """
+        Playwright 连上 CDP 时会接管下载行为（下到它自己的临时目录），
+        验证完把下载目录交还给浏览器，代替以前的整条连接拆掉重建。
+        下载事件只发给开启它的会话，所以会话不 detach，换目录时才换掉旧的。
+        """
+        if self._browser is None:
+            return
+        old, self._download_session = self._download_session, None
+        if old is not None:
+            try:
+                await old.detach()
+            except Exception as e:
+                logger.debug("断开旧的下载事件会话出错: %s", e)
+        cdp = await self._browser.new_browser_cdp_session()
+        cdp.on("Browser.downloadWillBegin", self.downloads.on_begin)
+        cdp.on("Browser.downloadProgress", self.downloads.on_progress)
+        try:
+            await cdp.send("Browser.setDownloadBehavior",
+                           {"behavior": "allow", "downloadPath": path, "eventsEnabled": True})
+        except Exception:
+            await cdp.detach()
+            raise
+        self._download_session = cdp
+
+    def invalidate(self) -> None:
+        """调用方发现连接出错（比如 TargetClosedError）时标记，下次取用重连"""
+        self._context = None
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._disconnect(stop_driver=True)
+
+
+_channels: Dict[str, SideChannel] = {}
+
+
+def get_side_channel(cdp_url: str) -> SideChannel:
+    if cdp_url not in _channels:
+        _channels[cdp_url] = SideChannel(cdp_url)
+    return _channels[cdp_url]
+
+
+def current_channel() -> Optional[SideChannel]:
+    """最近建立的那个（单浏览器场景直接用）"""
+    return next(reversed(_channels.values()), None) if _channels else None
+
+
+async def close_all() -> None:
+    for channel in list(_channels.values()):
+        await channel.close()
+    _channels.clear()
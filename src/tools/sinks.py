@@ -0,0 +1,186 @@
+"""
+批量结果输出（JSONL / CSV / SQLite）：每处理完一个包就写出去，不在状态里累积
+
+以前所有文件的分类结果都堆在 AgentState["classified"] 里，每个检查点都存一份，
+跑完才打印。现在批量模式下状态只留计数和输出路径（result_sink），结果边跑边写，
+运行中途就可以直接读（tail -f / Excel / sqlite3）。
+
+格式按扩展名：
+  .jsonl   每行一条：{"kind": "package", ...} 或 {"kind": "file", "package": ..., ...}
+  .csv     每个文件一行：package, file_path, type, language, confidence
+  .sqlite3 / .db   packages、files 两张表；同一个包重复写入会替换（续跑时不重复）
+
+JSONL/CSV 是追加写：进程在"写完、检查点还没落"之间被杀，续跑后这个包会再出现一次。
+JSONL 读的时候按包取最后一次（read_results 已处理）；CSV 没有包记录，需要时自行按 package 去重。
+"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FILE_FIELDS = ["package", "file_path", "type", "language", "confidence"]
+PACKAGE_FIELDS = ["package", "status", "error", "files", "skipped", "seconds"]
+
+
+def _file_row(package: str, item: dict) -> dict:
+    return {"package": package, "file_path": item.get("file_path", ""),
+            "type": item.get("type", ""), "language": item.get("language", ""),
+            "confidence": item.get("confidence", 0)}
+
+
+class ResultSink(ABC):
+    """write(包状态, 该包的分类结果) 每个包调用一次；写完即落盘"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def write(self, status: dict, classified: List[dict]) -> None:
+        ...
+
+    @abstractmethod
+    def read(self) -> Iterator[dict]:
+        """逐个文件读回 {package, file_path, type, language, confidence}"""
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSink(ResultSink):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._fp = open(path, "a", encoding="utf-8")
+
+    def write(self, status, classified):
+        pkg = status["package"]
+        lines = [json.dumps({"kind": "package", **{k: status.get(k) for k in PACKAGE_FIELDS}},
+                            ensure_ascii=False)]
+        lines += [json.dumps({"kind": "file", **_file_row(pkg, c)}, ensure_ascii=False)
+                  for c in classified]
+        with self._lock:
+            self._fp.write("\n".join(lines) + "\n")
+            self._fp.flush()
+
+    def read(self):
+        # 同一个包出现多次时以最后一次为准：先记下每个包最后一条 package 记录的行号
+        last: Dict[str, int] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                if line.startswith('{"kind": "package"'):
+                    last[json.loads(line)["package"]] = i
+        current = None
+        with open(self.path, encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                rec = json.loads(line)
+                if rec.pop("kind") == "package":
+                    current = i == last[rec["package"]]
+                elif current:
+                    yield rec
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+class CsvSink(ResultSink):
+    def __init__(self, path: str):
+        super().__init__(path)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        # utf-8-sig：Excel 直接打开不乱码
+        self._fp = open(path, "a", encoding="utf-8-sig" if new else "utf-8", newline="")
+        self._writer = csv.DictWriter(self._fp, FILE_FIELDS)
+        if new:
+            self._writer.writeheader()
+            self._fp.flush()
+
+    def write(self, status, classified):
+        with self._lock:
+            self._writer.writerows(_file_row(status["package"], c) for c in classified)
+            self._fp.flush()
+
+    def read(self):
+        with open(self.path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                row["confidence"] = float(row["confidence"] or 0)
+                yield row
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+class SqliteSink(ResultSink):
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS packages (
+        package TEXT PRIMARY KEY, status TEXT, error TEXT, files INTEGER,
+        skipped INTEGER, seconds REAL
+    );
+    CREATE TABLE IF NOT EXISTS files (
+        package TEXT NOT NULL, file_path TEXT NOT NULL, type TEXT, language TEXT,
+        confidence REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_files_package ON files(package);
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")      # 边写边读
+        self._conn.executescript(self._SCHEMA)
+
+    def write(self, status, classified):
+        pkg = status["package"]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE package=?", (pkg,))
+            self._conn.execute("INSERT OR REPLACE INTO packages VALUES (?, ?, ?, ?, ?, ?)",
+                               tuple(status.get(k) for k in PACKAGE_FIELDS))
+            self._conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                                   [tuple(_file_row(pkg, c).values()) for c in classified])
+
+    def read(self):
+        conn = sqlite3.connect(self.path, timeout=30)     # 单独连接，逐行读不占写锁
+        try:
+            for row in conn.execute(f"SELECT {', '.join(FILE_FIELDS)} FROM files ORDER BY rowid"):
+                yield dict(zip(FILE_FIELDS, row))
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+SINKS = {".jsonl": JsonlSink, ".csv": CsvSink, ".sqlite3": SqliteSink, ".db": SqliteSink}
+
+
+def open_sink(path: str) -> ResultSink:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"不支持的结果格式 {ext}，可用: {', '.join(SINKS)}")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return SINKS[ext](path)
+
+
+def reset_sink(path: str) -> None:
+    """新一次运行开始前清空（续跑时不要调用）"""
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.unlink(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def read_results(path: str) -> Iterator[dict]:
+    sink = open_sink(path)
+    try:
+        yield from sink.read()
+    finally:
+        sink.close()
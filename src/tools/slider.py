@@ -0,0 +1,337 @@
+"""
+滑块验证码缺口识别
+
+旧实现：整图 Canny + 单尺度 matchTemplate，阈值写死，没有置信度，
+认错了只能拖过去、等 3 秒看失败、再整轮重来。现在：
+- 只在拼图块所在的行带里搜（拼图图片与背景同高时，透明通道给出块的纵向位置）
+- Canny 阈值按图像中值自适应
+- 金字塔：半分辨率多尺度粗定位，原分辨率在粗定位附近细化（页面缩放过的图也能对上）
+- 置信度 = 最高分 + 与次高峰的差距；不够可信时本地换一种预处理（Sobel 梯度）重算，选最可信的再拖
+
+基准（合成样本）：
+python -m src.tools.slider make <dir> [N]   生成 N 对背景/拼图 + labels.json
+python -m src.tools.slider bench <dir>      新旧两种方法的准确率与单次耗时
+"""
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+SLIDER_MIN_SCORE = float(os.getenv("SLIDER_MIN_SCORE", "0.35"))
+SLIDER_MIN_MARGIN = float(os.getenv("SLIDER_MIN_MARGIN", "0.05"))
+SCALES = (0.9, 0.95, 1.0, 1.05, 1.1)
+# 依次尝试的 (预处理, 尺度)；前面的不可信才试后面的
+ATTEMPTS: Tuple[Tuple[str, Tuple[float, ...]], ...] = (
+    ("canny", (1.0,)),
+    ("sobel", (1.0,)),
+    ("canny", SCALES),      # 拼图与背景分辨率不一致（页面缩放过）时才需要
+)
+BAND_MARGIN = 2        # 行带上下多留的像素（留多了会对上相邻高度的干扰缺口）
+REFINE_RADIUS = 4      # 原分辨率细化窗口（像素）
+PYRAMID_MIN_WIDTH = 480  # 背景比这宽才走金字塔；常见 300px 级的图整带直接匹配更快也更准
+COARSE_TOP_K = 3       # 金字塔上层保留几个候选到原分辨率细化
+BENCH_TOLERANCE = 3    # 基准：误差不超过几个像素算对
+
+
+@dataclass
+class GapResult:
+    x: float           # 拖动距离（背景图像素）= 缺口左边缘 - 拼图块在自身图片里的左边距
+    gap_x: int         # 缺口左边缘在背景图中的横坐标
+    score: float       # 最佳匹配分（TM_CCOEFF_NORMED）
+    margin: float      # 与次高峰的分差，越大越不容易认错
+    scale: float
+    method: str
+
+    @property
+    def confident(self) -> bool:
+        return self.score >= SLIDER_MIN_SCORE and self.margin >= SLIDER_MIN_MARGIN
+
+
+def _gray(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def piece_bbox(piece: np.ndarray) -> Tuple[int, int, int, int]:
+    """拼图块在其图片里的 (x, y, w, h)：有透明通道用 alpha，否则用非纯黑/纯白的像素"""
+    if piece.ndim == 3 and piece.shape[2] == 4:
+        mask = piece[:, :, 3] > 16
+    else:
+        g = _gray(piece)
+        mask = (g > 8) & (g < 247)
+    ys, xs = np.nonzero(mask)
+    if len(xs) == 0:
+        h, w = piece.shape[:2]
+        return 0, 0, w, h
+    return int(xs.min()), int(ys.min()), int(xs.max() - xs.min() + 1), int(ys.max() - ys.min() + 1)
+
+
+def _piece_gray(piece: np.ndarray) -> np.ndarray:
+    """透明部分压成黑色，轮廓处形成清晰边缘"""
+    g = _gray(piece)
+    if piece.ndim == 3 and piece.shape[2] == 4:
+        g = np.where(piece[:, :, 3] > 16, g, 0).astype(np.uint8)
+    return g
+
+
+def auto_canny(gray: np.ndarray) -> np.ndarray:
+    blur = cv2.GaussianBlur(gray, (3, 3), 0)
+    med = float(np.median(blur))
+    lo, hi = int(max(0, 0.66 * med)), int(min(255, 1.33 * med))
+    return cv2.Canny(blur, lo, max(hi, lo + 1))
+
+
+def sobel(gray: np.ndarray) -> np.ndarray:
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    return cv2.normalize(cv2.magnitude(gx, gy), None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+PREPROCESS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "canny": auto_canny,
+    "sobel": sobel,
+}
+
+
+def _peaks(res: np.ndarray, min_x: int, width: int, k: int = 2) -> List[Tuple[float, int]]:
+    """每列取最大（行带内纵向允许一两个像素偏差），按分数取前 k 个互不重叠的峰 (分数, x)"""
+    col = res.max(axis=0).copy()
+    col[:max(0, min_x)] = -1
+    peaks = []
+    for _ in range(k):
+        x = int(col.argmax())
+        if col[x] <= -1:
+            break
+        peaks.append((float(col[x]), x))
+        col[max(0, x - width // 2):x + width // 2 + 1] = -1
+    return peaks
+
+
+def _margin(peaks: List[Tuple[float, int]]) -> float:
+    return peaks[0][0] - peaks[1][0] if len(peaks) > 1 else peaks[0][0] + 1
+
+
+def _fits(tmpl: np.ndarray, img: np.ndarray) -> bool:
+    return min(tmpl.shape[:2]) >= 4 and tmpl.shape[0] <= img.shape[0] and tmpl.shape[1] <= img.shape[1]
+
+
+def template_edges(piece: np.ndarray, method: str, scale: float = 1.0) -> np.ndarray:
+    """
+    有透明通道：直接用 alpha 的轮廓当模板——缺口里的纹理被压暗/加了阴影，与拼图内部对不上，
+    轮廓才是两边共有的；没有透明通道才对拼图本身做边缘检测。
+    先缩放再取边缘，金字塔上层的模板和背景边缘粗细一致。
+    """
+    bx, by, bw, bh = piece_bbox(piece)
+    crop = piece[by:by + bh, bx:bx + bw]
+    if scale != 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if crop.ndim == 3 and crop.shape[2] == 4:
+        alpha = (crop[:, :, 3] > 127).astype(np.uint8) * 255
+        alpha = cv2.copyMakeBorder(alpha, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+        inner = alpha - cv2.erode(alpha, np.ones((3, 3), np.uint8))    # 内轮廓，与缺口描边重合
+        return inner[1:-1, 1:-1]
+    return PREPROCESS[method](_piece_gray(crop))
+
+
+def locate(band: np.ndarray, piece: np.ndarray, min_x: int = 0, method: str = "canny",
+           scales: Tuple[float, ...] = (1.0,)) -> Optional[Tuple[float, float, int, float]]:
+    """
+    band 为灰度行带。宽图先在半分辨率取前几个候选，再回原分辨率 ±REFINE_RADIUS 内细化；
+    窄图直接原分辨率整带匹配。多个尺度取分数最高的。
+    :return: (score, margin, x, scale)，模板放不进行带时 None
+    """
+    prep = PREPROCESS[method]
+    band_e = prep(band)
+    pyramid = band.shape[1] >= PYRAMID_MIN_WIDTH
+    coarse_band = prep(cv2.pyrDown(band)) if pyramid else None
+    best = None
+    for s in scales:
+        t = template_edges(piece, method, s)
+        if not _fits(t, band_e):
+            continue
+        if not pyramid:
+            res = cv2.matchTemplate(band_e, t, cv2.TM_CCOEFF_NORMED)
+            peaks = _peaks(res, min_x, t.shape[1])
+        else:
+            small = template_edges(piece, method, s / 2)
+            if not _fits(small, coarse_band):
+                continue
+            res = cv2.matchTemplate(coarse_band, small, cv2.TM_CCOEFF_NORMED)
+            peaks = []
+            for _, cx in _peaks(res, min_x // 2, small.shape[1], COARSE_TOP_K):
+                x0 = max(0, cx * 2 - REFINE_RADIUS)
+                window = band_e[:, x0:min(band.shape[1], cx * 2 + t.shape[1] + REFINE_RADIUS)]
+                if _fits(t, window):
+                    _, score, _, loc = cv2.minMaxLoc(
+                        cv2.matchTemplate(window, t, cv2.TM_CCOEFF_NORMED))
+                    peaks.append((float(score), x0 + loc[0]))
+            peaks.sort(reverse=True)
+        if peaks and (best is None or peaks[0][0] > best[0]):
+            best = (peaks[0][0], _margin(peaks), peaks[0][1], s)
+    return best
+
+
+class SliderSolver:
+    @staticmethod
+    def solve(bg_img: np.ndarray, slider_img: np.ndarray, min_x: Optional[int] = None,
+              attempts=ATTEMPTS) -> GapResult:
+        """
+        依次按 attempts 识别，第一个可信的结果直接返回；都不可信则返回分数最高的。
+        :param min_x: 缺口不可能出现在它左边（默认取拼图块宽度的一半，避开起始位置的阴影）
+        """
+        bx, by, bw, bh = piece_bbox(slider_img)
+        bg = _gray(bg_img)
+        if slider_img.shape[0] == bg.shape[0]:       # 同高：只搜拼图块所在的行带
+            y0 = max(0, by - BAND_MARGIN)
+            band = bg[y0:by + bh + BAND_MARGIN]
+        else:
+            band = bg
+        if min_x is None:
+            min_x = bw // 2
+
+        best: Optional[GapResult] = None
+        for method, scales in attempts:
+            found = locate(band, slider_img, min_x, method, scales)
+            if found is None:
+                continue
+            score, margin, gap_x, scale = found
+            result = GapResult(float(gap_x - bx), int(gap_x), score, margin, scale, method)
+            if result.confident:
+                return result
+            if best is None or result.score > best.score:
+                best = result
+        if best is None:                              # 拼图比背景还大：按旧方法整图匹配
+            return GapResult(SliderSolver.identify_gap_legacy(bg_img, slider_img), 0,
+                             0.0, 0.0, 1.0, "legacy")
+        return best
+
+    @staticmethod
+    def identify_gap(bg_img: np.ndarray, slider_img: np.ndarray) -> float:
+        return SliderSolver.solve(bg_img, slider_img).x
+
+    @staticmethod
+    def identify_gap_legacy(bg_img: np.ndarray, slider_img: np.ndarray) -> float:
+        """原来的整图单尺度匹配，保留做基准对照"""
+        bg_edge = cv2.Canny(_gray(bg_img), 100, 200)
+        slider_edge = cv2.Canny(_piece_gray(slider_img), 100, 200)
+        result = cv2.matchTemplate(bg_edge, slider_edge, cv2.TM_CCOEFF_NORMED)
+        _, _, _, max_loc = cv2.minMaxLoc(result)
+        return float(max_loc[0])
+
+
+# ---------- 合成样本与基准 ----------
+def _puzzle_mask(h: int, w: int, x: int, y: int, size: int) -> np.ndarray:
+    knob = size // 4
+    mask = np.zeros((h, w), np.uint8)
+    cv2.rectangle(mask, (x, y), (x + size - 1, y + size - 1), 255, -1)
+    cv2.circle(mask, (x + size // 2, y), knob, 255, -1)             # 上凸
+    cv2.circle(mask, (x + size - 1, y + size // 2), knob, 255, -1)  # 右凸
+    return mask
+
+
+def _cut_gap(img: np.ndarray, mask: np.ndarray, darken: float, outline: bool) -> None:
+    """缺口：压暗（程度随机），有的站点还会描一圈亮边"""
+    inside = mask > 0
+    img[inside] = (img[inside] * darken).astype(np.uint8)
+    if outline:
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        cv2.drawContours(img, contours, -1, (220, 220, 220), 1)
+
+
+def make_sample(rng: np.random.Generator, w: int = 320, h: int = 160,
+                size: int = 44) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    生成一对 (背景, 拼图) 与正确拖动距离。
+    背景：低频噪声 + 随机几何图形，JPEG 压缩；缺口处压暗（对比度随机、一半描亮边），
+    另有一个不同高度的干扰缺口；拼图与背景同高、带透明通道，亮度有偏差。
+    """
+    small = rng.integers(0, 256, (h // 16, w // 16, 3), dtype=np.uint8)
+    bg = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    for _ in range(12):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        cv2.circle(bg, center, int(rng.integers(5, 30)), color, -1)
+    bg = cv2.GaussianBlur(bg, (3, 3), 0)
+
+    knob = size // 4
+    x = int(rng.integers(size + 10, w - size - knob - 5))
+    y = int(rng.integers(knob + 5, h - size - 5))
+    mask = _puzzle_mask(h, w, x, y, size)
+    bx, by, bw, bh = cv2.boundingRect(mask)
+
+    piece = np.zeros((h, bw, 4), np.uint8)
+    gain = rng.uniform(0.85, 1.15)
+    piece[:, :, :3] = np.clip(bg[:, bx:bx + bw] * gain, 0, 255).astype(np.uint8)
+    piece[:, :, 3] = mask[:, bx:bx + bw]
+    contours, _ = cv2.findContours(mask[:, bx:bx + bw], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    cv2.drawContours(piece, contours, -1, (255, 255, 255, 255), 1)
+
+    out = bg.copy()
+    darken, outline = rng.uniform(0.45, 0.8), bool(rng.integers(0, 2))
+    _cut_gap(out, mask, darken, outline)
+    decoy_y = (y + h // 2) % (h - size - knob - 5) + knob + 5       # 错开的行
+    decoy_x = int(rng.integers(size + 10, w - size - knob - 5))
+    if abs(decoy_x - x) > size:
+        _cut_gap(out, _puzzle_mask(h, w, decoy_x, decoy_y, size), darken, outline)
+    ok, buf = cv2.imencode(".jpg", out, [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(60, 90))])
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR), piece, bx
+
+
+def make_dataset(folder: str, n: int = 100, seed: int = 0) -> None:
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    labels = {}
+    for i in range(n):
+        bg, piece, x = make_sample(rng)
+        cv2.imwrite(os.path.join(folder, f"{i:04d}_bg.png"), bg)
+        cv2.imwrite(os.path.join(folder, f"{i:04d}_piece.png"), piece)
+        labels[f"{i:04d}"] = x
+    with open(os.path.join(folder, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(labels, f)
+
+
+def benchmark(folder: str, tolerance: int = BENCH_TOLERANCE) -> Dict[str, dict]:
+    """:return: {方法: {"accuracy", "mean_ms", "p95_ms", "n"}}"""
+    with open(os.path.join(folder, "labels.json"), encoding="utf-8") as f:
+        labels = json.load(f)
+    solvers = {"solver": SliderSolver.identify_gap, "legacy": SliderSolver.identify_gap_legacy}
+    stats: Dict[str, dict] = {}
+    for name, fn in solvers.items():
+        hits, times = 0, []
+        for key, truth in labels.items():
+            bg = cv2.imread(os.path.join(folder, f"{key}_bg.png"), cv2.IMREAD_UNCHANGED)
+            piece = cv2.imread(os.path.join(folder, f"{key}_piece.png"), cv2.IMREAD_UNCHANGED)
+            started = time.perf_counter()
+            x = fn(bg, piece)
+            times.append((time.perf_counter() - started) * 1000)
+            hits += abs(x - truth) <= tolerance
+        times.sort()
+        stats[name] = {"n": len(times), "accuracy": hits / max(1, len(times)),
+                       "mean_ms": sum(times) / max(1, len(times)),
+                       "p95_ms": times[int(len(times) * 0.95)] if times else 0.0}
+    return stats
+
+
+def _cli(argv: List[str]) -> int:
+    if len(argv) >= 2 and argv[0] == "make":
+        make_dataset(argv[1], int(argv[2]) if len(argv) > 2 else 100)
+        return 0
+    if len(argv) == 2 and argv[0] == "bench":
+        for name, s in benchmark(argv[1]).items():
+            print(f"{name:7s} n={s['n']}  accuracy={s['accuracy']:.1%}  "
+                  f"mean={s['mean_ms']:.2f}ms  p95={s['p95_ms']:.2f}ms")
+        return 0
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli(sys.argv[1:]))
@@ -0,0 +1,180 @@
+"""
+本地预分类（魔数 / 扩展名 / shebang / 文本-二进制启发式）
+
+在 LLM 之前跑一遍：.py、%PDF-、PNG、ZIP 这类一眼就能认出的文件直接给结果，
+输出格式与 classify_file 一致 {type, language, confidence}。
+置信度低于阈值（SNIFF_MIN_CONFIDENCE，默认 0.9）的才交给 LLM。
+
+扩展：
+  register_signature(b"...", "image", "webp", offset=8)
+  register_extension(".vue", "code", "vue")
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .classify import read_header
+
+MIN_CONFIDENCE = float(os.getenv("SNIFF_MIN_CONFIDENCE", "0.9"))
+
+
+@dataclass(frozen=True)
+class Signature:
+    magic: bytes
+    type: str
+    language: str
+    offset: int = 0
+    confidence: float = 0.99
+
+
+# ---------- 魔数表（越具体越靠前） ----------
+SIGNATURES: List[Signature] = [
+    Signature(b"%PDF-", "doc", "pdf"),
+    Signature(b"\x89PNG\r\n\x1a\n", "image", "png"),
+    Signature(b"\xff\xd8\xff", "image", "jpg"),
+    Signature(b"GIF87a", "image", "gif"),
+    Signature(b"GIF89a", "image", "gif"),
+    Signature(b"RIFF", "image", "webp", confidence=0.6),   # 需扩展名佐证
+    Signature(b"BM", "image", "bmp", confidence=0.6),
+    Signature(b"PK\x03\x04", "archive", "zip"),
+    Signature(b"PK\x05\x06", "archive", "zip"),             # 空 zip
+    Signature(b"Rar!\x1a\x07", "archive", "rar"),
+    Signature(b"7z\xbc\xaf\x27\x1c", "archive", "7z"),
+    Signature(b"\x1f\x8b", "archive", "gz"),
+    Signature(b"BZh", "archive", "bz2", confidence=0.8),
+    Signature(b"\xfd7zXZ\x00", "archive", "xz"),
+    Signature(b"ustar", "archive", "tar", offset=257),
+    Signature(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc", "doc"),  # OLE: doc/xls/ppt
+    Signature(b"\x7fELF", "code", "elf"),
+    Signature(b"MZ", "code", "exe", confidence=0.7),
+    Signature(b"\xca\xfe\xba\xbe", "code", "class", confidence=0.9),
+]
+
+# ---------- 扩展名表 ----------
+EXTENSIONS: Dict[str, Tuple[str, str]] = {}
+
+def register_signature(magic: bytes, type_: str, language: str,
+                       offset: int = 0, confidence: float = 0.99) -> None:
+    SIGNATURES.insert(0, Signature(magic, type_, language, offset, confidence))
+
+def register_extension(ext: str, type_: str, language: str) -> None:
+    EXTENSIONS[ext.lower()] = (type_, language)
+
+for _lang, _exts in {
+    "py": ".py .pyw .pyi .ipynb", "js": ".js .mjs .cjs .jsx", "ts": ".ts .tsx",
+    "c": ".c .h", "cpp": ".cpp .cc .cxx .hpp .hh .hxx", "java": ".java",
+    "go": ".go", "rs": ".rs", "cs": ".cs", "kt": ".kt", "swift": ".swift",
+    "rb": ".rb", "php": ".php", "sh": ".sh .bash", "bat": ".bat .cmd",
+    "ps1": ".ps1", "sql": ".sql", "html": ".html .htm", "css": ".css .scss .less",
+    "vue": ".vue", "m": ".m", "r": ".r", "scala": ".scala", "lua": ".lua",
+    "asm": ".asm .s", "v": ".v", "vhdl": ".vhd .vhdl",
+}.items():
+    for _e in _exts.split():
+        register_extension(_e, "code", _lang)
+for _e in (".md", ".txt", ".csv", ".pdf", ".doc", ".docx", ".ppt", ".pptx",
+           ".xls", ".xlsx", ".rtf", ".tex"):
+    register_extension(_e, "doc", _e[1:])
+for _e in (".png", ".jpg", ".gif", ".bmp", ".svg", ".webp", ".ico"):
+    register_extension(_e, "image", _e[1:])
+register_extension(".jpeg", "image", "jpg")
+for _e in (".zip", ".7z", ".rar", ".tar", ".gz", ".bz2", ".xz"):
+    register_extension(_e, "archive", _e[1:])
+register_extension(".tgz", "archive", "gz")
+
+# zip/OLE 容器里装的 Office 文档，按扩展名细分
+_ZIP_DOCS = {".docx", ".pptx", ".xlsx"}
+_OLE_DOCS = {".doc", ".ppt", ".xls"}
+
+_SHEBANG = re.compile(rb"^#!\s*(?:\S*/)?(?:env\s+(?:-\S+\s+)*)?([A-Za-z]+)")
+_SHEBANG_LANG = {b"python": "py", b"bash": "sh", b"sh": "sh", b"zsh": "sh",
+                 b"node": "js", b"perl": "pl", b"ruby": "rb", b"php": "php"}
+
+
+def _is_text(header: bytes) -> bool:
+    """无 NUL 且能按 utf-8/gbk 解码（允许截断在多字节中间）就当文本"""
+    if b"\x00" in header:
+        return False
+    for enc in ("utf-8", "gbk"):
+        try:
+            header.decode(enc)
+            return True
+        except UnicodeDecodeError as e:
+            if e.start >= len(header) - 3:   # 截断的尾字符
+                return True
+    return False
+
+
+def _result(type_: str, language: str, confidence: float) -> dict:
+    return {"type": type_, "language": language, "confidence": confidence}
+
+
+def sniff(name: str, header: bytes) -> Optional[dict]:
+    """
+    根据文件名和头部字节给出最佳猜测；完全没有线索时返回 None。
+    """
+    ext = os.path.splitext(name)[1].lower()
+    by_ext = EXTENSIONS.get(ext)
+
+    # 1. 魔数
+    for sig in SIGNATURES:
+        if header[sig.offset:sig.offset + len(sig.magic)] != sig.magic:
+            continue
+        if sig.language == "zip" and ext in _ZIP_DOCS:
+            return _result("doc", ext[1:], 0.99)
+        if sig.language == "doc" and ext in _OLE_DOCS:
+            return _result("doc", ext[1:], 0.99)
+        conf = sig.confidence
+        if by_ext and by_ext[0] == sig.type:
+            conf = max(conf, 0.99)           # 魔数 + 扩展名互相印证
+        return _result(sig.type, sig.language, conf)
+
+    text = _is_text(header)
+
+    # 2. shebang 脚本
+    if text:
+        m = _SHEBANG.match(header)
+        if m:
+            lang = _SHEBANG_LANG.get(m.group(1).rstrip(b"0123456789.").lower())
+            if lang:
+                return _result("code", lang, 0.95)
+
+    # 3. 扩展名 + 文本/二进制校验
+    if by_ext:
+        type_, lang = by_ext
+        if type_ in ("code", "doc") and ext not in _ZIP_DOCS | _OLE_DOCS | {".pdf"}:
+            # 源码/纯文本应该是文本；二进制内容说明扩展名可能骗人
+            return _result(type_, lang, 0.95 if text else 0.5)
+        if type_ == "image" and lang == "svg":
+            return _result(type_, lang, 0.95 if text else 0.5)
+        # 容器/图片类却没匹配到魔数：扩展名不可信
+        return _result(type_, lang, 0.6)
+
+    # 4. 只剩启发式
+    if not header:
+        return None
+    return _result("other", "", 0.5 if text else 0.7)
+
+
+def sniff_file(file_path: str) -> Optional[dict]:
+    return sniff(os.path.basename(file_path), read_header(file_path))
+
+
+def pre_classify(files: List[str], threshold: float = MIN_CONFIDENCE,
+                 headers: Optional[Dict[str, bytes]] = None
+                 ) -> Tuple[List[dict], List[str]]:
+    """
+    :param headers: 已读好的头部字节（流式模式），缺省则读盘
+    :return: (已判定的结果列表（含 file_path）, 需要交给 LLM 的文件)
+    """
+    headers = headers or {}
+    decided, pending = [], []
+    for f in files:
+        header = headers.get(f)
+        res = sniff(os.path.basename(f), header) if header is not None else sniff_file(f)
+        if res and res["confidence"] >= threshold:
+            res["file_path"] = f
+            decided.append(res)
+        else:
+            pending.append(f)
+    return decided, pending
@@ -0,0 +1,206 @@
+"""
+课程资料增量同步：只下载新增/变化的文件，内容相同的文件按哈希去重
+
+清单（SQLite，默认 <下载目录>/.tas_sync.sqlite3）每个远程文件一行：
+URL、远程名、大小、修改时间、ETag、本地 sha256、本地路径。
+判断"没变"：
+- 列表（或 HEAD）给出的 ETag 与上次一致；没有 ETag 时比 修改时间 + 大小；
+  两者都没有时比列表给的 sha256
+- 且本地文件还在、大小没变
+什么版本信息都没有只能重新下载，但内容与上次相同时记为"已核对"（verified），不算新下载。
+变了的文件原地覆盖（不再生成 name_时间戳 的副本）；
+下载后若与已有文件内容相同（改名、不同目录重复上传），用硬链接替换，不占第二份空间。
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+import httpx
+
+from .http_download import (
+    CONCURRENCY, DownloadItem, DownloadResult, download_items, make_client, target_name,
+)
+from ..utils.hashing import sha256_file
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SYNC_MANIFEST_NAME = ".tas_sync.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remote_files (
+    url         TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    modified    TEXT NOT NULL DEFAULT '',
+    etag        TEXT NOT NULL DEFAULT '',
+    sha256      TEXT NOT NULL,
+    local_path  TEXT NOT NULL,
+    updated     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_remote_sha ON remote_files(sha256);
+"""
+
+
+@dataclass
+class RemoteFile:
+    url: str
+    name: str
+    size: int
+    modified: str
+    etag: str
+    sha256: str
+    local_path: str
+
+
+@dataclass
+class SyncReport:
+    downloaded: List[str] = field(default_factory=list)   # 本地路径
+    unchanged: List[str] = field(default_factory=list)
+    verified: List[str] = field(default_factory=list)     # 没有版本信息只能重下，内容与上次相同
+    deduped: List[str] = field(default_factory=list)      # 内容与已有文件相同，已硬链接
+    failed: List[DownloadResult] = field(default_factory=list)
+
+
+class SyncManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, url: str) -> Optional[RemoteFile]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, name, size, modified, etag, sha256, local_path "
+                "FROM remote_files WHERE url=?", (url,)).fetchone()
+        return RemoteFile(*row) if row else None
+
+    def find_by_hash(self, sha256: str, exclude: str = "") -> Optional[str]:
+        """已有的、内容为 sha256 且文件还在的本地路径"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT local_path FROM remote_files WHERE sha256=? AND local_path<>?",
+                (sha256, exclude)).fetchall()
+        return next((p for (p,) in rows if os.path.isfile(p)), None)
+
+    def record(self, rec: RemoteFile) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO remote_files(url, name, size, modified, etag, sha256, "
+                "local_path, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (rec.url, rec.name, rec.size, rec.modified, rec.etag, rec.sha256,
+                 rec.local_path, time.time()))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def is_unchanged(rec: RemoteFile, size: Optional[int], modified: str, etag: str,
+                 sha256: str = "") -> bool:
+    """远程元数据与上次一致且本地文件完好"""
+    if not os.path.isfile(rec.local_path) or os.path.getsize(rec.local_path) != rec.size:
+        return False
+    if etag and rec.etag:
+        return etag == rec.etag
+    if modified and rec.modified:
+        return modified == rec.modified and (size is None or size == rec.size)
+    if sha256:
+        return sha256.lower() == rec.sha256 and (size is None or size == rec.size)
+    return False                 # 没有可比的版本信息：下载后按哈希核对
+
+
+def link_duplicate(src: str, dst: str) -> None:
+    """dst 换成 src 的硬链接（跨盘/不支持时保留原文件）"""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    tmp = dst + ".link"
+    try:
+        os.link(src, tmp)
+        os.replace(tmp, dst)
+    except OSError as e:
+        logger.debug("硬链接失败，保留副本 %s: %s", dst, e)
+
+
+async def _remote_meta(client: httpx.AsyncClient, item: DownloadItem) -> Tuple[Optional[int], str, str]:
+    """(大小, 修改时间, ETag)：列表给了就用列表的，否则发 HEAD"""
+    if item.etag or item.modified:
+        return item.size, item.modified, item.etag
+    try:
+        resp = await client.head(item.url)
+        resp.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.debug("HEAD 失败 %s: %s", item.url, e)
+        return item.size, "", ""
+    length = resp.headers.get("Content-Length", "")
+    return (int(length) if length.isdigit() else item.size,
+            resp.headers.get("Last-Modified", ""), resp.headers.get("ETag", ""))
+
+
+async def async_sync(items: List[DownloadItem], dest_dir: str,
+                     storage_state: Union[dict, str, None] = None,
+                     headers: Optional[dict] = None,
+                     manifest_path: Optional[str] = None,
+                     concurrency: int = CONCURRENCY) -> SyncReport:
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = SyncManifest(manifest_path or os.path.join(dest_dir, SYNC_MANIFEST_NAME))
+    report = SyncReport()
+    try:
+        async with make_client(storage_state, headers, concurrency) as client:
+            metas = await asyncio.gather(*(_remote_meta(client, it) for it in items))
+            todo, todo_meta, before = [], [], {}
+            for item, (size, modified, etag) in zip(items, metas):
+                rec = manifest.get(item.url)
+                if rec and is_unchanged(rec, size, modified, etag, item.sha256):
+                    report.unchanged.append(rec.local_path)
+                    continue
+                dup = manifest.find_by_hash(item.sha256.lower()) if item.sha256 else None
+                if dup:                      # 列表给了哈希且本地已有：不用下载
+                    path = os.path.join(dest_dir, target_name(item))
+                    link_duplicate(dup, path)
+                    report.deduped.append(path)
+                    manifest.record(RemoteFile(item.url, os.path.basename(path),
+                                               os.path.getsize(dup), modified, etag,
+                                               item.sha256.lower(), path))
+                    continue
+                todo.append(item)
+                todo_meta.append((modified, etag))
+                if rec:
+                    before[item.url] = rec
+
+            results = await download_items(client, todo, dest_dir, concurrency)
+
+        for item, (modified, etag), res in zip(todo, todo_meta, results):
+            if res.status != "ok":
+                report.failed.append(res)
+                continue
+            sha = item.sha256.lower() if item.sha256 else sha256_file(res.path)
+            rec = before.get(item.url)
+            dup = manifest.find_by_hash(sha, exclude=res.path)
+            if rec and rec.sha256 == sha and rec.local_path == res.path:
+                report.verified.append(res.path)
+            elif dup:
+                link_duplicate(dup, res.path)
+                report.deduped.append(res.path)
+            else:
+                report.downloaded.append(res.path)
+            manifest.record(RemoteFile(item.url, os.path.basename(res.path), res.size,
+                                       res.modified or modified, res.etag or etag,
+                                       sha, res.path))
+    finally:
+        manifest.close()
+    logger.info("同步完成：新下载 %d，未变 %d，重下核对未变 %d，去重 %d，失败 %d",
+                len(report.downloaded), len(report.unchanged), len(report.verified),
+                len(report.deduped), len(report.failed))
+    return report
+
+
+def sync(items: List[DownloadItem], dest_dir: str, **kw) -> SyncReport:
+    """同步入口"""
+    return asyncio.run(async_sync(items, dest_dir, **kw))
@@ -0,0 +1,214 @@
+"""
+解压工作区管理：所有包的解压目录都从这里领、用完交回
+
+以前每个包 tempfile.mkdtemp() 一个目录、从不清理，长批次会把盘写满。现在：
+- 包处理完（后处理结束）即删除工作区；失败的包按 WORKSPACE_KEEP 保留现场方便排查
+- 磁盘预算：领用前估算（包大小 × WORKSPACE_EXPANSION），超预算先回收共享存储（cas 模式的
+  blob 目录，attach 进来一起计入预算），再淘汰最早保留的失败现场，
+  仍不够就等其他进程交回（最多 WORKSPACE_WAIT 秒，超时照常继续并告警）
+- 占用按实际分配的块算（st_blocks），同一 inode 只算一次（cas 模式包里的文件是 blob 的硬链接）；
+  不是每次领用都遍历：上次扫描结果 + 之后领用的估算 + 交回时量的单个目录，
+  WORKSPACE_RESCAN 秒重扫一次（其他进程的变化），看起来超预算时先重扫确认再淘汰
+- 小包（≤ WORKSPACE_SHM_MAX）放 /dev/shm（内存盘），解压、嗅探、哈希全在内存里完成；
+  attach 了不在内存盘上的共享存储（cas 模式）时不用：跨文件系统硬链接不了，每个文件都得复制
+
+环境变量：
+  WORKSPACE_DIR        磁盘工作区根目录，默认 <系统临时目录>/tas_work
+  WORKSPACE_BUDGET     磁盘预算（字节），0 不限，默认 20 GiB
+  WORKSPACE_KEEP       never / failed / always：哪些包的工作区保留，默认 failed
+  WORKSPACE_SHM_MAX    不超过这个大小（字节）的包用 /dev/shm，0 关闭，默认 32 MiB
+"""
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WORKSPACE_DIR = os.getenv("WORKSPACE_DIR") or os.path.join(tempfile.gettempdir(), "tas_work")
+WORKSPACE_BUDGET = int(os.getenv("WORKSPACE_BUDGET", str(20 << 30)))
+WORKSPACE_KEEP = os.getenv("WORKSPACE_KEEP", "failed")
+WORKSPACE_SHM_MAX = int(os.getenv("WORKSPACE_SHM_MAX", str(32 << 20)))
+WORKSPACE_EXPANSION = 4          # 解压后体积 ≈ 包大小 × 4（估算用）
+WORKSPACE_WAIT = 300.0           # 秒：预算不够时最多等多久
+WORKSPACE_RESCAN = 30.0          # 秒：磁盘占用多久重新扫描一次
+SHM_DIR = "/dev/shm"
+
+KEEP_MARKER = ".tas_keep"        # 保留的工作区里放这个文件（内容为失败原因）
+
+
+def disk_usage(paths: List[str]) -> int:
+    """实际占用字节（st_blocks × 512，Windows 上用 st_size）；硬链接的同一 inode 只算一次"""
+    seen = set()
+    total = 0
+    for path in paths:
+        for root, _, fs in os.walk(path):
+            for f in fs:
+                try:
+                    st = os.lstat(os.path.join(root, f))
+                except OSError:
+                    continue
+                if st.st_nlink > 1:
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                blocks = getattr(st, "st_blocks", None)
+                total += blocks * 512 if blocks is not None else st.st_size
+    return total
+
+
+def dir_size(path: str) -> int:
+    return disk_usage([path])
+
+
+class Workspace:
+    """
+    acquire(包) -> 工作区目录；release(目录, ok) 删除或保留。
+    多进程各自一个实例，共享同一个根目录（预算按根目录实际占用算）。
+    """
+
+    def __init__(self, root: str = WORKSPACE_DIR, budget: int = WORKSPACE_BUDGET,
+                 keep: str = WORKSPACE_KEEP, shm_max: int = WORKSPACE_SHM_MAX,
+                 shm_dir: str = SHM_DIR, wait: float = WORKSPACE_WAIT):
+        if keep not in ("never", "failed", "always"):
+            raise ValueError(f"WORKSPACE_KEEP 只能是 never/failed/always: {keep}")
+        self.root = Path(root)
+        self.budget = budget
+        self.keep = keep
+        self.shm_max = shm_max
+        self.shm_root = Path(shm_dir) / "tas_work"
+        self.wait = wait
+        self.stores: List[Any] = []      # 计入预算的共享存储（有 root 和 gc()，如 BlobStore）
+        self._scanned = 0                # 上次扫描的占用
+        self._scanned_at: Optional[float] = None
+        self._delta = 0                  # 扫描之后本实例造成的变化
+        self._reserved: Dict[str, int] = {}   # 扫描之后领用、还没计入扫描的目录 -> 估算
+
+    def attach(self, store: Any) -> None:
+        """共享存储（cas 模式的 blob 目录）计入预算，超预算时先 gc 它"""
+        if all(Path(s.root) != Path(store.root) for s in self.stores):
+            self.stores.append(store)
+
+    def _used(self, fresh: bool = False) -> int:
+        now = time.monotonic()
+        if fresh or self._scanned_at is None or now - self._scanned_at >= WORKSPACE_RESCAN:
+            roots = [self.root] + [Path(s.root) for s in self.stores]
+            self._scanned = disk_usage([str(r) for r in roots if r.is_dir()])
+            self._scanned_at, self._delta = now, 0
+            self._reserved.clear()
+        return self._scanned + self._delta
+
+    @property
+    def bases(self) -> List[Path]:
+        """本实例管的根目录；关掉内存盘时不碰 /dev/shm 里别人的工作区"""
+        return [self.root, self.shm_root] if self.shm_max else [self.root]
+
+    # ---------- 领用 ----------
+    def _use_shm(self, estimate: int) -> bool:
+        if not self.shm_max or estimate > self.shm_max * WORKSPACE_EXPANSION:
+            return False
+        if not self.shm_root.parent.is_dir():
+            return False
+        shm_dev = self.shm_root.parent.stat().st_dev
+        if any(Path(s.root).stat().st_dev != shm_dev for s in self.stores):
+            return False
+        # 内存盘至少留一半空闲，别把别人的内存吃光
+        return shutil.disk_usage(str(self.shm_root.parent)).free > estimate * 2
+
+    def kept(self) -> List[Path]:
+        """保留的工作区，最早的在前"""
+        out = []
+        for base in self.bases:
+            if base.is_dir():
+                out += [d for d in base.iterdir() if (d / KEEP_MARKER).is_file()]
+        return sorted(out, key=lambda d: (d / KEEP_MARKER).stat().st_mtime)
+
+    def _make_room(self, estimate: int) -> None:
+        if not self.budget or self._used() + estimate <= self.budget:
+            return
+        deadline = time.monotonic() + self.wait
+        warned = collected = False
+        while True:
+            used = self._used(fresh=True)          # 要淘汰/等待前按实际占用确认
+            if used + estimate <= self.budget:
+                return
+            if not collected and self.stores:
+                collected = True
+                if sum(s.gc() for s in self.stores):
+                    continue
+            victims = [d for d in self.kept() if d.parent == self.root]
+            if victims:
+                logger.info("工作区超预算（%d + %d > %d），淘汰保留现场 %s",
+                            used, estimate, self.budget, victims[0])
+                shutil.rmtree(victims[0], ignore_errors=True)
+                continue
+            if time.monotonic() >= deadline:
+                logger.warning("工作区超预算且无可淘汰目录，继续解压（已用 %d，预算 %d）",
+                               used, self.budget)
+                return
+            if not warned:
+                logger.info("工作区超预算，等待其他包处理完交回空间")
+                warned = True
+            time.sleep(0.5)
+
+    def acquire(self, archive_path: str = "") -> str:
+        """给一个包领工作区目录；小包放内存盘"""
+        size = os.path.getsize(archive_path) if archive_path and os.path.isfile(archive_path) else 0
+        estimate = size * WORKSPACE_EXPANSION
+        if self._use_shm(estimate):
+            base = self.shm_root
+        else:
+            base = self.root
+            self._make_room(estimate)
+        base.mkdir(parents=True, exist_ok=True)
+        path = tempfile.mkdtemp(prefix="pkg_", dir=str(base))
+        if base == self.root:
+            self._reserved[path] = estimate
+            self._delta += estimate
+        return path
+
+    # ---------- 交回 ----------
+    def owns(self, path: str) -> bool:
+        p = Path(path).resolve()
+        return any(p.parent == base.resolve() for base in self.bases)
+
+    def release(self, path: str, ok: bool = True, reason: str = "") -> bool:
+        """删除工作区（按 keep 策略保留的除外），返回是否保留；不归本管理器的目录不动"""
+        if not path or not self.owns(path) or not os.path.isdir(path):
+            return False
+        counted = Path(path).parent == self.root
+        size = dir_size(path) if counted else 0
+        reserved = self._reserved.pop(path, None)
+        if self.keep == "always" or (self.keep == "failed" and not ok):
+            with open(os.path.join(path, KEEP_MARKER), "w", encoding="utf-8") as f:
+                f.write(reason or ("ok" if ok else "failed"))
+            if reserved is not None:            # 估算换成实际大小
+                self._delta += size - reserved
+            logger.info("保留工作区 %s", path)
+            return True
+        shutil.rmtree(path, ignore_errors=True)
+        # 扫描之后领的只扣估算；扫描时已经在的扣实际大小
+        self._delta -= reserved if reserved is not None else size
+        return False
+
+    def purge(self) -> int:
+        """清空所有保留的工作区，返回删除个数"""
+        victims = self.kept()
+        for d in victims:
+            shutil.rmtree(d, ignore_errors=True)
+        return len(victims)
+
+
+_workspace: Optional[Workspace] = None
+
+
+def get_workspace() -> Workspace:
+    """进程内一个实例（进程池里每个 worker 各自一个，共享同一个根目录）"""
+    global _workspace
+    if _workspace is None:
+        _workspace = Workspace()
+    return _workspace
@@ -0,0 +1,21 @@
+"""
+文件内容哈希工具
+
+缓存、去重、增量扫描都按内容寻址，统一走这里，避免各处各写一份。
+"""
+import hashlib
+
+CHUNK_SIZE = 1 << 20   # 1 MiB 分块读取，大文件内存也不涨
+
+
+def sha256_file(path: str) -> str:
+    """流式计算文件 sha256（十六进制）"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
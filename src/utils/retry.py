@@ -0,0 +1,11 @@
+"""
+重试退避工具
+
+LLM 分类和 HTTP 下载都按"指数退避 + 随机抖动"重试，统一走这里。
+"""
+import random
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """full jitter：[0, min(cap, base * 2^attempt)] 秒"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,21 @@
+"""
+后处理并行度：一台机器上同时跑几个包，就把 CPU 分几份
+
+批量/守护模式开了 N 个包进程（--workers N）时，每个包里的格式化 / 文档提取进程池
+只分到 总进程数 / N 个，而不是每个包都按 CPU 核数开满（N 个包 × 核数个进程互相抢 CPU）。
+包进程池创建前调用 set_batch_workers(N)，子进程通过环境变量继承。
+"""
+import os
+
+BATCH_WORKERS_ENV = "TAS_BATCH_WORKERS"
+
+
+def set_batch_workers(n: int) -> None:
+    """在创建包进程池之前调用"""
+    os.environ[BATCH_WORKERS_ENV] = str(max(1, n))
+
+
+def cpu_share(total: int) -> int:
+    """total（FORMAT_WORKERS / DOC_WORKERS，默认 CPU 核数）按同时在跑的包数平分，至少 1"""
+    batch = max(1, int(os.getenv(BATCH_WORKERS_ENV, "1") or 1))
+    return max(1, total // batch)
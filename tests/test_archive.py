@@ -0,0 +1,96 @@
+"""
+解压后端测试：按魔数识别格式、进程内解压、注册表可扩展
+"""
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from src.tools import archive
+from src.tools.archive import (
+    ArchiveBackend, detect_format, extract_archive, get_backend, register_backend,
+)
+
+
+def _tar_gz(path: Path):
+    with tarfile.open(path, "w:gz") as tf:
+        data = b"int main(){}"
+        info = tarfile.TarInfo("src/main.c")
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+
+
+def test_detect_format_ignores_suffix():
+    tmp = Path(tempfile.mkdtemp())
+    with zipfile.ZipFile(tmp / "really_zip.rar", "w") as z:
+        z.writestr("a.txt", "a")
+    _tar_gz(tmp / "pkg.zip")
+    (tmp / "notes.gz").write_bytes(gzip.compress(b"hello"))
+    (tmp / "plain.zip").write_text("not an archive")
+
+    assert detect_format(str(tmp / "really_zip.rar")) == "zip"
+    assert detect_format(str(tmp / "pkg.zip")) == "tar.gz"
+    assert detect_format(str(tmp / "notes.gz")) == "gz"
+    assert detect_format(str(tmp / "plain.zip")) is None
+
+
+def test_in_process_extraction():
+    tmp = Path(tempfile.mkdtemp())
+    with zipfile.ZipFile(tmp / "a.zip", "w") as z:
+        z.writestr("hello.py", "print('hi')")
+        z.writestr("../evil.txt", "x")                # 越界成员必须跳过
+    _tar_gz(tmp / "b.tgz")
+    (tmp / "c.txt.gz").write_bytes(gzip.compress(b"hello"))
+
+    out = Path(extract_archive(str(tmp / "a.zip"), str(tmp / "out")))
+    assert (out / "hello.py").read_text() == "print('hi')"
+    assert not (out.parent / "evil.txt").exists()
+
+    out = Path(extract_archive(str(tmp / "b.tgz"), str(tmp / "out")))
+    assert (out / "src" / "main.c").read_bytes() == b"int main(){}"
+
+    out = Path(extract_archive(str(tmp / "c.txt.gz"), str(tmp / "out")))
+    assert (out / "c.txt").read_bytes() == b"hello"
+
+
+def test_gbk_zip_names():
+    tmp = Path(tempfile.mkdtemp())
+    # 模拟 Windows 压缩软件：文件名直接写 GBK 字节、不打 UTF-8 标记
+    gbk = "实验报告.txt".encode("gbk")
+    placeholder = b"x" * len(gbk)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(placeholder.decode(), "内容")
+    (tmp / "cn.zip").write_bytes(buf.getvalue().replace(placeholder, gbk))
+    out = Path(extract_archive(str(tmp / "cn.zip"), str(tmp / "out")))
+    assert os.listdir(out) == ["实验报告.txt"]
+
+
+def test_registered_backend_takes_precedence(monkeypatch):
+    class Fake(ArchiveBackend):
+        name = "fake"
+        formats = frozenset({"zip"})
+
+        def extract_all(self, file_path, dest):
+            Path(dest, "marker").write_text("fake")
+
+    monkeypatch.setattr(archive, "BACKENDS", list(archive.BACKENDS))
+    register_backend(Fake())
+    assert get_backend("zip").name == "fake"
+    tmp = Path(tempfile.mkdtemp())
+    with zipfile.ZipFile(tmp / "a.zip", "w") as z:
+        z.writestr("a.txt", "a")
+    out = Path(extract_archive(str(tmp / "a.zip"), str(tmp)))
+    assert os.listdir(out) == ["marker"]
+
+
+@pytest.mark.skipif(not shutil.which("bsdtar") and not shutil.which("7z"),
+                     reason="no system 7z/bsdtar")
+def test_cli_backend_selected_for_7z():
+    assert get_backend("7z").name in ("7z", "bsdtar")
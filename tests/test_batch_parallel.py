@@ -0,0 +1,44 @@
+"""
+并行批处理测试：用假的 run_package 代替真实解压+LLM，
+验证合并顺序确定、单包失败被隔离、每包状态齐全。
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from src.agent import nodes
+from src.agent.batch_graph import batch_graph
+
+
+def _fake_run(pkg: str, *checkpoint) -> dict:
+    name = Path(pkg).stem
+    time.sleep(0.2 if name == "1" else 0.01)    # 先提交的反而后完成
+    if name == "2":
+        return {"package": pkg, "status": "failed", "error": "boom",
+                "files": 0, "seconds": 0, "classified": []}
+    return {"package": pkg, "status": "ok", "error": "", "files": 1,
+            "seconds": 0, "classified": [{"file_path": f"{name}/a.py",
+                                          "type": "code", "pid": os.getpid()}]}
+
+
+def _state(folder: Path, workers: int) -> dict:
+    return {"scan_dir": str(folder), "pkg_queue": [], "current_pkg": "",
+            "archive_path": "", "extract_to": "", "files": [], "classified": [],
+            "report": "", "grouped": {}, "group_keys": [],
+            "workers": workers, "pkg_status": []}
+
+
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", _fake_run)
+    tmp = Path(tempfile.mkdtemp())
+    for n in ("1", "2", "3"):
+        (tmp / f"{n}.zip").write_bytes(b"PK\x05\x06" + b"\0" * 18)
+
+    par = batch_graph.invoke(_state(tmp, workers=3))
+    ser = batch_graph.invoke(_state(tmp, workers=1))
+
+    assert [p["status"] for p in par["pkg_status"]] == ["ok", "failed", "ok"]
+    assert [c["file_path"] for c in par["classified"]] == ["1/a.py", "3/a.py"]
+    assert [c["file_path"] for c in ser["classified"]] == ["1/a.py", "3/a.py"]
+    assert {c["pid"] for c in par["classified"]} != {os.getpid()}   # 真的在子进程
@@ -0,0 +1,106 @@
+"""
+内容寻址解压测试：相同内容只存一份，目录树是指向 blob 的链接，hashes 进状态，
+没人引用的 blob 会被回收并计入工作区预算
+"""
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+from src.agent import nodes
+from src.agent.graph import graph
+from src.agent.registry import POST_PROCESSORS
+from src.tools.archive import extract_deduped
+from src.tools.blobstore import BlobStore, unshare
+from src.tools.workspace import Workspace
+from src.utils.hashing import sha256_bytes
+
+STARTER = b"def main():\n    pass\n"
+
+
+def _make_zip(tmp_path, name, own: bytes) -> str:
+    path = str(tmp_path / name)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("starter/main.py", STARTER)        # 每个学生都有的起始代码
+        z.writestr("answer.txt", own)
+    return path
+
+
+def test_identical_members_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    a = _make_zip(tmp_path, "a.zip", b"alice")
+    b = _make_zip(tmp_path, "b.zip", b"bob")
+
+    dest_a, hashes_a, _ = extract_deduped(a, str(tmp_path / "x"), store)
+    dest_b, hashes_b, _ = extract_deduped(b, str(tmp_path / "x"), store)
+
+    assert (store.added, store.reused) == (3, 1)
+    main_a = os.path.join(dest_a, "starter", "main.py")
+    main_b = os.path.join(dest_b, "starter", "main.py")
+    assert hashes_a[main_a] == hashes_b[main_b] == sha256_bytes(STARTER)
+    assert open(main_b, "rb").read() == STARTER
+    if store.links["hardlink"]:
+        assert os.path.samefile(main_a, main_b)
+
+    # 原地修改前 unshare：blob 和其他包里的同一份文件不受影响
+    unshare([main_a])
+    with open(main_a, "w") as f:
+        f.write("changed")
+    assert open(main_b, "rb").read() == STARTER
+    assert store.path_for(sha256_bytes(STARTER)).read_bytes() == STARTER
+
+
+def test_cas_mode_exposes_hashes_in_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(nodes, "EXTRACT_MODE", "cas")
+    monkeypatch.setattr(nodes, "_blob_store", BlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setitem(POST_PROCESSORS, "code", lambda files, state: None)
+    monkeypatch.setitem(POST_PROCESSORS, "doc", lambda files, state: None)
+
+    z = _make_zip(tmp_path, "s.zip", b"notes")
+    final = graph.invoke({"archive_path": z, "extract_to": tempfile.mkdtemp()})
+
+    assert sorted(os.path.basename(f) for f in final["files"]) == ["answer.txt", "main.py"]
+    assert set(final["hashes"]) == set(final["files"])
+    main = [f for f in final["files"] if f.endswith("main.py")][0]
+    assert final["hashes"][main] == sha256_bytes(STARTER)
+
+
+def test_gc_spares_linked_and_recent_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    linked = store.put_stream(io.BytesIO(b"still used"))
+    orphan = store.put_stream(io.BytesIO(b"orphan"))
+    fresh = store.put_stream(io.BytesIO(b"just reused"))
+    os.link(store.path_for(linked), tmp_path / "pkg_file")
+    old = time.time() - 3600
+    for d in (linked, orphan, fresh):
+        os.utime(store.path_for(d), (old, old))
+    store.put_stream(io.BytesIO(b"just reused"))           # 复用即刷新，不会被回收
+
+    assert store.gc(min_age=60) == 1
+    assert not store.has(orphan)
+    assert store.has(linked) and store.has(fresh)
+
+
+def test_workspace_budget_counts_and_collects_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put_stream(io.BytesIO(b"\0" * 8_000))
+    os.utime(store.path_for(digest), (0, 0))
+    ws = Workspace(str(tmp_path / "work"), budget=10_000, shm_max=0, wait=0)
+    ws.attach(store)
+    assert ws._used() >= 8_000
+
+    pkg = tmp_path / "p.zip"
+    pkg.write_bytes(b"x" * 1_000)                          # 估算 4000：先 gc blob 腾地方
+    ws.acquire(str(pkg))
+    assert not store.has(digest)
+
+
+def test_link_support_tracked_per_device(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put_stream(io.BytesIO(b"abc"))
+    dev = os.stat(tmp_path).st_dev
+    store._reflink_ok[dev + 1] = False                  # 另一块盘不支持，不影响这块
+    how = store.materialize(digest, str(tmp_path / "out" / "a.txt"))
+    assert how in ("reflink", "hardlink")
+    assert set(store._reflink_ok) == {dev, dev + 1}
@@ -0,0 +1,83 @@
+"""
+分类缓存测试：不访问网络，用假模型计数
+"""
+import json
+import tempfile
+from pathlib import Path
+
+from src.tools import cache as cache_mod
+from src.tools import classify as classify_mod
+from src.tools.cache import ClassifyCache, make_key
+
+
+class _FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        reply = json.dumps({"type": "code", "language": "py", "confidence": 0.9})
+        return type("Msg", (), {"content": reply})()
+
+
+def test_key_depends_on_ext_and_prompt_version():
+    assert make_key("abc", "a.py") == make_key("abc", "b.PY")
+    assert make_key("abc", "a.py") != make_key("abc", "a.txt")
+    assert make_key("abc", "a.py", "1") != make_key("abc", "a.py", "2")
+
+
+def test_lru_eviction_and_counters():
+    db = Path(tempfile.mkdtemp()) / "c.sqlite3"
+    c = ClassifyCache(str(db), max_entries=2)
+    c.put("k1", {"type": "code"})
+    c.put("k2", {"type": "doc"})
+    assert c.get("k1") == {"type": "code"}     # k1 变成最近使用
+    c.put("k3", {"type": "image"})             # 超限，淘汰 k2
+    assert c.get("k2") is None
+    assert c.get("k3") == {"type": "image"}
+
+    s = c.stats()
+    assert s["entries"] == 2
+    assert (s["session_hits"], s["session_misses"]) == (2, 1)
+    assert s["total_evictions"] == 1
+    assert c.clear() == 2
+    c.close()
+
+
+def test_classify_file_hits_cache(monkeypatch):
+    tmp = Path(tempfile.mkdtemp())
+    monkeypatch.setenv("CLASSIFY_CACHE", "1")
+    monkeypatch.setenv("CLASSIFY_CACHE_PATH", str(tmp / "c.sqlite3"))
+    monkeypatch.setattr(cache_mod, "_default", None)
+    fake = _FakeModel()
+    monkeypatch.setattr(classify_mod, "_model", fake)
+
+    # 两个学生交了字节完全一样的文件
+    for name in ("s1", "s2"):
+        (tmp / name).mkdir()
+        (tmp / name / "hello.py").write_text("print('hi')")
+
+    r1 = classify_mod.classify_file(str(tmp / "s1" / "hello.py"))
+    r2 = classify_mod.classify_file(str(tmp / "s2" / "hello.py"))
+    assert r1 == r2 and r1["type"] == "code"
+    assert fake.calls == 1
+
+
+def test_lookups_batched_and_count_tracks_real_inserts(tmp_path):
+    import sqlite3
+    db = tmp_path / "c.sqlite3"
+    c = ClassifyCache(str(db), max_entries=10)
+    c.put("k1", {"type": "code"})
+    c.put("k1", {"type": "doc"})               # 覆盖，不算新条目
+    assert c._count == 1 and c.get("k1") == {"type": "doc"}
+    c.get("k1")
+    c.get("nope")
+
+    other = sqlite3.connect(str(db))           # 查询还没写回库
+    assert other.execute("SELECT hits FROM classify_cache").fetchone()[0] == 0
+    assert other.execute("SELECT COUNT(*) FROM cache_stats").fetchone()[0] == 0
+    c.close()                                  # close 时写回
+    assert other.execute("SELECT hits FROM classify_cache").fetchone()[0] == 2
+    assert dict(other.execute("SELECT name, value FROM cache_stats")) == \
+        {"hits": 2, "misses": 1}
+    other.close()
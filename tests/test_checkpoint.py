@@ -0,0 +1,82 @@
+"""
+断点续跑测试：批量跑到一半进程挂掉，按 run_id 续跑时已完成的包不再处理
+"""
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from src.agent import nodes
+from src.agent.batch_graph import build_batch_graph
+from src.agent.checkpoint import get_checkpointer, invoke_resumable, new_run_id
+from src.tools.workspace import Workspace
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+_calls = []
+_killed = set()
+
+
+class _Killed(Exception):
+    pass
+
+
+def _fake_run(pkg: str, *checkpoint) -> dict:
+    name = Path(pkg).name
+    _calls.append(name)
+    if name == "2.zip" and name not in _killed:
+        _killed.add(name)
+        raise _Killed("进程被杀")
+    return {"package": pkg, "status": "ok", "error": "", "files": 1, "skipped": 0,
+            "seconds": 0, "classified": [{"file_path": Path(pkg).stem + "/a.py",
+                                          "type": "code"}]}
+
+
+def test_resume_skips_finished_packages(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", _fake_run)
+    tmp = Path(tempfile.mkdtemp())
+    for n in ("1", "2", "3"):
+        (tmp / f"{n}.zip").write_bytes(n.encode())
+    state = {"scan_dir": str(tmp), "pkg_queue": [], "current_pkg": "",
+             "archive_path": "", "extract_to": "", "files": [], "classified": [],
+             "report": "", "grouped": {}, "group_keys": [], "workers": 1,
+             "incremental": False, "pkg_status": []}
+    db = str(tmp / "ckpt.sqlite3")
+    run_id = new_run_id()
+
+    _calls.clear()
+    _killed.clear()
+    with pytest.raises(_Killed):
+        invoke_resumable(build_batch_graph(get_checkpointer(db)), state, run_id)
+    assert _calls == ["1.zip", "2.zip"]
+
+    _calls.clear()          # 新进程：重新打开同一个库
+    final = invoke_resumable(build_batch_graph(get_checkpointer(db)), state, run_id)
+    assert _calls == ["2.zip", "3.zip"]
+    assert [c["file_path"] for c in final["classified"]] == ["1/a.py", "2/a.py", "3/a.py"]
+
+    _calls.clear()          # 已跑完的运行直接返回结果
+    again = invoke_resumable(build_batch_graph(get_checkpointer(db)), state, run_id)
+    assert _calls == [] and len(again["pkg_status"]) == 3
+
+
+def test_rewritten_package_not_resumed_from_old_checkpoint(tmp_path, monkeypatch):
+    """守护模式一个 run_id 用到底：同一路径的包被重新上传，不能拿回旧包的结果"""
+    workspace = Workspace(str(tmp_path / "work"), shm_max=0)
+    monkeypatch.setattr(nodes, "get_workspace", lambda: workspace)
+    monkeypatch.setattr(nodes, "POST_PROCESSORS", {})
+    pkg = str(tmp_path / "hw.zip")
+    db = str(tmp_path / "ck.sqlite3")
+    with zipfile.ZipFile(pkg, "w") as z:
+        z.writestr("a.py", "print(1)\n")
+        z.writestr("b.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 20)
+    first = nodes.run_package(pkg, "watch-run", db)
+    assert len(first["classified"]) == 2
+
+    with zipfile.ZipFile(pkg, "w") as z:
+        z.writestr("only_new.py", "print(2)\n")
+    os.utime(pkg, ns=(os.stat(pkg).st_atime_ns, os.stat(pkg).st_mtime_ns + 10**9))
+    second = nodes.run_package(pkg, "watch-run", db)
+    assert [os.path.basename(c["file_path"]) for c in second["classified"]] == ["only_new.py"]
@@ -0,0 +1,125 @@
+"""
+异步分类引擎测试：本地起一个 OpenAI 兼容的假服务（/v1/chat/completions），
+前几次请求返回 429，验证退避重试、并发与结果顺序。
+"""
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from langchain_openai import ChatOpenAI
+
+from src.agent.ratelimit import TokenBucketLimiter
+from src.tools import classify_async
+
+
+class _Stub(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    fail_left = 2          # 前 2 个请求返回 429
+    in_flight = 0
+    max_in_flight = 0
+    served = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            if cls.fail_left > 0:
+                cls.fail_left -= 1
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "rate limited"}}')
+                return
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(0.05)   # 模拟网络延迟，才能看出并发
+        name = body["messages"][-1]["content"].split("\n")[0].split(":", 1)[1]
+        ext = name.rsplit(".", 1)[-1]
+        answer = {"type": "code" if ext == "py" else "doc",
+                  "language": ext, "confidence": 0.9}
+        payload = {
+            "id": "cmpl-1", "object": "chat.completion", "created": 0,
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant",
+                                     "content": json.dumps(answer)}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+        data = json.dumps(payload).encode()
+        with cls.lock:
+            cls.in_flight -= 1
+            cls.served += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def test_async_engine_against_stub_server(monkeypatch):
+    monkeypatch.setenv("CLASSIFY_CACHE", "0")
+    monkeypatch.setattr(classify_async, "BACKOFF_BASE", 0.01)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        model = ChatOpenAI(model="stub", api_key="x", max_retries=0,
+                           base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        tmp = Path(tempfile.mkdtemp())
+        files = []
+        for i in range(12):
+            p = tmp / (f"{i}.py" if i % 2 else f"{i}.md")
+            p.write_text("x")
+            files.append(str(p))
+
+        results = classify_async.classify_files_async(
+            files, model=model, limiter=TokenBucketLimiter(6000), concurrency=4)
+    finally:
+        server.shutdown()
+
+    # 顺序与输入一致，429 被重试吸收
+    assert [r["type"] for r in results] == \
+        ["code" if i % 2 else "doc" for i in range(12)]
+    assert _Stub.served == 12
+    assert 1 < _Stub.max_in_flight <= 4
+
+
+def test_token_bucket_waits_when_empty():
+    lim = TokenBucketLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert lim.try_acquire(tokens=100) == 0
+    wait = lim.try_acquire(tokens=600)       # token 桶只剩 500
+    assert 0 < wait <= 10.5
+
+
+class _KeepAliveStub(_Stub):
+    """HTTP/1.1 keep-alive：连接会留在客户端连接池里（真实 API 就是这样）"""
+    protocol_version = "HTTP/1.1"
+    fail_left = 0
+
+
+def test_two_packages_in_one_process(monkeypatch, tmp_path):
+    """批量/守护模式同一进程连续分类多个包：模型的异步连接池不能绑死在第一个包的事件循环上"""
+    monkeypatch.setenv("CLASSIFY_CACHE", "0")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        model = ChatOpenAI(model="stub", api_key="x", max_retries=0,
+                           base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        runs = []
+        for pkg in ("a", "b"):
+            (tmp_path / pkg).mkdir()
+            files = []
+            for name in ("x.py", "y.md"):
+                p = tmp_path / pkg / name
+                p.write_text("x")
+                files.append(str(p))
+            runs.append(classify_async.classify_files_async(
+                files, model=model, limiter=TokenBucketLimiter(6000), max_retries=0))
+    finally:
+        server.shutdown()
+    assert [[r["type"] for r in rs] for rs in runs] == [["code", "doc"], ["code", "doc"]]
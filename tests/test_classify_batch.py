@@ -0,0 +1,69 @@
+"""
+批量分类测试：假模型按行数作答，第一次故意少答一条触发拆批
+"""
+import json
+import tempfile
+from pathlib import Path
+
+from src.tools import classify as classify_mod
+from src.tools.classify import pack_batches, parse_batch_reply
+
+
+class _FakeBatchModel:
+    def __init__(self, drop_first=True):
+        self.requests = []
+        self.drop_first = drop_first
+
+    def bind(self, **kwargs):
+        return self
+
+    def invoke(self, messages):
+        lines = messages[-1].content.splitlines()
+        self.requests.append(len(lines))
+        if len(lines) == 1 and not lines[0].startswith("0|"):   # 单文件模式
+            reply = {"type": "code", "language": "py", "confidence": 0.9}
+        else:
+            reply = [{"id": int(l.split("|")[0]), "type": "doc",
+                      "language": "txt", "confidence": 0.8} for l in lines]
+            if self.drop_first:
+                self.drop_first = False
+                reply = reply[:-1]
+        return type("Msg", (), {"content": json.dumps(reply)})()
+
+
+def test_pack_batches_respects_budget_and_cap():
+    lines = ["x" * 300] * 10
+    batches = pack_batches(lines, token_budget=1000, max_files=4)
+    assert sum(len(b) for b in batches) == 10
+    assert all(len(b) <= 4 for b in batches)
+    # 单行超预算也要自成一批，不能丢
+    assert pack_batches(["y" * 100000], token_budget=100) == [[0]]
+
+
+def test_parse_batch_reply_validates_ids():
+    ok = json.dumps([{"id": 1, "type": "doc"}, {"id": 0, "type": "code"}])
+    assert [r["type"] for r in parse_batch_reply(ok, 2)] == ["code", "doc"]
+    for bad in ('[{"id": 0, "type": "doc"}]',
+                '[{"id": 0, "type": "doc"}, {"id": 0, "type": "doc"}]',
+                '{"type": "doc"}'):
+        try:
+            parse_batch_reply(bad, 2)
+            assert False, bad
+        except ValueError:
+            pass
+
+
+def test_malformed_batch_is_resplit(monkeypatch):
+    monkeypatch.setenv("CLASSIFY_CACHE", "0")
+    fake = _FakeBatchModel()
+    monkeypatch.setattr(classify_mod, "_model", fake)
+    tmp = Path(tempfile.mkdtemp())
+    files = []
+    for i in range(4):
+        (tmp / f"{i}.txt").write_text(f"note {i}")
+        files.append(str(tmp / f"{i}.txt"))
+
+    results = classify_mod.classify_batch(files)
+    assert len(results) == 4
+    assert all(r["type"] == "doc" for r in results)
+    assert fake.requests == [4, 2, 2]      # 整批失败 → 对半重试
@@ -0,0 +1,66 @@
+"""多课程并发同步：并发上限、结果顺序、单课失败隔离、登录态新鲜度"""
+import asyncio
+import json
+import os
+import time
+
+from src.tools.course_sync import Course, load_courses, run_courses, state_is_fresh
+from src.tools.http_download import DownloadResult
+from src.tools.sync import SyncReport
+
+
+def _courses(n):
+    return [Course(f"课程{i}", f"https://example.com/c{i}") for i in range(n)]
+
+
+def test_run_courses_bounded_and_ordered():
+    active = peak = 0
+    durations = {"课程0": 0.3, "课程1": 0.05, "课程2": 0.05, "课程3": 0.05, "课程4": 0.05}
+
+    async def worker(course):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(durations[course.name])
+        active -= 1
+        return SyncReport(downloaded=[course.name + ".pdf"])
+
+    started = time.monotonic()
+    results = asyncio.run(run_courses(_courses(5), worker, concurrency=2))
+    elapsed = time.monotonic() - started
+
+    assert peak == 2
+    assert [r.course for r in results] == [c.name for c in _courses(5)]
+    assert all(r.status == "ok" and r.downloaded == 1 for r in results)
+    assert elapsed < 0.3 + 0.05 * 4               # 短课程在长课程运行期间并行完成
+
+
+def test_run_courses_isolates_failures():
+    async def worker(course):
+        if course.name == "课程1":
+            raise RuntimeError("页面打不开")
+        if course.name == "课程2":
+            return SyncReport(failed=[DownloadResult("u", "p", 0, "failed", "boom")])
+        return SyncReport(unchanged=["a", "b"])
+
+    results = asyncio.run(run_courses(_courses(3), worker))
+    assert [r.status for r in results] == ["ok", "failed", "partial"]
+    assert results[0].unchanged == 2
+    assert "页面打不开" in results[1].error
+    assert results[2].failed == 1
+
+
+def test_load_courses_and_state_freshness(tmp_path):
+    cfg = tmp_path / "courses.json"
+    cfg.write_text(json.dumps([{"name": "组合数学", "url": "https://x/1", "folder": "zh"}],
+                              ensure_ascii=False), encoding="utf-8")
+    courses = load_courses(str(cfg))
+    assert courses == [Course("组合数学", "https://x/1", "zh")]
+
+    state = tmp_path / "state.json"
+    assert not state_is_fresh(str(state))
+    state.write_text("{}")
+    assert state_is_fresh(str(state), max_age_hours=1)
+    old = time.time() - 7200
+    os.utime(state, (old, old))
+    assert not state_is_fresh(str(state), max_age_hours=1)
@@ -0,0 +1,114 @@
+"""文档转文本：DOCX/PPTX 标准库提取、页数与体积限制、超时、最新输出/内容哈希跳过"""
+import os
+import time
+import zipfile
+
+from src.tools import doctext
+from src.tools.doctext import DocTextCache, extract_documents
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+_A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+
+
+def _docx(path, paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f"<w:document {_W}><w:body>{body}</w:body></w:document>")
+    return str(path)
+
+
+def _pptx(path, slides):
+    with zipfile.ZipFile(path, "w") as z:
+        for i, text in enumerate(slides, 1):
+            z.writestr(f"ppt/slides/slide{i}.xml",
+                       f"<p:sld {_A} xmlns:p='p'><a:p><a:r><a:t>{text}</a:t></a:r></a:p></p:sld>")
+    return str(path)
+
+
+def test_docx_pptx_and_passthrough(tmp_path):
+    docx = _docx(tmp_path / "report.docx", ["第一段", "第二段"])
+    pptx = _pptx(tmp_path / "slides.pptx", [f"slide {i}" for i in range(1, 12)])
+    md = tmp_path / "README.md"
+    md.write_text("# hi")
+    ole = tmp_path / "old.doc"
+    ole.write_bytes(b"\xd0\xcf\x11\xe0")
+
+    results = extract_documents([docx, pptx, str(md), str(ole)], workers=2, max_pages=10,
+                                use_cache=False)
+
+    assert [r.status for r in results] == ["extracted", "extracted", "passthrough", "skipped"]
+    assert open(tmp_path / "report.docx.txt", encoding="utf-8").read() == "第一段\n第二段\n"
+    slides = open(tmp_path / "slides.pptx.txt", encoding="utf-8").read()
+    assert results[1].pages == 10 and "slide 10" in slides and "slide 11" not in slides
+    assert results[2].output == str(md)
+
+
+def test_students_own_txt_untouched(tmp_path):
+    docx = _docx(tmp_path / "report.docx", ["正文"])
+    own = tmp_path / "report.txt"
+    own.write_text("学生自己的说明")               # 比 docx 新
+    [r] = extract_documents([docx], use_cache=False)
+    assert r.status == "extracted" and r.output == docx + ".txt"
+    assert own.read_text() == "学生自己的说明"
+
+
+def test_byte_limit_truncates(tmp_path):
+    docx = _docx(tmp_path / "long.docx", ["x" * 100] * 50)
+    [r] = extract_documents([docx], max_bytes=250, use_cache=False)
+    assert r.truncated and os.path.getsize(tmp_path / "long.docx.txt") == 250
+
+
+def test_timeout_reported(monkeypatch, tmp_path):
+    def slow(path, max_pages, deadline):
+        while True:
+            time.sleep(0.05)
+            deadline.check()
+            yield "page\n"
+
+    monkeypatch.setitem(doctext.EXTRACTORS, ".slow", slow)
+    f = tmp_path / "a.slow"
+    f.write_text("x")
+    [r] = extract_documents([str(f)], timeout=0.2, workers=1, use_cache=False)
+    assert r.status == "timeout"
+
+
+def test_skips_uptodate_and_reuses_cached_text(tmp_path):
+    cache = DocTextCache(str(tmp_path / "doc.sqlite3"))
+    a = _docx(tmp_path / "a.docx", ["作业要求"])
+    assert extract_documents([a], cache=cache)[0].status == "extracted"
+    assert extract_documents([a], cache=cache)[0].status == "uptodate"
+
+    # 另一个包里同一份文件（内容相同）：直接用缓存文本
+    (tmp_path / "other").mkdir()
+    b = tmp_path / "other" / "a.docx"
+    b.write_bytes(open(a, "rb").read())
+    [r] = extract_documents([str(b)], cache=cache)
+    assert r.status == "cached"
+    assert open(r.output, encoding="utf-8").read() == "作业要求\n"
+
+
+def _hang(path, max_pages, deadline):
+    """卡在"单页"里，逐页检查拦不住"""
+    time.sleep(3600)
+    yield ""
+
+
+def test_hung_file_does_not_starve_queue(monkeypatch, tmp_path):
+    monkeypatch.setitem(doctext.EXTRACTORS, ".hang", _hang)
+    hung = tmp_path / "a.hang"
+    hung.write_text("x")
+    docs = [_docx(tmp_path / f"d{i}.docx", [f"第 {i} 份"]) for i in range(5)]
+
+    started = time.monotonic()
+    results = extract_documents([str(hung)] + docs, workers=2, timeout=1, use_cache=False)
+    assert [r.status for r in results] == ["timeout"] + ["extracted"] * 5
+    assert open(tmp_path / "d4.docx.txt", encoding="utf-8").read() == "第 4 份\n"
+
+    # 两个 worker 全卡住：卡住的 worker 被换掉，后面排队的文件照样跑完
+    hung2 = tmp_path / "b.hang"
+    hung2.write_text("x")
+    more = [_docx(tmp_path / f"e{i}.docx", ["x"]) for i in range(3)]
+    results = extract_documents([str(hung), str(hung2)] + more, workers=2, timeout=1,
+                                use_cache=False)
+    assert [r.status for r in results] == ["timeout", "timeout"] + ["extracted"] * 3
+    assert time.monotonic() - started < 20
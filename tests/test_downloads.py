@@ -0,0 +1,101 @@
+"""
+下载完成检测测试：模拟浏览器先写 .crdownload 再改名，全部下完立即返回
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src.tools.downloads import wait_for_downloads
+
+
+def _browser(folder: Path, name: str, chunks: int, delay: float):
+    time.sleep(delay)
+    tmp = folder / (name + ".crdownload")
+    with open(tmp, "wb") as fh:
+        for _ in range(chunks):
+            fh.write(b"x" * 1000)
+            fh.flush()
+            time.sleep(0.05)
+    os.rename(tmp, folder / name)
+
+
+def test_returns_when_all_downloads_finish():
+    folder = Path(tempfile.mkdtemp())
+    (folder / "old.pdf").write_bytes(b"old")
+    since = time.time()
+    time.sleep(0.01)
+    threads = [threading.Thread(target=_browser, args=(folder, "a.zip", 20, 0)),
+               threading.Thread(target=_browser, args=(folder, "b.pdf", 5, 0.3))]
+    for t in threads:
+        t.start()
+    started = time.monotonic()
+    got = wait_for_downloads(str(folder), since, idle_timeout=5, grace=0.5)
+    elapsed = time.monotonic() - started
+    for t in threads:
+        t.join()
+    assert [(Path(d.path).name, d.size) for d in got] == [("a.zip", 20000), ("b.pdf", 5000)]
+    assert elapsed < 3
+
+
+def test_expected_count_and_idle_timeout():
+    folder = Path(tempfile.mkdtemp())
+    since = time.time()
+    time.sleep(0.01)
+    _browser(folder, "done.rar", 1, 0)            # 调用前就已经下完
+    started = time.monotonic()
+    got = wait_for_downloads(str(folder), since, expected=1, grace=30)
+    assert [Path(d.path).name for d in got] == ["done.rar"]
+    assert time.monotonic() - started < 2         # 凑够个数不等 grace
+
+    assert wait_for_downloads(str(folder), time.time(), idle_timeout=0.3) == []
+
+
+def test_zero_byte_download_with_polling(monkeypatch):
+    from src.tools import downloads
+    from src.tools.fswatch import PollingSource
+
+    monkeypatch.setattr(downloads, "open_source", PollingSource)      # Windows 的路径
+    monkeypatch.setattr(downloads, "DOWNLOAD_POLL", 0.05)
+    folder = Path(tempfile.mkdtemp())
+    since = time.time()
+    time.sleep(0.01)
+    _browser(folder, "empty.txt", 0, 0)
+    got = wait_for_downloads(str(folder), since, expected=1, idle_timeout=3)
+    assert [(Path(d.path).name, d.size) for d in got] == [("empty.txt", 0)]
+
+
+def test_cdp_events_drive_completion():
+    from src.tools.downloads import DownloadEvents
+
+    folder = Path(tempfile.mkdtemp())
+    events = DownloadEvents()
+    since = time.time()
+
+    def browser():
+        time.sleep(0.1)
+        events.on_begin({"guid": "g1", "suggestedFilename": "a.zip"})
+        events.on_begin({"guid": "g2", "suggestedFilename": "empty.txt"})
+        (folder / "a.zip").write_bytes(b"x" * 10)
+        (folder / "empty.txt").write_bytes(b"")
+        events.on_progress({"guid": "g2", "state": "completed", "receivedBytes": 0})
+        time.sleep(0.3)
+        events.on_progress({"guid": "g1", "state": "completed", "receivedBytes": 10,
+                            "filePath": str(folder / "a.zip")})
+
+    t = threading.Thread(target=browser)
+    t.start()
+    started = time.monotonic()
+    got = wait_for_downloads(str(folder), since, expected=2, grace=30, events=events)
+    t.join()
+    assert [(Path(d.path).name, d.size) for d in got] == [("a.zip", 10), ("empty.txt", 0)]
+    assert time.monotonic() - started < 2          # 事件一到就返回，不等 grace
+
+    # 浏览器没推任何事件：grace 之后退回目录扫描
+    since = time.time()
+    time.sleep(0.01)
+    _browser(folder, "late.pdf", 1, 0)
+    got = wait_for_downloads(str(folder), since, expected=1, grace=0.2,
+                             events=DownloadEvents())
+    assert [Path(d.path).name for d in got] == ["late.pdf"]
@@ -0,0 +1,57 @@
+"""
+分组扇出测试：code / doc / image 三组都要跑到，且后处理分支并发执行
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src.agent import graph as graph_mod
+from src.agent.registry import POST_PROCESSORS
+
+
+def test_every_group_gets_a_concurrent_branch(monkeypatch):
+    tmp = Path(tempfile.mkdtemp())
+    (tmp / "a.py").write_text("print(1)")
+    (tmp / "b.pdf").write_bytes(b"%PDF-1.4")
+    (tmp / "c.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    files = sorted(str(p) for p in tmp.iterdir())
+
+    monkeypatch.setattr(graph_mod, "node_extract",
+                        lambda s: {"files": files, "extract_to": str(tmp)})
+    seen = {}
+
+    def _slow(group):
+        def fn(fs, state):
+            seen[group] = (threading.get_ident(), time.time())
+            time.sleep(0.3)
+        return fn
+
+    monkeypatch.setitem(POST_PROCESSORS, "code", _slow("code"))
+    monkeypatch.setitem(POST_PROCESSORS, "doc", _slow("doc"))
+
+    started = time.time()
+    final = graph_mod.build_graph().invoke({"archive_path": "x", "extract_to": ""})
+    elapsed = time.time() - started
+
+    by_group = {r["group"]: r for r in final["post_results"]}
+    assert set(by_group) == {"code", "doc", "image"}
+    assert by_group["image"]["status"] == "skipped"      # 没注册也不会丢
+    assert by_group["code"]["status"] == by_group["doc"]["status"] == "ok"
+    assert seen["code"][0] != seen["doc"][0]
+    assert elapsed < 0.55                                  # 并发，不是 0.3 + 0.3
+
+
+def test_per_file_failures_reported(monkeypatch):
+    tmp = Path(tempfile.mkdtemp())
+    for name in ("a.py", "b.py"):
+        (tmp / name).write_text("print(1)")
+    files = sorted(str(p) for p in tmp.iterdir())
+    monkeypatch.setattr(graph_mod, "node_extract",
+                        lambda s: {"files": files, "extract_to": str(tmp)})
+    monkeypatch.setitem(POST_PROCESSORS, "code", lambda fs, state: [f"{fs[0]}: SyntaxError"])
+
+    final = graph_mod.build_graph().invoke({"archive_path": "x", "extract_to": ""})
+    [code] = final["post_results"]
+    assert code["status"] == "partial" and code["failed_files"] == 1
+    assert "SyntaxError" in code["error"]
@@ -0,0 +1,61 @@
+"""
+解压过滤测试：清单阶段就跳过 node_modules / 超大文件，跳过原因可追溯
+"""
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+from src.tools import archive
+from src.tools.archive import extract_filtered
+from src.tools.filters import ExtractPolicy, apply_policy, match
+
+
+def test_match_rules():
+    assert match("proj/node_modules/lodash/index.js", "node_modules")
+    assert match("a/b/video.MP4".lower(), "*.mp4")
+    assert match("docs/report.pdf", "docs/*.pdf")
+    assert not match("src/docs/report.pdf", "docs/*.pdf")
+    assert not match("src/rebuild.py", "build")
+
+
+def test_apply_policy_reasons():
+    policy = ExtractPolicy(max_files=2, max_total_bytes=100, max_file_size=60)
+    entries = [("a.py", 10), (".git/HEAD", 1), ("huge.bin", 61),
+               ("b.py", 50), ("c.py", 45), ("d.py", 1)]
+    kept, skipped = apply_policy(entries, policy)
+    assert kept == ["a.py", "b.py"]
+    assert {s["name"]: s["reason"] for s in skipped} == {
+        ".git/HEAD": "excluded:.git", "huge.bin": "max_file_size",
+        "c.py": "max_files", "d.py": "max_files",
+    }
+    kept, skipped = apply_policy([("a.py", 1), ("b.md", 1)],
+                                 ExtractPolicy(include=["*.py"]))
+    assert kept == ["a.py"] and skipped[0]["reason"] == "not included"
+
+
+def _make_zip(path: Path):
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("hw/main.py", "print(1)")
+        z.writestr("hw/node_modules/x/index.js", "module.exports=1")
+        z.writestr("hw/demo.mp4", b"\0" * 10)
+
+
+def test_extract_filtered_never_writes_skipped(monkeypatch):
+    tmp = Path(tempfile.mkdtemp())
+    _make_zip(tmp / "a.zip")
+    dest, skipped = extract_filtered(str(tmp / "a.zip"), str(tmp / "out"), ExtractPolicy())
+    files = [os.path.relpath(os.path.join(r, f), dest)
+             for r, _, fs in os.walk(dest) for f in fs]
+    assert files == [os.path.join("hw", "main.py")]
+    assert {s["name"] for s in skipped} == {"hw/node_modules/x/index.js", "hw/demo.mp4"}
+    assert not Path(dest, "hw", "node_modules").exists()
+
+    # 后端列不了清单：整包解压后按同一策略清理，结果一致
+    def _no_listing(path):
+        raise archive.UnsupportedArchive("no listing")
+    monkeypatch.setattr(archive, "list_members", _no_listing)
+    dest, skipped2 = extract_filtered(str(tmp / "a.zip"), str(tmp / "out2"), ExtractPolicy())
+    assert Path(dest, "hw", "main.py").exists()
+    assert not Path(dest, "hw", "demo.mp4").exists()
+    assert {s["name"] for s in skipped2} == {s["name"] for s in skipped}
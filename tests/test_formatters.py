@@ -0,0 +1,150 @@
+"""格式化引擎：按语言分派、分块、同版本格式化过的内容（及其输入）走缓存"""
+import shutil
+
+import pytest
+
+from src.tools import formatters
+from src.tools.formatters import FormatCache, Formatter, _chunks, format_files
+
+
+class UpperFormatter(Formatter):
+    """测试用：把内容转大写，记录每块调用"""
+    name = "upper"
+    languages = frozenset({"py"})
+
+    def __init__(self):
+        self.calls = []
+
+    def version(self):
+        return "1.0"
+
+    def format_chunk(self, paths):
+        self.calls.append(list(paths))
+        out = []
+        for p in paths:
+            src = open(p).read()
+            open(p, "w").write(src.upper())
+            out.append((p, "formatted" if src != src.upper() else "unchanged", ""))
+        return out
+
+
+def _files(tmp_path, n, text="x = 1\n", suffix=".py"):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"f{i}{suffix}"
+        p.write_text(text)
+        paths.append(str(p))
+    return paths
+
+
+def test_chunks_respect_count_and_length():
+    paths = [f"/p/{i:03d}.py" for i in range(10)]
+    assert [len(c) for c in _chunks(paths, 4)] == [4, 4, 2]
+    assert all(sum(len(p) + 1 for p in c) <= 30 for c in _chunks(paths, 100, max_chars=30))
+
+
+def test_cache_skips_already_formatted(monkeypatch, tmp_path):
+    fmt = UpperFormatter()
+    monkeypatch.setattr(formatters, "FORMATTERS", [fmt])
+    cache = FormatCache(str(tmp_path / "fmt.sqlite3"))
+
+    (tmp_path / "a").mkdir()
+    first = _files(tmp_path / "a", 5)
+    stats = format_files(first, workers=2, chunk=2, cache=cache)
+    assert (stats.formatted, stats.cached) == (5, 0)
+    assert [len(c) for c in fmt.calls] == [2, 2, 1]
+
+    # 另一个包里同样的起始代码（已格式化的内容）：一个都不用再跑
+    (tmp_path / "b").mkdir()
+    second = _files(tmp_path / "b", 3, text="X = 1\n")
+    fmt.calls.clear()
+    stats = format_files(second, cache=cache)
+    assert (stats.formatted, stats.cached) == (0, 3)
+    assert fmt.calls == []
+
+
+def test_cache_reuses_output_for_unformatted_duplicates(monkeypatch, tmp_path):
+    fmt = UpperFormatter()
+    monkeypatch.setattr(formatters, "FORMATTERS", [fmt])
+    cache = FormatCache(str(tmp_path / "fmt.sqlite3"))
+    for pkg in ("a", "b"):                     # 两个包里同一份没格式化的起始代码
+        (tmp_path / pkg).mkdir()
+    first = _files(tmp_path / "a", 2)
+    second = _files(tmp_path / "b", 2)
+
+    assert format_files(first, cache=cache).formatted == 2
+    fmt.calls.clear()
+    stats = format_files(second, cache=cache)
+    assert (stats.formatted, stats.cached) == (0, 2)
+    assert fmt.calls == []
+    assert open(second[0]).read() == "X = 1\n"   # 缓存里的格式化结果写回
+
+
+def test_abstract_formatter_fails_at_construction():
+    class Broken(Formatter):
+        name = "broken"
+
+    with pytest.raises(TypeError):
+        Broken()
+
+
+def test_dispatch_by_language(monkeypatch, tmp_path):
+    fmt = UpperFormatter()
+    monkeypatch.setattr(formatters, "FORMATTERS", [fmt])
+    py = _files(tmp_path, 1)[0]
+    weird = str(tmp_path / "script.txt")
+    open(weird, "w").write("y = 2\n")
+    stats = format_files([py, weird], languages={weird: "py"}, use_cache=False)
+    assert stats.formatted == 2                 # 分类结果说是 py 就按 py 处理
+    (tmp_path / "c.py").write_text("z = 3\n")
+    stats = format_files([str(tmp_path / "c.py")], languages={str(tmp_path / "c.py"): "Python3"},
+                         use_cache=False)
+    assert stats.formatted == 1                 # 不认识的语言名退回按扩展名
+    stats = format_files([py], use_cache=False)
+    assert stats.unchanged == 1
+
+
+@pytest.mark.skipif(not shutil.which("gofmt"), reason="需要 gofmt")
+def test_gofmt_batched(tmp_path):
+    files = _files(tmp_path, 3, text="package main\nfunc main(){\n}\n", suffix=".go")
+    bad = str(tmp_path / "bad.go")
+    open(bad, "w").write("package main\nfunc {\n")
+    stats = format_files(files + [bad], use_cache=False)
+    assert (stats.formatted, stats.failed) == (3, 1)
+    assert "func main() {" in open(files[0]).read()
+
+
+def test_black_in_process(tmp_path):
+    pytest.importorskip("black")
+    files = _files(tmp_path, 2, text="x=1\n")
+    stats = format_files(files, use_cache=False, workers=1)
+    assert stats.formatted == 2
+    assert open(files[0]).read() == "x = 1\n"
+
+
+def test_black_pool_shared_spawn_from_threads(tmp_path):
+    """后处理分支在线程里跑：black 进程池用 spawn、进程内共享"""
+    pytest.importorskip("black")
+    from concurrent.futures import ThreadPoolExecutor
+
+    dirs = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        dirs.append(_files(tmp_path / name, 4, text="x=1\n"))
+    with ThreadPoolExecutor(2) as threads:
+        stats = list(threads.map(
+            lambda fs: format_files(fs, use_cache=False, workers=2, chunk=2), dirs))
+    assert [s.formatted for s in stats] == [4, 4]
+    pool = formatters._black_pool
+    assert pool is not None and pool._mp_context.get_start_method() == "spawn"
+    format_files(_files(tmp_path, 4, text="y=2\n"), use_cache=False, workers=2, chunk=2)
+    assert formatters._black_pool is pool
+
+
+def test_workers_divided_by_batch_workers(monkeypatch):
+    from src.utils.workers import cpu_share, set_batch_workers
+
+    monkeypatch.setenv("TAS_BATCH_WORKERS", "1")      # 退出时恢复
+    assert cpu_share(8) == 8
+    set_batch_workers(4)
+    assert cpu_share(8) == 2 and cpu_share(2) == 1
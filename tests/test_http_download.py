@@ -0,0 +1,157 @@
+"""
+直连下载器测试：本地起一个需要 cookie、支持 Range 的文件服务，
+第一次传输中途断开，验证续传、并发上限与大小/sha256 校验。
+"""
+import hashlib
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.tools import http_download
+from src.tools.http_download import DownloadItem, download_all
+
+FILES = {f"/f/{i}.zip": bytes([i]) * (200_000 + i) for i in range(6)}
+
+
+class _Server(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    broken = set()           # 已经断过一次的路径
+    ranges = []
+    in_flight = 0
+    max_in_flight = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        if "session=abc" not in self.headers.get("Cookie", ""):
+            self.send_response(401)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = FILES.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = 0
+        m = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            cls.ranges.append((self.path, start))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            first = self.path.endswith("0.zip") and self.path not in cls.broken
+            cls.broken.add(self.path)
+        try:
+            if first:                # 传一半断开
+                self.wfile.write(data[start:start + 50_000])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(data[start:])
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def test_pooled_download_with_resume_and_verify(monkeypatch):
+    monkeypatch.setattr(http_download, "backoff_delay", lambda attempt: 0)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Server)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_port}"
+    state = {"cookies": [{"name": "session", "value": "abc", "domain": "127.0.0.1",
+                          "path": "/"}]}
+    dest = Path(tempfile.mkdtemp())
+    try:
+        items = [DownloadItem(base + p, sha256=hashlib.sha256(d).hexdigest())
+                 for p, d in FILES.items()]
+        items.append(DownloadItem(base + "/f/1.zip", name="bad.zip", sha256="0" * 64))
+        results = download_all(items, str(dest), storage_state=state, concurrency=3)
+
+        assert [r.status for r in results] == ["ok"] * 6 + ["failed"]
+        for (p, data), r in zip(FILES.items(), results):
+            assert Path(r.path).read_bytes() == data and r.size == len(data)
+        assert results[0].resumed and ("/f/0.zip", 50_000) in _Server.ranges
+        assert "sha256" in results[-1].error and not (dest / "bad.zip").exists()
+        assert _Server.max_in_flight <= 3
+
+        denied = download_all([DownloadItem(base + "/f/2.zip", name="x.zip")],
+                              str(dest), max_retries=0)           # 没带登录态
+        assert denied[0].status == "failed" and "401" in denied[0].error
+    finally:
+        srv.shutdown()
+
+
+class _Changing(BaseHTTPRequestHandler):
+    """第一次传一半断开，随后文件内容换了（ETag 跟着变）；支持 If-Range 和 416"""
+    protocol_version = "HTTP/1.1"
+    data = b"a" * 100_000
+    etag = '"v1"'
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(dict(self.headers))
+        data, first = cls.data, len(cls.requests) == 1
+        m = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        start = int(m.group(1)) if m and (if_range is None or if_range == cls.etag) else 0
+        if start >= len(data) and start:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(data)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if start:
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", cls.etag)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        if first:
+            self.wfile.write(data[:40_000])
+            self.wfile.flush()
+            self.close_connection = True
+            cls.data, cls.etag = b"b" * 60_000, '"v2"'    # 断开期间文件被替换
+            return
+        self.wfile.write(data[start:])
+
+
+def test_if_range_restarts_when_file_changed_and_416_discards(monkeypatch, tmp_path):
+    monkeypatch.setattr(http_download, "backoff_delay", lambda attempt: 0)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Changing)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_port}/x.zip"
+    try:
+        r = download_all([DownloadItem(url)], str(tmp_path / "a"))[0]
+        assert r.status == "ok" and r.resumed is False
+        assert Path(r.path).read_bytes() == b"b" * 60_000    # 没有把新文件拼到旧的前 40KB 后面
+        second = _Changing.requests[1]
+        assert second["If-Range"] == '"v1"' and second["Accept-Encoding"] == "identity"
+        assert not Path(r.path + ".part.validator").exists()
+
+        # 残留的 .part 比服务端文件还大，大小未知：416 -> 删掉从头下
+        (tmp_path / "b").mkdir()
+        (tmp_path / "b" / "x.zip.part").write_bytes(b"z" * 70_000)
+        r = download_all([DownloadItem(url)], str(tmp_path / "b"))[0]
+        assert r.status == "ok" and Path(r.path).read_bytes() == b"b" * 60_000
+    finally:
+        srv.shutdown()
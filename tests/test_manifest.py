@@ -0,0 +1,69 @@
+"""
+增量清单测试：重跑只处理新增/变化的包，其余复用上次结果
+"""
+import os
+import tempfile
+from pathlib import Path
+
+from src.agent import nodes
+from src.agent.batch_graph import batch_graph
+from src.tools.manifest import BatchManifest, MANIFEST_NAME
+
+_calls = []
+
+
+def _fake_run(pkg: str, *checkpoint) -> dict:
+    _calls.append(Path(pkg).name)
+    return {"package": pkg, "status": "ok", "error": "", "files": 1, "skipped": 0,
+            "seconds": 0, "classified": [{"file_path": Path(pkg).stem + "/a.py",
+                                          "type": "code"}]}
+
+
+def _state(folder: Path, incremental=True) -> dict:
+    return {"scan_dir": str(folder), "pkg_queue": [], "current_pkg": "",
+            "archive_path": "", "extract_to": "", "files": [], "classified": [],
+            "report": "", "grouped": {}, "group_keys": [], "workers": 1,
+            "manifest_path": str(folder / MANIFEST_NAME), "manifest_hash": False,
+            "incremental": incremental, "pkg_status": []}
+
+
+def test_fingerprint_and_hash_fallback():
+    tmp = Path(tempfile.mkdtemp())
+    pkg = tmp / "a.zip"
+    pkg.write_bytes(b"v1")
+    m = BatchManifest(str(tmp / "m.sqlite3"), use_hash=True)
+    assert m.lookup(str(pkg)) is None
+    m.record(str(pkg), {"package": str(pkg), "status": "ok", "classified": []})
+    assert m.lookup(str(pkg))["status"] == "ok"
+
+    os.utime(pkg, ns=(1, 1))                  # 只动 mtime：哈希一致仍命中
+    assert m.lookup(str(pkg)) is not None
+    pkg.write_bytes(b"v2")                    # 同大小不同内容
+    os.utime(pkg, ns=(2, 2))
+    assert m.lookup(str(pkg)) is None
+
+    m.record(str(pkg), {"package": str(pkg), "status": "failed", "classified": []})
+    assert m.lookup(str(pkg)) is None         # 失败的不复用
+
+
+def test_rescan_processes_only_new(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", _fake_run)
+    monkeypatch.setattr(nodes, "_manifests", {})
+    tmp = Path(tempfile.mkdtemp())
+    for n in ("1", "2"):
+        (tmp / f"{n}.zip").write_bytes(n.encode())
+
+    _calls.clear()
+    batch_graph.invoke(_state(tmp))
+    assert _calls == ["1.zip", "2.zip"]
+
+    (tmp / "3.zip").write_bytes(b"3")
+    _calls.clear()
+    final = batch_graph.invoke(_state(tmp))
+    assert _calls == ["3.zip"]
+    assert [p["status"] for p in final["pkg_status"]] == ["cached", "cached", "ok"]
+    assert len(final["classified"]) == 3
+
+    _calls.clear()
+    batch_graph.invoke(_state(tmp, incremental=False))
+    assert _calls == ["1.zip", "2.zip", "3.zip"]
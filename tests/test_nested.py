@@ -0,0 +1,85 @@
+"""嵌套压缩包：递归展开、深度限制、体积预算回滚、展开后的成员进分类"""
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+
+from src.agent import nodes
+from src.agent.graph import graph
+from src.agent.registry import POST_PROCESSORS
+from src.tools.nested import expand_nested
+
+
+def _zip_bytes(entries: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in entries.items():
+            z.writestr(name, data)
+    return buf.getvalue()
+
+
+def _tgz_bytes(entries: dict) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in entries.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def _layered(tmp_path) -> str:
+    """hw.zip(磁盘) -> code.tar.gz(内存) -> deep.zip(内存) -> note.txt"""
+    deep = _zip_bytes({"note.txt": b"deepest"})
+    mid = _tgz_bytes({"src/main.py": b"print(1)\n", "deep.zip": deep})
+    outer = tmp_path / "pkg" / "hw.zip"
+    outer.parent.mkdir()
+    outer.write_bytes(_zip_bytes({"code.tar.gz": mid, "readme.md": b"# hw"}))
+    return str(outer)
+
+
+def test_expand_recursively_in_place(tmp_path):
+    outer = _layered(tmp_path)
+    readme = tmp_path / "pkg" / "plain.txt"
+    readme.write_text("x")
+
+    files, nested, skipped = expand_nested([outer, str(readme)])
+
+    rel = sorted(os.path.relpath(f, tmp_path / "pkg").replace(os.sep, "/") for f in files)
+    assert rel == ["hw.zip/code.tar.gz/deep.zip/note.txt", "hw.zip/code.tar.gz/src/main.py",
+                   "hw.zip/readme.md", "plain.txt"]
+    assert os.path.isdir(outer)
+    assert sorted(n["depth"] for n in nested) == [1, 2, 3]
+    assert skipped == []
+
+
+def test_depth_limit_keeps_archive(tmp_path):
+    outer = _layered(tmp_path)
+    files, nested, skipped = expand_nested([outer], max_depth=2)
+    deep = [f for f in files if f.endswith("deep.zip")]
+    assert len(deep) == 1 and os.path.isfile(deep[0])
+    assert [s["reason"] for s in skipped] == ["nested_depth"]
+
+
+def test_budget_rolls_back_zip_bomb(tmp_path):
+    bomb = tmp_path / "bomb.zip"
+    bomb.write_bytes(_zip_bytes({"zeros.bin": b"\0" * 200_000}))
+    files, nested, skipped = expand_nested([str(bomb)], max_bytes=50_000)
+    assert files == [str(bomb)] and os.path.isfile(bomb)     # 原样保留
+    assert nested == []
+    assert skipped[0]["reason"] == "nested_budget"
+
+
+def test_graph_classifies_nested_members(monkeypatch, tmp_path):
+    monkeypatch.setattr(nodes, "EXTRACT_MODE", "full")
+    monkeypatch.setitem(POST_PROCESSORS, "code", lambda files, state: None)
+    monkeypatch.setitem(POST_PROCESSORS, "doc", lambda files, state: None)
+    outer = tmp_path / "submission.zip"
+    outer.write_bytes(_zip_bytes({"inner.zip": _zip_bytes({"a.py": b"x = 1\n"})}))
+
+    final = graph.invoke({"archive_path": str(outer), "extract_to": tempfile.mkdtemp()})
+
+    types = {os.path.basename(c["file_path"]): c["type"] for c in final["classified"]}
+    assert types == {"a.py": "code"}
+    assert final["nested"][0]["archive"].endswith("inner.zip")
@@ -0,0 +1,108 @@
+"""
+旁路连接池测试：用假的 Playwright driver，验证连接复用、并发只连一次、断线自动重连
+"""
+import asyncio
+
+from src.tools import side_channel
+from src.tools.downloads import Downloaded
+from src.tools.side_channel import SideChannel
+
+
+class _Page:
+    def is_closed(self):
+        return False
+
+
+class _Browser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = [type("Ctx", (), {"pages": [_Page()]})()]
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.connected = False
+
+    async def new_browser_cdp_session(self):
+        return _Session()
+
+
+class _Session:
+    def __init__(self):
+        self.handlers, self.sent, self.detached = {}, [], False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def send(self, method, params):
+        self.sent.append((method, params))
+
+    async def detach(self):
+        self.detached = True
+
+
+class _Driver:
+    def __init__(self):
+        self.chromium = self
+        self.browsers = []
+        self.stopped = False
+
+    async def connect_over_cdp(self, url):
+        await asyncio.sleep(0.01)
+        self.browsers.append(_Browser())
+        return self.browsers[-1]
+
+    async def stop(self):
+        self.stopped = True
+
+
+def test_reuse_and_reconnect(monkeypatch):
+    drivers = []
+
+    async def _start(self):
+        drivers.append(_Driver())
+        return drivers[-1]
+    monkeypatch.setattr(SideChannel, "_start_driver", _start)
+    monkeypatch.setattr(side_channel, "_channels", {})
+
+    async def scenario():
+        ch = side_channel.get_side_channel("http://127.0.0.1:9222")
+        ctxs = await asyncio.gather(*(ch.context() for _ in range(5)))
+        assert len({id(c) for c in ctxs}) == 1 and ch.connects == 1
+        assert await ch.latest_page() is not None
+        assert ch.connects == 1
+
+        drivers[0].browsers[0].connected = False          # 浏览器连接断了
+        await ch.context()
+        assert ch.connects == 2 and len(drivers) == 1     # driver 复用，只重连 CDP
+
+        ch.invalidate()
+        await ch.context()
+        assert ch.connects == 3
+
+        await side_channel.close_all()
+        assert drivers[0].stopped and side_channel.current_channel() is None
+    asyncio.run(scenario())
+
+
+def test_download_events_session_stays_attached(monkeypatch):
+    async def _start(self):
+        return _Driver()
+    monkeypatch.setattr(SideChannel, "_start_driver", _start)
+
+    async def scenario():
+        ch = SideChannel("http://127.0.0.1:9222")
+        await ch.context()
+        await ch.set_download_dir("/tmp/dl")
+        first = ch._download_session
+        assert not first.detached and first.sent[0][1]["eventsEnabled"] is True
+        first.handlers["Browser.downloadWillBegin"]({"guid": "g", "suggestedFilename": "a.zip"})
+        first.handlers["Browser.downloadProgress"]({"guid": "g", "state": "completed",
+                                                     "receivedBytes": 0})
+        assert ch.downloads.wait("/tmp/dl", 0, expected=1) == [
+            Downloaded("/tmp/dl/a.zip", 0)]
+
+        await ch.set_download_dir("/tmp/other")              # 换目录：旧会话才断开
+        assert first.detached and not ch._download_session.detached
+    asyncio.run(scenario())
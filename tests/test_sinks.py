@@ -0,0 +1,95 @@
+"""结果输出：三种格式读写一致、续跑重复写入去重、批量图配置输出后状态里不再累积分类结果"""
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from src.agent import nodes
+from src.agent.batch_graph import batch_graph
+from src.tools.sinks import ResultSink, open_sink, read_results, reset_sink
+
+from tests.test_batch_parallel import _fake_run, _state
+
+
+def _status(pkg, status="ok"):
+    return {"package": pkg, "status": status, "error": "", "files": 1, "skipped": 0, "seconds": 0.1}
+
+
+@pytest.mark.parametrize("ext", [".jsonl", ".csv", ".sqlite3"])
+def test_roundtrip(tmp_path, ext):
+    path = str(tmp_path / f"results{ext}")
+    sink = open_sink(path)
+    sink.write(_status("a.zip"), [{"file_path": "a/x.py", "type": "code",
+                                   "language": "py", "confidence": 0.9}])
+    sink.write(_status("b.zip"), [{"file_path": "b/说明.pdf", "type": "doc"}])
+    sink.close()
+    rows = list(read_results(path))
+    assert [(r["package"], r["file_path"], r["type"]) for r in rows] == [
+        ("a.zip", "a/x.py", "code"), ("b.zip", "b/说明.pdf", "doc")]
+    assert rows[0]["confidence"] == 0.9
+
+
+@pytest.mark.parametrize("ext", [".jsonl", ".sqlite3"])
+def test_rewrite_keeps_last(tmp_path, ext):
+    path = str(tmp_path / f"results{ext}")
+    sink = open_sink(path)
+    sink.write(_status("a.zip"), [{"file_path": "old.py", "type": "code"}])
+    sink.write(_status("b.zip"), [{"file_path": "b.py", "type": "code"}])
+    sink.write(_status("a.zip"), [{"file_path": "new.py", "type": "code"}])   # 续跑时重做
+    sink.close()
+    assert sorted(r["file_path"] for r in read_results(path)) == ["b.py", "new.py"]
+    reset_sink(path)
+    assert list(read_results(path)) == []
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / "results.xml"))
+    with pytest.raises(TypeError):                      # 少实现方法，构造时就报错
+        type("HalfSink", (ResultSink,), {"write": lambda self, s, c: None})("x.jsonl")
+
+
+def test_batch_graph_streams_to_sink(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", _fake_run)
+    tmp = Path(tempfile.mkdtemp())
+    for n in ("1", "2", "3"):
+        (tmp / f"{n}.zip").write_bytes(b"PK\x05\x06" + b"\0" * 18)
+    out = str(tmp / "out" / "results.jsonl")
+
+    final = batch_graph.invoke({**_state(tmp, workers=2), "result_sink": out, "counts": {}})
+    nodes._sinks.pop(out).close()
+
+    assert final["classified"] == []
+    assert final["counts"] == {"packages": 3, "ok": 2, "failed": 1, "files": 2}
+    # sink 里是完成顺序（_fake_run 里 1 号包最慢）
+    assert sorted(r["file_path"] for r in read_results(out)) == ["1/a.py", "3/a.py"]
+
+
+def _run_waiting_for_sink(pkg: str, *checkpoint) -> dict:
+    """3 号包一直等到 1 号包的结果出现在 sink 里（即边跑边写）才完成"""
+    name = Path(pkg).stem
+    out = Path(pkg).parent / "out" / "results.jsonl"
+    seen = False
+    if name == "3":
+        deadline = time.time() + 10
+        while not seen and time.time() < deadline:
+            seen = out.exists() and "1/a.py" in out.read_text(encoding="utf-8")
+            time.sleep(0.05)
+    return {"package": pkg, "status": "ok", "error": "", "files": 1, "seconds": 0,
+            "classified": [{"file_path": f"{name}/a.py", "type": "seen" if seen else "code"}]}
+
+
+def test_parallel_streams_to_sink_as_packages_finish(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", _run_waiting_for_sink)
+    tmp = Path(tempfile.mkdtemp())
+    for n in ("1", "3"):
+        (tmp / f"{n}.zip").write_bytes(b"PK\x05\x06" + b"\0" * 18)
+    out = str(tmp / "out" / "results.jsonl")
+
+    final = batch_graph.invoke({**_state(tmp, workers=2), "result_sink": out, "counts": {}})
+    nodes._sinks.pop(out).close()
+
+    assert final["classified"] == []
+    assert [p["package"] for p in final["pkg_status"]] == [str(tmp / "1.zip"), str(tmp / "3.zip")]
+    assert {r["file_path"]: r["type"] for r in read_results(out)}["3/a.py"] == "seen"
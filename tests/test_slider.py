@@ -0,0 +1,36 @@
+"""
+滑块缺口识别测试：合成样本上的准确率、置信度，以及基准报表
+"""
+import tempfile
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+from src.tools.slider import SliderSolver, benchmark, make_dataset, make_sample  # noqa: E402
+
+
+def test_solver_on_synthetic_pairs():
+    rng = np.random.default_rng(1)
+    for _ in range(30):
+        bg, piece, truth = make_sample(rng)
+        result = SliderSolver.solve(bg, piece)
+        assert abs(result.x - truth) <= 3
+        assert result.confident
+
+
+def test_cropped_piece_without_row_hint():
+    bg, piece, truth = make_sample(np.random.default_rng(7))
+    ys = np.nonzero(piece[:, :, 3])[0]
+    cropped = piece[ys.min():ys.max() + 1]          # 拼图图片只有块本身那么高
+    assert abs(SliderSolver.identify_gap(bg, cropped) - truth) <= 3
+
+
+def test_benchmark_report():
+    folder = tempfile.mkdtemp()
+    make_dataset(folder, n=20, seed=3)
+    stats = benchmark(folder)
+    assert stats["solver"]["n"] == 20
+    assert stats["solver"]["accuracy"] >= 0.95
+    assert stats["solver"]["mean_ms"] > 0
@@ -0,0 +1,44 @@
+"""
+本地预分类测试：纯字节判断，不依赖 LLM
+"""
+import tempfile
+from pathlib import Path
+
+from src.tools.sniff import sniff, pre_classify, register_extension
+
+
+def test_magic_bytes_win():
+    assert sniff("readme.pdf", b"%PDF-1.4 fake")["type"] == "doc"
+    assert sniff("x.bin", b"\x89PNG\r\n\x1a\n....") == \
+        {"type": "image", "language": "png", "confidence": 0.99}
+    assert sniff("a.zip", b"PK\x03\x04rest")["language"] == "zip"
+    # docx 本质是 zip，按扩展名细分成文档
+    assert sniff("report.docx", b"PK\x03\x04rest") == \
+        {"type": "doc", "language": "docx", "confidence": 0.99}
+
+
+def test_extension_shebang_and_binary():
+    assert sniff("hello.py", b"print('hi')")["confidence"] >= 0.9
+    assert sniff("main.cpp", b"#include <iostream>")["language"] == "cpp"
+    assert sniff("run", b"#!/usr/bin/env python3\nimport os") == \
+        {"type": "code", "language": "py", "confidence": 0.95}
+    assert sniff("build", b"#!/bin/bash\necho")["language"] == "sh"
+    # 扩展名说是源码，内容却是二进制：交给 LLM
+    assert sniff("fake.py", b"\x00\x01\x02\x03")["confidence"] < 0.9
+    assert sniff("noext", b"") is None
+
+
+def test_pre_classify_splits_and_is_extensible():
+    tmp = Path(tempfile.mkdtemp())
+    (tmp / "a.py").write_text("print(1)")
+    (tmp / "b.pdf").write_bytes(b"%PDF-1.7")
+    (tmp / "c.weird").write_text("???")
+    files = [str(tmp / n) for n in ("a.py", "b.pdf", "c.weird")]
+
+    decided, pending = pre_classify(files, threshold=0.9)
+    assert [d["file_path"] for d in decided] == files[:2]
+    assert pending == files[2:]
+
+    register_extension(".weird", "doc", "weird")
+    decided, pending = pre_classify(files, threshold=0.9)
+    assert not pending
@@ -0,0 +1,38 @@
+"""状态增量：FileRecord 字典式读法、计数 reducer、批量节点只挪下标不改队列"""
+import json
+import pickle
+
+from src.agent import nodes
+from src.agent.state import FileRecord, add_counts
+from src.tools.manifest import _jsonable
+
+
+def test_file_record_dict_access():
+    r = FileRecord.of("/x/a.py", {"type": "code", "language": "py", "confidence": "0.9"},
+                      size=3, hash="ab")
+    assert r["file_path"] == "/x/a.py" and r["type"] == "code" and r.confidence == 0.9
+    assert r.get("missing", 1) == 1
+    assert not hasattr(r, "__dict__")
+    assert pickle.loads(pickle.dumps(r)) == r                 # 进程池回传
+    assert json.loads(json.dumps([r], default=_jsonable))[0]["file_path"] == "/x/a.py"
+    assert FileRecord.of("b", {"type": "code"}).type is r.type   # intern 后共用
+
+
+def test_add_counts_returns_new_dict():
+    a = {"packages": 1, "ok": 1}
+    assert add_counts(a, {"packages": 1, "failed": 1}) == {"packages": 2, "ok": 1, "failed": 1}
+    assert a == {"packages": 1, "ok": 1}
+
+
+def test_process_one_is_delta(monkeypatch):
+    monkeypatch.setattr(nodes, "run_package", lambda pkg, *a: {
+        "package": pkg, "status": "ok", "error": "", "files": 1, "seconds": 0,
+        "classified": [FileRecord(pkg + "/a.py", "code")]})
+    queue = ["1.zip", "2.zip"]
+    state = {"pkg_queue": queue, "pkg_next": 1, "classified": [], "pkg_status": []}
+    update = nodes.node_process_one(state)
+    assert update["pkg_next"] == 2 and update["current_pkg"] == "2.zip"
+    assert [c["file_path"] for c in update["classified"]] == ["2.zip/a.py"]
+    assert update["counts"] == {"packages": 1, "ok": 1, "files": 1}
+    assert "pkg_queue" not in update and queue == ["1.zip", "2.zip"]
+    assert nodes.node_process_one({**state, "pkg_next": 2}) == {}
@@ -0,0 +1,70 @@
+"""
+流式模式测试：只读成员头部分类，只有有后处理器的分组才落盘
+"""
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+
+from src.agent import nodes
+from src.agent.graph import graph
+from src.agent.registry import POST_PROCESSORS
+from src.tools.archive import iter_members, extract_members
+from src.utils.hashing import sha256_bytes
+
+
+def _make_zip() -> str:
+    tmp = tempfile.mktemp(suffix=".zip")
+    with zipfile.ZipFile(tmp, "w") as z:
+        z.writestr("src/hello.py", "print('hi')")
+        z.writestr("doc.pdf", b"%PDF-1.4 fake pdf content")
+        z.writestr("assets/big.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 100000)
+    return tmp
+
+
+def test_iter_members_zip_and_tar():
+    z = _make_zip()
+    members = {m.name: m for m in iter_members(z)}
+    assert set(members) == {"src/hello.py", "doc.pdf", "assets/big.png"}
+    assert members["doc.pdf"].header.startswith(b"%PDF-")
+    assert members["src/hello.py"].digest == sha256_bytes(b"print('hi')")
+    assert len(members["assets/big.png"].header) == 512
+
+    t = tempfile.mktemp(suffix=".tar.gz")
+    with tarfile.open(t, "w:gz") as tf:
+        data = b"int main(){}"
+        info = tarfile.TarInfo("a/main.c")
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+    assert [m.name for m in iter_members(t)] == ["a/main.c"]
+
+    dest = tempfile.mkdtemp()
+    assert extract_members(t, ["a/main.c"], dest) == [os.path.join(dest, "a", "main.c")]
+    os.unlink(z)
+    os.unlink(t)
+
+
+def test_stream_mode_extracts_only_needed_groups(monkeypatch):
+    monkeypatch.setattr(nodes, "EXTRACT_MODE", "stream")
+    seen = {}
+
+    def _record(group):
+        def fn(files, state):
+            seen[group] = [os.path.exists(f) for f in files]
+        return fn
+
+    monkeypatch.setitem(POST_PROCESSORS, "code", _record("code"))
+    monkeypatch.setitem(POST_PROCESSORS, "doc", _record("doc"))
+
+    z = _make_zip()
+    final = graph.invoke({"archive_path": z, "extract_to": tempfile.mkdtemp()})
+
+    assert final["streamed"] is True
+    assert {c["type"] for c in final["classified"]} == {"code", "doc", "image"}
+    assert seen == {"code": [True], "doc": [True]}
+    png = [f for f in final["files"] if f.endswith(".png")][0]
+    assert not os.path.exists(png)           # 没有处理器的分组从未落盘
+    assert not Path(final["extract_to"], "assets").exists()
+    os.unlink(z)
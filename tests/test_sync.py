@@ -0,0 +1,105 @@
+"""
+增量同步测试：第二次同步不再 GET，内容相同的文件硬链接去重，远程变了才重下并原地覆盖
+"""
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.tools.http_download import DownloadItem
+from src.tools.sync import sync
+
+FILES = {"/a.zip": b"A" * 1000, "/copy-of-a.zip": b"A" * 1000, "/c.pdf": b"C" * 500}
+VERSIONS = {p: 1 for p in FILES}
+
+
+class _Server(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    gets = []
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self):
+        data = FILES[self.path]
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", f'"{self.path}-v{VERSIONS[self.path]}"')
+        self.end_headers()
+        return data
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        type(self).gets.append(self.path)
+        self.wfile.write(self._headers())
+
+
+def test_incremental_sync_and_dedupe():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Server)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    items = [DownloadItem(f"http://127.0.0.1:{srv.server_port}{p}") for p in FILES]
+    dest = Path(tempfile.mkdtemp())
+    try:
+        first = sync(items, str(dest))
+        assert len(first.downloaded) == 2 and len(first.deduped) == 1
+        assert os.path.samefile(dest / "a.zip", dest / "copy-of-a.zip")
+
+        _Server.gets.clear()
+        second = sync(items, str(dest))
+        assert _Server.gets == [] and len(second.unchanged) == 3
+
+        FILES["/c.pdf"] = b"D" * 700
+        VERSIONS["/c.pdf"] += 1
+        third = sync(items, str(dest))
+        assert _Server.gets == ["/c.pdf"]
+        assert third.downloaded == [str(dest / "c.pdf")]
+        assert (dest / "c.pdf").read_bytes() == b"D" * 700
+        assert sorted(p.name for p in dest.iterdir() if not p.name.startswith(".")) == \
+            ["a.zip", "c.pdf", "copy-of-a.zip"]
+    finally:
+        srv.shutdown()
+
+
+class _Bare(BaseHTTPRequestHandler):
+    """没有 ETag / Last-Modified 的服务"""
+    protocol_version = "HTTP/1.1"
+    data = {"/n.zip": b"N" * 300, "/h.zip": b"H" * 200}
+    gets = []
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.data[self.path])))
+        self.end_headers()
+        return self.data[self.path]
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        type(self).gets.append(self.path)
+        self.wfile.write(self._headers())
+
+
+def test_no_validators_uses_hash_or_reports_verified(tmp_path):
+    import hashlib
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Bare)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_port}"
+    items = [DownloadItem(base + "/n.zip"),
+             DownloadItem(base + "/h.zip", sha256=hashlib.sha256(b"H" * 200).hexdigest())]
+    try:
+        assert len(sync(items, str(tmp_path)).downloaded) == 2
+        _Bare.gets.clear()
+        again = sync(items, str(tmp_path))
+        assert again.unchanged == [str(tmp_path / "h.zip")]      # 列表给了哈希：不用下
+        assert again.verified == [str(tmp_path / "n.zip")] and again.downloaded == []
+        assert _Bare.gets == ["/n.zip"]
+    finally:
+        srv.shutdown()
@@ -0,0 +1,143 @@
+"""
+守护模式测试：新到的压缩包写完才处理、每个只处理一次，重启后清单命中不重跑
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.agent.watch import ReadyTracker, watch
+from src.tools.manifest import BatchManifest
+
+
+def _fake_handle(pkg: str) -> dict:
+    return {"package": pkg, "status": "ok", "error": "", "files": os.path.getsize(pkg),
+            "skipped": 0, "seconds": 0, "classified": []}
+
+
+def test_ready_tracker_waits_for_stable_size():
+    now = [0.0]
+    tmp = Path(tempfile.mkdtemp())
+    f = tmp / "a.zip"
+    f.write_bytes(b"x")
+    tracker = ReadyTracker(settle=2, clock=lambda: now[0])
+    tracker.touch(str(f))
+    now[0] = 1.5
+    assert tracker.poll() == []
+    with open(f, "ab") as fh:               # 还在写：重新计时
+        fh.write(b"yy")
+    assert tracker.poll() == []
+    now[0] = 3.0
+    assert tracker.poll() == []
+    now[0] = 3.6
+    assert tracker.poll() == [str(f)]
+
+    g = tmp / "b.zip"                       # 改名到位：不用等
+    g.write_bytes(b"z")
+    tracker.mark_complete(str(g))
+    assert tracker.poll() == [str(g)]
+
+
+def _run(folder: Path, manifest, results, use_inotify):
+    stop = threading.Event()
+    t = threading.Thread(target=watch, kwargs=dict(
+        folder=str(folder), handler=_fake_handle, workers=2, manifest=manifest,
+        on_result=results.append, stop=stop, settle=0.3, tick=0.05,
+        use_inotify=use_inotify))
+    t.start()
+    return stop, t
+
+
+def _wait_for(pred, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not pred():
+        time.sleep(0.05)
+    return pred()
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch_processes_arrivals_once(use_inotify):
+    tmp = Path(tempfile.mkdtemp())
+    inbox = tmp / "inbox"
+    inbox.mkdir()
+    (inbox / "0.zip").write_bytes(b"old")
+    manifest = BatchManifest(str(tmp / "m.sqlite3"))
+    results = []
+    stop, t = _run(inbox, manifest, results, use_inotify)
+    try:
+        (inbox / "1.zip.part").write_bytes(b"1" * 100)       # 浏览器式下载：写完再改名
+        os.rename(inbox / "1.zip.part", inbox / "1.zip")
+        with open(inbox / "2.zip", "wb") as fh:              # 慢慢写
+            for _ in range(5):
+                fh.write(b"2" * 10)
+                fh.flush()
+                time.sleep(0.1)
+        assert _wait_for(lambda: len(results) >= 3)
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        t.join()
+    sizes = {Path(r["package"]).name: r["files"] for r in results}
+    assert sizes == {"0.zip": 3, "1.zip": 100, "2.zip": 50}
+    assert len(results) == 3
+
+    again = []                                               # 重启：都在清单里
+    stop, t = _run(inbox, manifest, again, use_inotify)
+    time.sleep(1)
+    stop.set()
+    t.join()
+    assert again == []
+
+
+def test_vanished_files_are_skipped(monkeypatch):
+    from src.tools import fswatch
+
+    tmp = Path(tempfile.mkdtemp())
+    (tmp / "a.zip").write_bytes(b"a")
+
+    class _Gone:                             # scandir 列出来了，stat 时已经没了
+        path = str(tmp / "gone.zip")
+
+        def is_file(self):
+            return True
+
+        def stat(self):
+            raise FileNotFoundError(self.path)
+
+    real_scandir = os.scandir
+
+    class _Scan:
+        def __init__(self, folder):
+            self.entries = [_Gone(), *real_scandir(folder)]
+
+        def __enter__(self):
+            return iter(self.entries)
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(fswatch.os, "scandir", _Scan)
+    src = fswatch.PollingSource(str(tmp))
+    assert src.changes(0) == [(str(tmp / "a.zip"), False)]
+    monkeypatch.undo()
+
+    class _RacyManifest:                     # 就绪后、查清单前被删
+        def lookup(self, pkg):
+            os.remove(pkg)
+            raise FileNotFoundError(pkg)
+
+        def record(self, *a, **kw):
+            pass
+
+    results = []
+    stop, t = _run(tmp, _RacyManifest(), results, use_inotify=False)
+    try:
+        assert _wait_for(lambda: not (tmp / "a.zip").exists())
+        time.sleep(0.3)
+        assert t.is_alive() and results == []
+    finally:
+        stop.set()
+        t.join(10)
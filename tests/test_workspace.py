@@ -0,0 +1,96 @@
+"""工作区管理：处理完清理、失败保留现场、超预算淘汰、小包走内存盘"""
+import os
+
+from src.agent import nodes
+from src.tools.workspace import KEEP_MARKER, Workspace
+
+
+def _fill(path, size):
+    with open(os.path.join(path, "data.bin"), "wb") as f:
+        f.write(b"\0" * size)
+
+
+def test_release_cleans_or_keeps(tmp_path):
+    ws = Workspace(str(tmp_path / "work"), budget=0, keep="failed", shm_max=0)
+    ok_dir = ws.acquire()
+    bad_dir = ws.acquire()
+    assert not ws.release(ok_dir, ok=True)
+    assert not os.path.exists(ok_dir)
+    assert ws.release(bad_dir, ok=False, reason="boom")
+    assert open(os.path.join(bad_dir, KEEP_MARKER)).read() == "boom"
+    assert ws.kept() == [type(ws.root)(bad_dir)]
+    assert not ws.release(str(tmp_path), ok=True)       # 不归管理器的目录不动
+    assert tmp_path.exists()
+
+
+def test_budget_evicts_kept_workspaces(tmp_path):
+    ws = Workspace(str(tmp_path / "work"), budget=10_000, keep="failed", shm_max=0, wait=0)
+    old = ws.acquire()
+    _fill(old, 8_000)
+    ws.release(old, ok=False)
+
+    pkg = tmp_path / "p.zip"
+    pkg.write_bytes(b"x" * 1_000)                      # 估算 4000，8000 + 4000 超预算
+    new = ws.acquire(str(pkg))
+    assert not os.path.exists(old)
+    assert os.path.isdir(new)
+
+
+def test_small_archives_use_shm(tmp_path):
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    ws = Workspace(str(tmp_path / "work"), budget=0, shm_max=4096, shm_dir=str(shm))
+    small, big = tmp_path / "s.zip", tmp_path / "b.zip"
+    small.write_bytes(b"x" * 100)
+    big.write_bytes(b"x" * 100_000)
+    assert os.path.dirname(ws.acquire(str(small))) == str(shm / "tas_work")
+    assert os.path.dirname(ws.acquire(str(big))) == str(tmp_path / "work")
+
+
+def test_run_package_releases_workspace(monkeypatch, tmp_path):
+    ws = Workspace(str(tmp_path / "work"), budget=0, keep="failed", shm_max=0)
+    monkeypatch.setattr(nodes, "get_workspace", lambda: ws)
+    bad = tmp_path / "broken.zip"
+    bad.write_bytes(b"not an archive")
+    result = nodes.run_package(str(bad))
+    assert result["status"] == "failed"
+    assert len(ws.kept()) == 1                          # 失败的包保留现场
+
+
+def test_usage_counts_inodes_once_and_skips_rescans(monkeypatch, tmp_path):
+    from src.tools import workspace as ws_mod
+
+    d = tmp_path / "d"
+    d.mkdir()
+    _fill(str(d), 8_192)
+    os.link(d / "data.bin", d / "same.bin")            # 硬链接：只占一份
+    assert ws_mod.dir_size(str(d)) == os.lstat(d / "data.bin").st_blocks * 512
+
+    scans = []
+    real = ws_mod.disk_usage
+    monkeypatch.setattr(ws_mod, "disk_usage", lambda paths: scans.append(paths) or real(paths))
+    ws = Workspace(str(tmp_path / "work"), budget=1 << 30, shm_max=0, wait=0)
+    pkg = tmp_path / "p.zip"
+    pkg.write_bytes(b"x" * 1_000)
+    dirs = [ws.acquire(str(pkg)) for _ in range(5)]
+    assert len(scans) == 1                              # 远低于预算：不重复遍历
+    assert ws._used() == 5 * 4_000
+    for x in dirs:
+        ws.release(x)
+    assert ws._used() == 0
+
+
+def test_cas_store_on_other_device_keeps_packages_off_shm(tmp_path):
+    shm = tmp_path / "shm"
+    shm.mkdir()
+    ws = Workspace(str(tmp_path / "work"), budget=0, shm_max=4096, shm_dir=str(shm))
+    small = tmp_path / "s.zip"
+    small.write_bytes(b"x" * 100)
+
+    class _Store:                                       # 不在内存盘所在文件系统上
+        root = "/proc"
+
+        def gc(self):
+            return 0
+    ws.attach(_Store())
+    assert os.path.dirname(ws.acquire(str(small))) == str(tmp_path / "work")